@@ -0,0 +1,188 @@
+import asyncio
+import logging
+import random
+import threading
+from datetime import datetime, timedelta
+
+import httpx
+from pymongo import UpdateOne
+
+import database
+from metrics import UPSTREAM_REQUESTS
+from repository import run_io
+from settings import DEFAULTS
+
+UNKNOWN_ADDRESS = "Unknown address"
+
+# Only throttling and server errors are worth retrying; other 4xx answers are final
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class AddressCache:
+    """
+    Station id -> address cache persisted in a Mongo collection with a TTL index,
+    so a re-crawl does not fetch addresses again.
+    """
+
+    def __init__(self, collection_name=DEFAULTS.address_cache_collection, ttl_seconds=DEFAULTS.address_cache_ttl_seconds):
+        self.collection_name = collection_name
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+
+    def configure(self, collection_name, ttl_seconds):
+        """
+        Apply the settings of the app. Called from the app lifespan.
+        """
+        self.collection_name = collection_name
+        self.ttl_seconds = ttl_seconds
+
+    @property
+    def collection(self):
+        return database.get_collection(self.collection_name)
+
+    def ensure_indexes(self):
+        # MongoDB removes expired entries in the background (roughly once a minute)
+        self.collection.create_index("fetchedAt", expireAfterSeconds=self.ttl_seconds, name="fetchedAt_ttl")
+
+    def get_many(self, station_ids):
+        """
+        Return {station_id: address} for the ids cached and not yet expired.
+        """
+        station_ids = list(set(station_ids))
+        if not station_ids:
+            return {}
+        fresh_after = datetime.utcnow() - timedelta(seconds=self.ttl_seconds)
+        found = {
+            entry["_id"]: entry["address"]
+            for entry in self.collection.find(
+                {"_id": {"$in": station_ids}, "fetchedAt": {"$gte": fresh_after}},
+                {"address": 1},
+            )
+        }
+        with self._lock:
+            self.hits += len(found)
+            self.misses += len(station_ids) - len(found)
+        return found
+
+    def put_many(self, addresses):
+        if not addresses:
+            return
+        now = datetime.utcnow()
+        self.collection.bulk_write([
+            UpdateOne(
+                {"_id": station_id},
+                {"$set": {"address": address, "fetchedAt": now}},
+                upsert=True,
+            )
+            for station_id, address in addresses.items()
+        ], ordered=False)
+        with self._lock:
+            self.writes += len(addresses)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRate": round(self.hits / lookups, 4) if lookups else None,
+                "writes": self.writes,
+                "ttlSeconds": self.ttl_seconds,
+            }
+
+
+address_cache = AddressCache()
+
+
+class AddressEnricher:
+    """
+    Fetch station addresses from the FLO API concurrently, consulting the cache first.
+    At most `max_workers` requests are in flight; transport errors, 429 and 5xx are
+    retried with jittered backoff. Anything that still fails falls back to
+    UNKNOWN_ADDRESS (which is never cached).
+    """
+
+    def __init__(
+        self,
+        cache=address_cache,
+        station_url=DEFAULTS.flo_station_url,
+        max_workers=DEFAULTS.address_fetch_workers,
+        max_retries=DEFAULTS.address_fetch_retries,
+        timeout=DEFAULTS.address_fetch_timeout,
+        client=None,
+    ):
+        self.cache = cache
+        self.station_url = station_url
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self._client = client
+        self.fetched = 0
+        self.failed = 0
+
+    async def _fetch_one(self, client, semaphore, station_id):
+        url = self.station_url.format(station_id=station_id)
+        for attempt in range(self.max_retries + 1):
+            async with semaphore:
+                try:
+                    response = await client.get(url)
+                    if response.status_code not in RETRY_STATUS_CODES:
+                        response.raise_for_status()
+                        address = response.json().get("address", UNKNOWN_ADDRESS)
+                        self.fetched += 1
+                        UPSTREAM_REQUESTS.inc(service="flo_station", outcome="ok")
+                        return address
+                    error, retry = f"HTTP {response.status_code}", True
+                except httpx.TransportError as e:
+                    error, retry = e, True
+                except (httpx.HTTPError, ValueError) as e:
+                    error, retry = e, False
+            UPSTREAM_REQUESTS.inc(service="flo_station", outcome="error")
+            if not retry:
+                break
+            if attempt < self.max_retries:
+                await asyncio.sleep(random.uniform(0, 0.5 * 2 ** attempt))
+        self.failed += 1
+        logging.error(f"Error fetching address for station_id {station_id}: {error}")
+        return UNKNOWN_ADDRESS
+
+    async def enrich(self, station_ids):
+        """
+        Return {station_id: address} for every requested station id.
+        """
+        station_ids = list(dict.fromkeys(station_ids))
+        if not station_ids:
+            return {}
+
+        addresses = await run_io(self.cache.get_many, station_ids)
+        missing = [station_id for station_id in station_ids if station_id not in addresses]
+        if not missing:
+            return addresses
+
+        semaphore = asyncio.Semaphore(self.max_workers)
+        client = self._client or httpx.AsyncClient(
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=self.max_workers),
+        )
+        try:
+            fetched = await asyncio.gather(*(
+                self._fetch_one(client, semaphore, station_id) for station_id in missing
+            ))
+        finally:
+            if self._client is None:
+                await client.aclose()
+
+        fresh = {
+            station_id: address
+            for station_id, address in zip(missing, fetched)
+            if address != UNKNOWN_ADDRESS
+        }
+        await run_io(self.cache.put_many, fresh)
+        addresses.update(zip(missing, fetched))
+        return addresses
+
+    def stats(self):
+        return {"fetched": self.fetched, "failed": self.failed, "cache": self.cache.stats()}
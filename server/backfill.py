@@ -0,0 +1,48 @@
+"""
+Store the per-park 'summary' (totals, availability, average speed, level and
+connector counts) on documents written before it was computed at ingest time.
+
+Run from the server directory:
+    python -m backfill
+    python -m backfill --mongo-uri "mongodb+srv://..."
+    python -m backfill --mongo-uri mongodb://localhost:27017 --collection uxpropertegypt --recompute
+"""
+import argparse
+import logging
+import time
+
+import database
+from ingest import backfill_summaries
+from settings import Settings
+
+SUMMARY_COLLECTIONS = ["baobao", "uxpropertegypt"]
+
+
+def main():
+    settings = Settings.from_env()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    try:
+        mongo_uri = settings.database_uri
+    except RuntimeError:
+        mongo_uri = None
+    parser.add_argument("--mongo-uri", default=mongo_uri, required=mongo_uri is None,
+                        help="Defaults to MONGO_URI, or the Atlas cluster of MONGO_DB_USER, MONGO_DB_PASSWORD and MONGO_DB_URI")
+    parser.add_argument("--collection", action="append", help="Repeatable; defaults to baobao and uxpropertegypt")
+    parser.add_argument("--batch-size", type=int, default=settings.ingest_batch_size)
+    parser.add_argument("--recompute", action="store_true", help="Rewrite summaries that are already stored")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    database.init_client(args.mongo_uri, **settings.pool_options())
+    database.use_database(settings.mongo_database)
+    try:
+        for name in args.collection or SUMMARY_COLLECTIONS:
+            started = time.monotonic()
+            updated = backfill_summaries(database.get_collection(name), args.batch_size, args.recompute)
+            logging.info(f"{name}: stored summaries on {updated} parks in {time.monotonic() - started:.1f}s")
+    finally:
+        database.close_client()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Body size and encode/parse time of a /parent-stations payload in each format
+(json, columnar, msgpack), uncompressed and with gzip/brotli at the server's settings.
+
+Run from the server directory:
+    python -m bench.bench_compact --sizes 1000 10000
+"""
+import argparse
+import json
+
+from bench.bench_serialization import best_of
+from bench.synthetic import generate_parks
+from compact import columnar
+from compression import BROTLI_AVAILABLE, ENCODERS
+from serialization import MSGPACK_AVAILABLE, dumps
+
+if MSGPACK_AVAILABLE:
+    import msgpack
+
+
+def formats():
+    encoders = {
+        "json": (lambda parks: dumps({"parentStations": parks}), json.loads),
+        "columnar": (lambda parks: dumps({"parentStations": columnar(parks)}), json.loads),
+    }
+    if MSGPACK_AVAILABLE:
+        encoders["msgpack"] = (lambda parks: msgpack.packb({"parentStations": columnar(parks)}), msgpack.unpackb)
+    return encoders
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+
+    encodings = ["gzip", "br"] if BROTLI_AVAILABLE else ["gzip"]
+    for size in args.sizes:
+        parks = [
+            {key: park[key] for key in ("id", "name", "geoCoordinates", "stations")}
+            for park in generate_parks(size, args.seed)
+        ]
+        print(f"{size} parks")
+        for name, (encode, parse) in formats().items():
+            encode_s, body = best_of(args.repeat, lambda: encode(parks))
+            parse_s, _ = best_of(args.repeat, lambda: parse(body))
+            sizes = [f"{len(body) / 1024:8.1f} KiB"]
+            for encoding in encodings:
+                compressed = ENCODERS[encoding]().encode(body, True)
+                sizes.append(f"{encoding} {len(compressed) / 1024:7.1f} KiB")
+            print(f"  {name:<9} {'  '.join(sizes)}   encode {encode_s * 1000:6.1f} ms   parse {parse_s * 1000:6.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
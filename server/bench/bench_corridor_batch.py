@@ -0,0 +1,120 @@
+"""
+Chargers along many routes: one GET /chargers-on-route per route (sequentially, and
+`--concurrency` at a time) against a single POST /chargers-on-routes batch. Runs in
+process against mongomock with synthetic parks; directions come from
+bench.fixtures.SyntheticGmaps after `--directions-ms` of simulated Google latency, and
+the route cache is bypassed so every run fetches them.
+
+Run from the server directory (CPU_WORKERS sets the process pool size):
+    python -m bench.bench_corridor_batch --parks 50000 --routes 200
+    CPU_WORKERS=1 python -m bench.bench_corridor_batch --parks 50000 --routes 200
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import httpx
+
+
+class SlowGmaps:
+    def __init__(self, inner, latency):
+        self.inner = inner
+        self.latency = latency
+
+    def geocode(self, address):
+        return self.inner.geocode(address)
+
+    def directions(self, origin, destination, mode="driving"):
+        time.sleep(self.latency)
+        return self.inner.directions(origin, destination, mode=mode)
+
+
+def random_routes(n, seed):
+    from bench.synthetic import CITIES
+
+    rng = random.Random(seed)
+    routes = []
+    for i in range(n):
+        (_, lat1, lon1, _, _), (_, lat2, lon2, _, _) = rng.sample(CITIES, 2)
+        # Distinct endpoints so every route is a cache miss
+        origin = f"{lat1 + rng.gauss(0, 0.05):.5f},{lon1 + rng.gauss(0, 0.05):.5f}"
+        destination = f"{lat2 + rng.gauss(0, 0.05):.5f},{lon2 + rng.gauss(0, 0.05):.5f}"
+        routes.append({"id": f"route-{i}", "origin": origin, "destination": destination})
+    return routes
+
+
+async def single_calls(client, routes, max_distance, concurrency):
+    pending = iter(routes)
+    matches = 0
+
+    async def worker():
+        nonlocal matches
+        for route in pending:
+            response = await client.get("/chargers-on-route", params={
+                "origin": route["origin"], "destination": route["destination"], "max_distance": max_distance,
+            })
+            if response.status_code == 200:
+                matches += len(response.json()["chargers"])
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return matches
+
+
+async def batch_call(client, routes, max_distance):
+    matches = 0
+    async with client.stream("POST", "/chargers-on-routes", json={"routes": routes, "max_distance": max_distance}) as response:
+        async for line in response.aiter_lines():
+            if line:
+                matches += len(json.loads(line).get("chargers", []))
+    return matches
+
+
+async def main_async(args):
+    import database
+    import geo_cache
+    import mongomock
+    from bench.fixtures import SyntheticGmaps
+    from bench.synthetic import generate_parks
+
+    database.set_client(mongomock.MongoClient())
+    parks = generate_parks(args.parks, args.seed)
+    database.get_collection("uxpropertegypt").insert_many([dict(park) for park in parks])
+    database.get_collection("baobao").insert_many([dict(park) for park in parks[:100]])
+
+    import main
+    main.gmaps = SlowGmaps(SyntheticGmaps(args.seed), args.directions_ms / 1000)
+    routes = random_routes(args.routes, args.seed)
+
+    async with main.lifespan(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            runs = [
+                ("sequential", lambda: single_calls(client, routes, args.max_distance, 1)),
+                (f"concurrent x{args.concurrency}", lambda: single_calls(client, routes, args.max_distance, args.concurrency)),
+                ("batch", lambda: batch_call(client, routes, args.max_distance)),
+            ]
+            for name, run in runs:
+                geo_cache.route_cache.local.clear()
+                geo_cache.persistent_tier.collection.delete_many({})
+                started = time.perf_counter()
+                matches = await run()
+                elapsed = time.perf_counter() - started
+                print(f"{name:<16} {elapsed * 1000:9.1f} ms  {len(routes) / elapsed:7.1f} routes/s  matches={matches}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--parks", type=int, default=50000)
+    parser.add_argument("--routes", type=int, default=200)
+    parser.add_argument("--max-distance", type=float, default=1.0)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--directions-ms", type=float, default=50)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
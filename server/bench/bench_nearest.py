@@ -0,0 +1,88 @@
+"""
+k-nearest query time of the snapshot's KD-tree (nearest.py) against a brute-force
+haversine scan of every park, with and without filters, and the cost of rebuilding the
+index after an ingest that moved, added and removed a few parks.
+
+Run from the server directory:
+    python -m bench.bench_nearest --parks 10000 50000 --k 10
+"""
+import argparse
+import random
+
+import numpy as np
+
+from bench.bench_serialization import best_of
+from bench.synthetic import generate_parks, sample_points
+from nearest import NearestIndex
+from route_corridor import haversine_km
+from snapshot import ParkSnapshot
+
+FILTERS = {
+    "none": {},
+    "available": {"available": True},
+    "L3+available": {"level": "L3", "available": True},
+    "chademo>=100kW": {"connector": "CHADEMO", "min_charging_speed": 100},
+}
+
+
+def brute_force(snapshot, points, k, mask):
+    for lat, lon in points:
+        distances = haversine_km(lat, lon, snapshot.lats, snapshot.lons)
+        if mask is not None:
+            distances = np.where(mask, distances, np.inf)
+        np.argsort(distances, kind="stable")[:k]
+
+
+def ingested(parks, changed, seed):
+    """
+    The parks after an ingest that moved `changed` parks, dropped as many and added as many.
+    """
+    rng = random.Random(seed)
+    docs = [dict(park) for park in parks[changed:]]
+    for doc in rng.sample(docs, changed):
+        coordinates = doc["geoCoordinates"]
+        doc["geoCoordinates"] = {"latitude": coordinates["latitude"] + 0.01, "longitude": coordinates["longitude"]}
+    for i, park in enumerate(generate_parks(changed, seed + 1)):
+        docs.append(dict(park, id=f"new-park-{i}"))
+    return docs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--parks", type=int, nargs="+", default=[10000, 50000])
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--changed", type=float, default=0.01, help="share of parks changed by the ingest")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=5)
+    args = parser.parse_args()
+
+    for size in args.parks:
+        parks = generate_parks(size, args.seed)
+        snapshot = ParkSnapshot(parks, nearest=True)
+        points = sample_points(parks, args.queries, args.seed)
+        lats, lons = [lat for lat, _ in points], [lon for _, lon in points]
+        ids = [park["id"] for park in parks]
+        build, _ = best_of(args.repeat, lambda: NearestIndex(snapshot.lats, snapshot.lons, ids))
+        print(f"{size} parks: tree build {build * 1000:.1f} ms")
+
+        for name, filters in FILTERS.items():
+            mask = snapshot.filter_mask(**filters)
+            tree, _ = best_of(args.repeat, lambda: snapshot.nearest(lats, lons, args.k, mask))
+            scan, _ = best_of(args.repeat, lambda: brute_force(snapshot, points, args.k, mask))
+            matching = size if mask is None else int(mask.sum())
+            print(f"  {name:<18} {matching:>6} parks  tree {tree / len(points) * 1e6:8.1f} us/query"
+                  f"  scan {scan / len(points) * 1e6:8.1f} us/query  ({scan / tree:.0f}x)")
+
+        docs = ingested(parks, max(int(size * args.changed), 1), args.seed)
+        after = ParkSnapshot(docs)
+        after_ids = [doc["id"] for doc in docs]
+        full, _ = best_of(args.repeat, lambda: NearestIndex(after.lats, after.lons, after_ids))
+        patched, index = best_of(
+            args.repeat, lambda: NearestIndex(after.lats, after.lons, after_ids, snapshot.nearest_index)
+        )
+        print(f"  rebuild after ingest: full {full * 1000:.1f} ms, from previous {patched * 1000:.1f} ms {index.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Compare the RouteCorridor engine with the original per-vertex geodesic loop.
+
+Run from the server directory:
+    python -m bench.bench_route_corridor --chargers 500 --route-points 300
+    python -m bench.bench_route_corridor --chargers 10000 --skip-legacy
+"""
+import argparse
+import time
+
+import numpy as np
+from geopy.distance import geodesic
+
+from route_corridor import RouteCorridor, densify_route
+
+
+def legacy_is_near_route(charger_coords, route_coords, max_distance=0.5):
+    """
+    The original implementation: geodesic distance to each route vertex.
+    """
+    for route_point in route_coords:
+        distance = geodesic(
+            (charger_coords["latitude"], charger_coords["longitude"]),
+            (route_point[0], route_point[1])
+        ).km
+        if distance <= max_distance:
+            return True
+    return False
+
+
+def synthetic_route(n_points, rng):
+    """
+    A wandering ~150 km drive west of Toronto, shaped like a Directions overview polyline.
+    """
+    steps = rng.normal(0, 1, size=(n_points, 2)) * [0.004, 0.004] + [0.0015, 0.004]
+    return np.cumsum(steps, axis=0) + [43.25, -80.6]
+
+
+def synthetic_chargers(route, n, rng):
+    """
+    Half the chargers scattered along the route within ~3 km, half anywhere nearby.
+    """
+    near = route[rng.integers(0, len(route), n // 2)] + rng.normal(0, 0.02, size=(n // 2, 2))
+    lo, hi = route.min(axis=0) - 0.3, route.max(axis=0) + 0.3
+    far = rng.uniform(lo, hi, size=(n - n // 2, 2))
+    return np.vstack([near, far])
+
+
+def geodesic_distance_to_route(point, route, spacing_km=0.01):
+    """
+    Reference distance: geodesic to a finely densified route, checking only nearby vertices.
+    """
+    dense = densify_route(route, spacing_km)
+    window = np.abs(dense - point).max(axis=1) < 0.05
+    candidates = dense[window] if window.any() else dense
+    return min(geodesic(tuple(point), tuple(vertex)).km for vertex in candidates)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chargers", type=int, default=500)
+    parser.add_argument("--route-points", type=int, default=300)
+    parser.add_argument("--max-distance", type=float, default=0.5)
+    parser.add_argument("--accuracy-samples", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--skip-legacy", action="store_true", help="Skip the slow geodesic loop")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    route = synthetic_route(args.route_points, rng)
+    chargers = synthetic_chargers(route, args.chargers, rng)
+    route_coords = [tuple(point) for point in route]
+
+    start = time.perf_counter()
+    legacy = np.array([
+        legacy_is_near_route({"latitude": lat, "longitude": lon}, route_coords, args.max_distance)
+        for lat, lon in chargers
+    ] if not args.skip_legacy else [], dtype=bool)
+    legacy_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    corridor = RouteCorridor(route_coords, args.max_distance)
+    engine = corridor.contains(chargers[:, 0], chargers[:, 1])
+    engine_s = time.perf_counter() - start
+
+    prefiltered = int(corridor.prefilter(chargers[:, 0], chargers[:, 1]).sum())
+
+    build_s, rank_s = [], []
+    for _ in range(5):
+        start = time.perf_counter()
+        ranker = RouteCorridor(route_coords, args.max_distance)
+        build_s.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        ranked, along_km, detour_km = ranker.rank(chargers[:, 0], chargers[:, 1])
+        rank_s.append(time.perf_counter() - start)
+
+    print(f"chargers={args.chargers} route_points={args.route_points} "
+          f"simplified_points={len(corridor.points)} max_distance={args.max_distance} km")
+    print(f"corridor engine      : {engine_s * 1000:10.1f} ms  matches={int(engine.sum())}  "
+          f"candidates after prefilter={prefiltered}")
+    print(f"corridor build       : {min(build_s) * 1000:10.1f} ms  (best of 5, once per route)")
+    print(f"rank along route     : {min(rank_s) * 1000:10.1f} ms  matches={len(ranked)}  "
+          f"(best of 5; furthest match {along_km.max() if len(along_km) else 0:.1f} km along the route)")
+    if not args.skip_legacy:
+        print(f"legacy geodesic loop : {legacy_s * 1000:10.1f} ms  matches={int(legacy.sum())}")
+        print(f"speedup              : {legacy_s / engine_s:10.1f}x")
+        print(f"legacy matches missed by engine: {int((legacy & ~engine).sum())} "
+              f"(engine measures to segments, so it may add matches between vertices)")
+
+    # Accuracy of the haversine point-to-segment distance against geodesic
+    sample = rng.choice(len(chargers), size=min(args.accuracy_samples, len(chargers)), replace=False)
+    sample = sample[corridor.distances_km(chargers[sample, 0], chargers[sample, 1]) < 5]
+    engine_km = corridor.distances_km(chargers[sample, 0], chargers[sample, 1])
+    reference_km = np.array([geodesic_distance_to_route(chargers[i], route) for i in sample])
+    error_m = np.abs(engine_km - reference_km) * 1000
+    if len(error_m):
+        print(f"distance error vs geodesic over {len(error_m)} chargers within 5 km: "
+              f"mean={error_m.mean():.1f} m  p95={np.percentile(error_m, 95):.1f} m  max={error_m.max():.1f} m")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Serialize time and body size of a /parent-stations style payload: FastAPI's default path
+(jsonable_encoder + stdlib json) against FastJSONResponse (orjson when installed).
+
+Run from the server directory:
+    python -m bench.bench_serialization --sizes 1000 10000
+"""
+import argparse
+import time
+from datetime import datetime
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from bench.synthetic import generate_parks
+from serialization import ORJSON_AVAILABLE, FastJSONResponse
+
+
+def best_of(repeat, fn):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"orjson available: {ORJSON_AVAILABLE}")
+    for size in args.sizes:
+        parks = generate_parks(size, args.seed, now=datetime(2025, 1, 11, 12, 30))
+        content = {"parentStations": parks, "nextAfter": None}
+
+        default_s, default_body = best_of(args.repeat, lambda: JSONResponse(jsonable_encoder(content)).body)
+        fast_s, fast_body = best_of(args.repeat, lambda: FastJSONResponse(content).body)
+
+        print(f"{size:>6} parks  default: {default_s * 1000:8.1f} ms {len(default_body) / 1024:9.1f} KiB   "
+              f"fast: {fast_s * 1000:8.1f} ms {len(fast_body) / 1024:9.1f} KiB   "
+              f"speedup {default_s / fast_s:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Cold-start cost of the API: `import main` in a fresh interpreter, the lifespan startup
+(indexes, executors, job workers, snapshot load) against mongomock seeded with synthetic
+parks, and the latency of the first request. Each run is a new subprocess, so nothing
+is already imported or warm; the median of --runs is reported.
+
+Exits with status 1 when a median is over its budget, so it can gate CI:
+    python -m bench.bench_startup --runs 5 --import-budget-ms 400 --startup-budget-ms 1500
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+# Runs in the child process; prints one JSON line of timings in seconds
+CHILD = r"""
+import asyncio, json, os, sys, time
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+started = time.perf_counter()
+import main
+imported = time.perf_counter() - started
+
+import database, httpx, mongomock
+from bench.synthetic import generate_parks
+database.set_client(mongomock.MongoClient())
+for name in ("baobao", "uxpropertegypt"):
+    database.get_collection(name).insert_many(generate_parks(PARKS, seed=1))
+
+async def run():
+    started = time.perf_counter()
+    async with main.lifespan(main.app):
+        startup = time.perf_counter() - started
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            started = time.perf_counter()
+            response = await client.get("/stations", params={"lat": 43.65, "lon": -79.38, "radius_km": 5})
+            first_request = time.perf_counter() - started
+            assert response.status_code == 200, response.status_code
+    return startup, first_request
+
+startup, first_request = asyncio.run(run())
+print(json.dumps({
+    "import": imported,
+    "startup": startup,
+    "firstRequest": first_request,
+    "modules": len(sys.modules),
+    "googlemapsImported": "googlemaps" in sys.modules,
+}))
+"""
+
+
+def run_once(parks):
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD.replace("PARKS", str(parks))],
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--parks", type=int, default=2000, help="parks seeded before startup")
+    parser.add_argument("--import-budget-ms", type=float, default=None)
+    parser.add_argument("--startup-budget-ms", type=float, default=None)
+    parser.add_argument("--first-request-budget-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    runs = [run_once(args.parks) for _ in range(args.runs)]
+    report = {
+        "runs": args.runs,
+        "parks": args.parks,
+        "modules": runs[-1]["modules"],
+        "googlemapsImported": runs[-1]["googlemapsImported"],
+    }
+    over_budget = []
+    for key, budget in (
+        ("import", args.import_budget_ms),
+        ("startup", args.startup_budget_ms),
+        ("firstRequest", args.first_request_budget_ms),
+    ):
+        median_ms = statistics.median(run[key] for run in runs) * 1000
+        report[f"{key}Ms"] = round(median_ms, 1)
+        if budget is not None and median_ms > budget:
+            over_budget.append(f"{key} {median_ms:.1f} ms > {budget:g} ms")
+    print(json.dumps(report, indent=2))
+
+    if over_budget:
+        print("Over budget: " + "; ".join(over_budget), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
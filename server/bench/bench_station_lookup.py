@@ -0,0 +1,84 @@
+"""
+Micro-benchmark /station/{station_id} lookups at 10k and 100k parent parks.
+
+Compares the original nested Python scan with the in-memory SubstationIndex and,
+when --mongo-uri points at a local mongod, the indexed find_one with $elemMatch.
+
+Run from the server directory:
+    python -m bench.bench_station_lookup [--mongo-uri mongodb://localhost:27017]
+"""
+import argparse
+import random
+import time
+
+import mongomock
+from pymongo import MongoClient
+
+from bench.synthetic import generate_parks
+from station_index import SubstationIndex
+
+
+def legacy_lookup(collection, station_id):
+    for parent_station in collection.find():
+        for substation in parent_station.get("stations", []):
+            if substation["id"] == station_id:
+                return parent_station["id"]
+    return None
+
+
+def indexed_lookup(collection, station_id):
+    park = collection.find_one(
+        {"stations.id": station_id},
+        {"_id": 0, "id": 1, "stations": {"$elemMatch": {"id": station_id}}},
+    )
+    return park["id"] if park else None
+
+
+def time_lookups(lookup, station_ids):
+    start = time.perf_counter()
+    for station_id in station_ids:
+        assert lookup(station_id) is not None
+    return (time.perf_counter() - start) / len(station_ids) * 1e6  # microseconds per lookup
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--lookups", type=int, default=200)
+    parser.add_argument("--scan-lookups", type=int, default=3, help="the nested scan is slow; sample fewer")
+    parser.add_argument("--mongo-uri", default=None)
+    parser.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    for size in args.sizes:
+        parks = generate_parks(size, args.seed)
+        station_ids = [rng.choice(rng.choice(parks)["stations"])["id"] for _ in range(args.lookups)]
+        collection = mongomock.MongoClient().bench.baobao
+        collection.insert_many([dict(park) for park in parks])
+
+        scan_us = time_lookups(lambda sid: legacy_lookup(collection, sid), station_ids[:args.scan_lookups])
+
+        index = SubstationIndex()
+        start = time.perf_counter()
+        index.load(collection)
+        load_ms = (time.perf_counter() - start) * 1000
+        map_us = time_lookups(index.parent_of, station_ids)
+
+        print(f"parents={size:>7}  nested scan: {scan_us / 1000:10.1f} ms/lookup   "
+              f"in-memory map: {map_us:6.2f} us/lookup (load {load_ms:.0f} ms)")
+
+        if args.mongo_uri:
+            client = MongoClient(args.mongo_uri)
+            real = client.bench_station_lookup.baobao
+            real.drop()
+            real.insert_many([dict(park) for park in parks])
+            real.create_index("stations.id")
+            indexed_us = time_lookups(lambda sid: indexed_lookup(real, sid), station_ids)
+            print(f"parents={size:>7}  indexed find_one + $elemMatch: {indexed_us:8.1f} us/lookup")
+            client.drop_database("bench_station_lookup")
+            client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Local stand-in for the FLO API, so crawls and crawl jobs run without network access.
+
+Serves markers/search (parks grouped into clusters below --cluster-max-zoom, like the
+real map) and parks/station/{id} for a seeded set of synthetic parks. --churn is the
+share of stations whose status flips between two crawls.
+
+Run from the server directory, then point the app at it:
+    python -m bench.fake_flo --port 8081 --parks 2000
+    FLO_MARKERS_URL=http://127.0.0.1:8081/v3.0/map/markers/search \\
+    FLO_STATION_URL=http://127.0.0.1:8081/v3.0/parks/station/{station_id} fastapi dev main.py
+"""
+import argparse
+import random
+
+from fastapi import FastAPI, HTTPException, Request
+
+from bench.synthetic import flo_parks
+from calculus import lat_lon_to_tile_xy
+
+STATUSES = ["Available", "InUse", "OutOfService"]
+
+
+# Where the parks of `python -m bench.fake_flo` are spread (Hamilton to Toronto)
+DEFAULT_BOUNDS = {
+    "SouthWest": {"Latitude": 43.0, "Longitude": -80.5},
+    "NorthEast": {"Latitude": 44.0, "Longitude": -79.0},
+}
+
+
+def create_app(parks, cluster_max_zoom=16, cluster_px=60, churn=0.0, seed=0):
+    """
+    FastAPI app answering the two FLO endpoints the crawler uses.
+    """
+    app = FastAPI()
+    rng = random.Random(seed)
+    stations = {station["id"]: park for park in parks for station in park["stations"]}
+    app.state.requests = 0
+
+    @app.post("/v3.0/map/markers/search")
+    async def markers_search(request: Request):
+        body = await request.json()
+        app.state.requests += 1
+        zoom = body["zoomLevel"]
+        south_west, north_east = body["bounds"]["southWest"], body["bounds"]["northEast"]
+        inside = [
+            park for park in parks
+            if south_west["latitude"] <= park["geoCoordinates"]["latitude"] < north_east["latitude"]
+            and south_west["longitude"] <= park["geoCoordinates"]["longitude"] < north_east["longitude"]
+        ]
+        if zoom >= cluster_max_zoom:
+            return {"parks": inside, "clusters": []}
+
+        cells = {}
+        for park in inside:
+            px, py = lat_lon_to_tile_xy(park["geoCoordinates"]["latitude"], park["geoCoordinates"]["longitude"], zoom)
+            cells.setdefault((int(px * 256 // cluster_px), int(py * 256 // cluster_px)), []).append(park)
+
+        markers, clusters = [], []
+        for members in cells.values():
+            if len(members) == 1:
+                markers.append(members[0])
+                continue
+            clusters.append({
+                "count": len(members),
+                "geoCoordinates": {
+                    "latitude": sum(p["geoCoordinates"]["latitude"] for p in members) / len(members),
+                    "longitude": sum(p["geoCoordinates"]["longitude"] for p in members) / len(members),
+                },
+            })
+        return {"parks": markers, "clusters": clusters}
+
+    @app.post("/churn")
+    async def apply_churn():
+        """
+        Flip the status of a --churn share of stations (call between two crawls).
+        """
+        flipped = 0
+        for park in parks:
+            for station in park["stations"]:
+                if rng.random() < churn:
+                    station["status"] = rng.choice([s for s in STATUSES if s != station["status"]])
+                    flipped += 1
+        return {"flipped": flipped}
+
+    @app.get("/v3.0/parks/station/{station_id}")
+    async def station(station_id: str):
+        park = stations.get(station_id)
+        if park is None:
+            raise HTTPException(status_code=404, detail="Unknown station")
+        return {"id": station_id, "address": {"address1": f"{park['name']} Street", "city": "Toronto"}}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--parks", type=int, default=2000)
+    parser.add_argument("--churn", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    parks = flo_parks(args.parks, args.seed, bounds=DEFAULT_BOUNDS)
+    uvicorn.run(create_app(parks, churn=args.churn, seed=args.seed), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+"""
+Record/replay fixtures for the upstream APIs: FLO markers/search and
+parks/station/{id} (over httpx) and Google geocode/directions (googlemaps).
+
+A fixture file is JSON:
+    {"http": {"POST /v3.0/map/markers/search {...}": {"status": 200, "body": ...}, ...},
+     "geocode": {address: result}, "directions": {"origin|destination": result},
+     "bounds": ..., "routes": [[origin, destination], ...]}
+
+HTTP entries are keyed on method, path and JSON body (not host), so a recording replays
+whatever the flo_markers_url / flo_station_url settings point at.
+
+Record offline from the fake FLO API and synthetic Google responses (deterministic,
+no network or keys needed), or from the live APIs:
+    python -m bench.fixtures --out bench/recordings/fake.json
+    python -m bench.fixtures --source live --out bench/recordings/live.json
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+import httpx
+import polyline
+
+# Crawled by the recording and by the find_parks scenario (Hamilton / Burlington)
+DEFAULT_BOUNDS = {
+    "SouthWest": {"Latitude": 43.20, "Longitude": -80.00},
+    "NorthEast": {"Latitude": 43.40, "Longitude": -79.70},
+}
+DEFAULT_ROUTES = [
+    ["Hamilton, ON", "Toronto, ON"],
+    ["Toronto, ON", "Ottawa, ON"],
+    ["Kitchener, ON", "London, ON"],
+    ["Ottawa, ON", "Montreal, QC"],
+    ["43.2557,-79.8711", "43.6532,-79.3832"],
+    ["Toronto, ON", "Barrie, ON"],
+    ["London, ON", "Windsor, ON"],
+    ["Montreal, QC", "Quebec City, QC"],
+]
+
+
+def request_key(method, url, body=b""):
+    key = f"{method} {urlsplit(str(url)).path}"
+    if body:
+        try:
+            key += " " + json.dumps(json.loads(body), sort_keys=True, separators=(",", ":"))
+        except ValueError:
+            key += " " + body.decode(errors="replace")
+    return key
+
+
+class Fixtures:
+    def __init__(self, data=None):
+        data = data or {}
+        self.http = data.get("http", {})
+        self.geocode = data.get("geocode", {})
+        self.directions = data.get("directions", {})
+        self.bounds = data.get("bounds", DEFAULT_BOUNDS)
+        self.routes = data.get("routes", DEFAULT_ROUTES)
+        self.misses = 0
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump({
+                "http": self.http,
+                "geocode": self.geocode,
+                "directions": self.directions,
+                "bounds": self.bounds,
+                "routes": self.routes,
+            }, f, sort_keys=True)
+
+    def digest(self):
+        return hashlib.sha1(json.dumps([self.http, self.geocode, self.directions], sort_keys=True).encode()).hexdigest()
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """
+    Answers httpx requests from the fixtures; unrecorded requests get a 404 and are counted.
+    """
+
+    def __init__(self, fixtures):
+        self.fixtures = fixtures
+
+    async def handle_async_request(self, request):
+        entry = self.fixtures.http.get(request_key(request.method, request.url, await request.aread()))
+        if entry is None:
+            self.fixtures.misses += 1
+            return httpx.Response(404, json={"error": "not recorded"}, request=request)
+        return httpx.Response(entry["status"], json=entry["body"], request=request)
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    def __init__(self, fixtures, inner):
+        self.fixtures = fixtures
+        self.inner = inner
+
+    async def handle_async_request(self, request):
+        body = await request.aread()
+        response = await self.inner.handle_async_request(request)
+        content = await response.aread()
+        self.fixtures.http[request_key(request.method, request.url, body)] = {
+            "status": response.status_code,
+            "body": json.loads(content) if content else None,
+        }
+        return httpx.Response(response.status_code, content=content, headers=response.headers, request=request)
+
+
+class ReplayGmaps:
+    """
+    Stand-in for googlemaps.Client answering geocode/directions from the fixtures.
+    """
+
+    def __init__(self, fixtures):
+        self.fixtures = fixtures
+
+    def geocode(self, address):
+        if address not in self.fixtures.geocode:
+            self.fixtures.misses += 1
+            return []
+        return self.fixtures.geocode[address]
+
+    def directions(self, origin, destination, mode="driving"):
+        result = self.fixtures.directions.get(f"{origin}|{destination}")
+        if result is None:
+            self.fixtures.misses += 1
+            return []
+        return result
+
+
+class RecordingGmaps:
+    def __init__(self, fixtures, client):
+        self.fixtures = fixtures
+        self.client = client
+
+    def geocode(self, address):
+        result = self.fixtures.geocode[address] = self.client.geocode(address)
+        return result
+
+    def directions(self, origin, destination, mode="driving"):
+        result = self.fixtures.directions[f"{origin}|{destination}"] = self.client.directions(
+            origin, destination, mode=mode
+        )
+        return result
+
+
+class SyntheticGmaps:
+    """
+    Deterministic fake Google responses: city names from bench.synthetic.CITIES geocode
+    to their centre, and directions follow a gently curved line between the endpoints.
+    """
+
+    def __init__(self, seed=0):
+        self.seed = seed
+
+    def _locate(self, address):
+        from bench.synthetic import CITIES
+
+        parts = address.split(",")
+        if len(parts) == 2:
+            try:
+                return float(parts[0]), float(parts[1])
+            except ValueError:
+                pass
+        for name, lat, lon, _, _ in CITIES:
+            if address.lower().startswith(name.lower()):
+                return lat, lon
+        rng = random.Random(f"{self.seed}:{address}")
+        return 43 + rng.random() * 3, -81 + rng.random() * 8
+
+    def geocode(self, address):
+        lat, lon = self._locate(address)
+        return [{"geometry": {"location": {"lat": lat, "lng": lon}}, "formatted_address": address}]
+
+    def directions(self, origin, destination, mode="driving"):
+        (lat1, lon1), (lat2, lon2) = self._locate(origin), self._locate(destination)
+        bend = random.Random(f"{self.seed}:{origin}|{destination}").uniform(-0.15, 0.15)
+        points = []
+        for i in range(201):
+            t = i / 200
+            offset = bend * math.sin(math.pi * t)
+            points.append((lat1 + (lat2 - lat1) * t + offset, lon1 + (lon2 - lon1) * t - offset))
+        return [{"overview_polyline": {"points": polyline.encode(points)}}]
+
+
+class _NoCache:
+    """
+    Address cache that never hits, so the recording fetches every address.
+    """
+
+    def get_many(self, station_ids):
+        return {}
+
+    def put_many(self, addresses):
+        pass
+
+    def stats(self):
+        return {}
+
+
+@contextmanager
+def default_transport(transport):
+    """
+    Make every httpx.AsyncClient created without an explicit transport use `transport`
+    (the crawler and the address enricher create their own clients).
+    """
+    original = httpx.AsyncClient.__init__
+
+    def init(self, *args, **kwargs):
+        if kwargs.get("transport") is None:
+            kwargs["transport"] = transport
+        original(self, *args, **kwargs)
+
+    httpx.AsyncClient.__init__ = init
+    try:
+        yield
+    finally:
+        httpx.AsyncClient.__init__ = original
+
+
+async def record(fixtures, transport, gmaps, settings, parks_limit=None):
+    """
+    Crawl fixtures.bounds, fetch the crawled stations' addresses and resolve every route,
+    recording all upstream responses.
+    """
+    from addresses import AddressEnricher
+    from calculus import get_bounds_zoom_level
+    from crawler import SEARCH_MAP_DIM, ClusterCrawler
+
+    recording = RecordingTransport(fixtures, transport)
+    async with httpx.AsyncClient(transport=recording) as client:
+        async with ClusterCrawler(api_url=settings.flo_markers_url, client=client, rate_per_second=1000) as crawler:
+            parks = await crawler.crawl(fixtures.bounds, get_bounds_zoom_level(fixtures.bounds, SEARCH_MAP_DIM))
+        station_ids = [park["stations"][0]["id"] for park in parks[:parks_limit] if park.get("stations")]
+        enricher = AddressEnricher(cache=_NoCache(), station_url=settings.flo_station_url, client=client)
+        await enricher.enrich(station_ids)
+
+    recorder = RecordingGmaps(fixtures, gmaps)
+    for origin, destination in fixtures.routes:
+        for address in (origin, destination):
+            recorder.geocode(address)
+        recorder.directions(origin, destination, mode="driving")
+    return len(parks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", choices=["fake", "live"], default="fake")
+    parser.add_argument("--out", default="bench/recordings/fake.json")
+    parser.add_argument("--fake-parks", type=int, default=400, help="parks served by the fake FLO API")
+    parser.add_argument("--addresses", type=int, default=None, help="record addresses of the first N parks only")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    from settings import Settings
+
+    settings = Settings.from_env()
+    fixtures = Fixtures()
+    if args.source == "live":
+        import googlemaps
+
+        transport = httpx.AsyncHTTPTransport(retries=1)
+        gmaps = googlemaps.Client(key=settings.google_maps_api_key)
+    else:
+        from bench.fake_flo import create_app
+        from bench.synthetic import flo_parks
+
+        parks = flo_parks(args.fake_parks, args.seed, bounds=fixtures.bounds)
+        transport = httpx.ASGITransport(app=create_app(parks, seed=args.seed))
+        gmaps = SyntheticGmaps(args.seed)
+
+    parks = asyncio.run(record(fixtures, transport, gmaps, settings, args.addresses))
+    fixtures.save(args.out)
+    print(f"Recorded {len(fixtures.http)} HTTP responses ({parks} parks), {len(fixtures.geocode)} geocodes "
+          f"and {len(fixtures.directions)} routes to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
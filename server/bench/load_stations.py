@@ -0,0 +1,105 @@
+"""
+Concurrency load test for the read endpoints.
+
+Seeds synthetic parks into a local mongod (--mongo-uri) or a mongomock stand-in,
+drives the ASGI app in-process with N concurrent clients and reports p50/p99 latency.
+The in-memory snapshots are off unless --snapshot is given, so requests go through the
+Mongo pool and the I/O threads. mongomock does not implement $geoNear, so /stations
+then needs a real mongod; the other read endpoints, and every endpoint with
+--snapshot, work with either.
+
+Run from the server directory:
+    python -m bench.load_stations --mongo-uri mongodb://localhost:27017 --concurrency 200
+    python -m bench.load_stations --path "/station/station-1-0"
+    python -m bench.load_stations --snapshot
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from collections import Counter
+
+import httpx
+
+from bench.synthetic import generate_parks
+from settings import Settings
+
+
+def percentile(ordered, p):
+    return ordered[min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))]
+
+
+async def run_load(app, path, concurrency, requests_per_client):
+    latencies = []
+    statuses = Counter()
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def worker():
+            for _ in range(requests_per_client):
+                started = time.perf_counter()
+                response = await client.get(path)
+                latencies.append(time.perf_counter() - started)
+                statuses[response.status_code] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    ordered = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "statuses": dict(statuses),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(ordered, 50) * 1000, 1),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 1),
+        "mean_ms": round(statistics.mean(ordered) * 1000, 1),
+    }
+
+
+async def main_async(args):
+    import database
+
+    if args.mongo_uri:
+        from pymongo import MongoClient
+        client = MongoClient(args.mongo_uri)
+    else:
+        import mongomock
+        client = mongomock.MongoClient()
+    settings = Settings(
+        mongo_database=args.database,
+        google_maps_api_key="AIzaLoadTestPlaceholderKey",
+        snapshot_enabled=args.snapshot,
+    )
+    database.set_client(client)
+    database.use_database(settings.mongo_database)
+
+    collection = database.get_collection("baobao")
+    collection.delete_many({})
+    collection.insert_many(generate_parks(args.parks, args.seed))
+
+    import main
+    app = main.create_app(settings)
+    async with main.lifespan(app):
+        result = await run_load(app, args.path, args.concurrency, args.requests_per_client)
+
+    if args.mongo_uri:
+        client.drop_database(args.database)
+    print(f"{args.path} parks={args.parks} concurrency={args.concurrency} snapshot={args.snapshot}: {result}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-uri", default=None, help="local mongod; omit to use mongomock")
+    parser.add_argument("--database", default="bench_load")
+    parser.add_argument("--path", default="/stations?lat=43.25&lon=-79.93&radius_km=5")
+    parser.add_argument("--parks", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--requests-per-client", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=3)
+    parser.add_argument("--snapshot", action="store_true", help="serve reads from the in-memory snapshots")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
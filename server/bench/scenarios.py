@@ -0,0 +1,269 @@
+"""
+Scripted load scenarios against the ASGI app, offline and reproducible.
+
+Seeds synthetic parks (bench.synthetic) into mongomock or a local mongod, replays
+upstream FLO/Google responses from a fixture file (bench.fixtures; recorded from the
+fake FLO API on first use) and drives /stations, /station/{id}, /chargers-on-route and
+/find_parks in-process. Reports throughput, p50/p95/p99 latency and peak RSS per
+scenario and writes them as JSON, to compare against a run from another commit.
+
+Run from the server directory:
+    python -m bench.scenarios --parks 10000
+    python -m bench.scenarios --mongo-uri mongodb://localhost:27017 --scenario stations --scenario find_parks
+    python -m bench.scenarios --compare bench/results/<other commit>.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+import httpx
+
+from bench.fixtures import Fixtures, ReplayGmaps, ReplayTransport, default_transport
+from bench.load_stations import percentile
+from bench.synthetic import generate_parks, sample_points
+from settings import Settings
+
+DEFAULT_FIXTURES = "bench/recordings/fake.json"
+
+
+def stations_request(context, rng):
+    lat, lon = rng.choice(context["points"])
+    return "GET", f"/stations?lat={lat:.5f}&lon={lon:.5f}&radius_km=5", None
+
+
+def station_detail_request(context, rng):
+    return "GET", f"/station/{rng.choice(context['station_ids'])}", None
+
+
+def chargers_on_route_request(context, rng):
+    origin, destination = rng.choice(context["routes"])
+    return "GET", "/chargers-on-route", {"origin": origin, "destination": destination, "max_distance": 2}
+
+
+def find_parks_request(context, rng):
+    return "POST", "/find_parks", {"bounds": context["bounds"], "wait": True}
+
+
+# name: (request factory, default concurrency, default number of requests)
+SCENARIOS = {
+    "stations": (stations_request, 50, 2000),
+    "station_detail": (station_detail_request, 50, 2000),
+    "chargers_on_route": (chargers_on_route_request, 20, 400),
+    "find_parks": (find_parks_request, 1, 3),
+}
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        # Peak since process start (kilobytes on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+
+class RssSampler:
+    """
+    Highest resident set size seen while the block runs, sampled every `interval` seconds.
+    """
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.peak = 0.0
+        self._stop = threading.Event()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, rss_mb())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = rss_mb()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, rss_mb())
+
+
+async def run_scenario(client, make_request, context, concurrency, total, warmup, seed):
+    rng = random.Random(seed)
+    warmup = min(warmup, total)
+    requests = [make_request(context, rng) for _ in range(warmup + total)]
+
+    async def send(method, path, payload):
+        if method == "GET":
+            return await client.get(path, params=payload)
+        return await client.post(path, json=payload)
+
+    for method, path, payload in requests[:warmup]:
+        await send(method, path, payload)
+
+    latencies = []
+    statuses = Counter()
+    pending = iter(requests[warmup:])
+
+    async def worker():
+        for method, path, payload in pending:
+            started = time.perf_counter()
+            response = await send(method, path, payload)
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] += 1
+
+    with RssSampler() as rss:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    ordered = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "concurrency": concurrency,
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "throughputRps": round(len(latencies) / elapsed, 1),
+        "p50Ms": round(percentile(ordered, 50) * 1000, 2),
+        "p95Ms": round(percentile(ordered, 95) * 1000, 2),
+        "p99Ms": round(percentile(ordered, 99) * 1000, 2),
+        "meanMs": round(statistics.mean(ordered) * 1000, 2),
+        "peakRssMb": round(rss.peak, 1),
+    }
+
+
+def load_fixtures(path):
+    if not os.path.exists(path):
+        print(f"{path} not found; recording it from the fake FLO API")
+        subprocess.run([sys.executable, "-m", "bench.fixtures", "--out", path], check=True)
+    return Fixtures.load(path)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def main_async(args):
+    import database
+
+    if args.mongo_uri:
+        from pymongo import MongoClient
+        client = MongoClient(args.mongo_uri)
+    else:
+        import mongomock
+        client = mongomock.MongoClient()
+    # The replayed FLO API answers at once, so the crawl is not throttled
+    settings = Settings(
+        mongo_database=args.database,
+        google_maps_api_key="bench",
+        flo_rate_limit_per_second=10000,
+    )
+    database.set_client(client)
+    database.use_database(settings.mongo_database)
+
+    parks = generate_parks(args.parks, args.seed)
+    for name in ("baobao", "uxpropertegypt"):
+        collection = database.get_collection(name)
+        collection.delete_many({})
+        collection.insert_many([dict(park) for park in parks])
+
+    fixtures = load_fixtures(args.fixtures)
+    context = {
+        "points": sample_points(parks, 1000, args.seed),
+        "station_ids": [station["id"] for park in parks for station in park["stations"]],
+        "routes": fixtures.routes,
+        "bounds": fixtures.bounds,
+    }
+
+    import main
+    main.gmaps = ReplayGmaps(fixtures)
+    app = main.create_app(settings)
+    results = {}
+    with default_transport(ReplayTransport(fixtures)):
+        async with main.lifespan(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as http:
+                for name in args.scenario or SCENARIOS:
+                    make_request, concurrency, total = SCENARIOS[name]
+                    results[name] = await run_scenario(
+                        http, make_request, context,
+                        args.concurrency or concurrency, args.requests or total,
+                        args.warmup, args.seed,
+                    )
+                    print(f"{name:<18} {json.dumps(results[name])}")
+
+    if args.mongo_uri:
+        client.drop_database(args.database)
+
+    return {
+        "commit": git_commit(),
+        "recordedAt": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "backend": "mongod" if args.mongo_uri else "mongomock",
+        "parks": args.parks,
+        "seed": args.seed,
+        "fixtures": fixtures.digest(),
+        "fixtureMisses": fixtures.misses,
+        "scenarios": results,
+    }
+
+
+def compare(report, baseline):
+    print(f"\nvs {baseline.get('commit')} ({baseline.get('recordedAt')})")
+    for name, result in report["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if before is None:
+            continue
+        changes = []
+        for key in ("throughputRps", "p50Ms", "p95Ms", "p99Ms", "peakRssMb"):
+            if before.get(key):
+                changes.append(f"{key} {before[key]} -> {result[key]} ({(result[key] / before[key] - 1) * 100:+.1f}%)")
+        print(f"  {name:<18} " + ", ".join(changes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-uri", default=None, help="local mongod; omit to use mongomock")
+    parser.add_argument("--database", default="bench_scenarios")
+    parser.add_argument("--parks", type=int, default=5000)
+    parser.add_argument("--scenario", action="append", choices=list(SCENARIOS), help="Repeatable; defaults to all")
+    parser.add_argument("--concurrency", type=int, default=None, help="Override every scenario's concurrency")
+    parser.add_argument("--requests", type=int, default=None, help="Override every scenario's request count")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", default=None, help="Defaults to bench/results/<commit>.json")
+    parser.add_argument("--compare", default=None, help="Earlier result file to diff against")
+    args = parser.parse_args()
+
+    report = asyncio.run(main_async(args))
+    out = args.out or f"bench/results/{report['commit'] or 'local'}.json"
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {out}" + (f" ({report['fixtureMisses']} requests missing from the fixtures)" if report["fixtureMisses"] else ""))
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
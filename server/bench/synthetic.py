@@ -0,0 +1,157 @@
+"""
+Synthetic parks matching the DataModel/Station schema, at a realistic density:
+most parks cluster around Southern Ontario / Quebec cities (weighted by size), the
+rest line the highways between them. Seeded, so a given (n, seed) always yields the
+same parks.
+
+    from bench.synthetic import generate_parks
+    parks = generate_parks(10000, seed=1)
+
+flo_parks() gives the same parks as the FLO markers API returns them (for bench.fake_flo).
+"""
+import math
+import random
+from datetime import datetime
+
+from ingest import prepare_park, stations_hash
+
+# (name, latitude, longitude, spread in km, weight)
+CITIES = [
+    ("Toronto", 43.6532, -79.3832, 18, 30),
+    ("Mississauga", 43.5890, -79.6441, 10, 8),
+    ("Hamilton", 43.2557, -79.8711, 9, 6),
+    ("Ottawa", 45.4215, -75.6972, 14, 10),
+    ("Montreal", 45.5017, -73.5673, 16, 20),
+    ("Quebec City", 46.8139, -71.2080, 10, 6),
+    ("London", 42.9849, -81.2453, 8, 4),
+    ("Kitchener", 43.4516, -80.4925, 8, 4),
+    ("Windsor", 42.3149, -83.0364, 7, 3),
+    ("Kingston", 44.2312, -76.4860, 6, 2),
+    ("Barrie", 44.3894, -79.6903, 6, 2),
+]
+# Pairs of CITIES indexes joined by a highway corridor
+HIGHWAYS = [(0, 2), (0, 7), (7, 6), (6, 8), (0, 9), (9, 3), (3, 4), (4, 5), (0, 10), (1, 2)]
+# Share of parks along highways rather than around cities
+HIGHWAY_SHARE = 0.15
+
+STATUSES = (("Available", 0.6), ("InUse", 0.3), ("OutOfService", 0.1))
+# (level, connectors, charging speeds in kW, weight)
+CHARGER_TYPES = (
+    ("L2", ["IEC_62196_T1"], (7, 11), 0.75),
+    ("L3", ["IEC_62196_T1_COMBO"], (50, 100, 150, 350), 0.15),
+    ("L3", ["CHADEMO", "IEC_62196_T1_COMBO"], (50, 100), 0.10),
+)
+PROVINCES = {"Montreal": "QC", "Quebec City": "QC"}
+
+KM_PER_DEG_LAT = 111.32
+
+
+def _weighted(rng, choices):
+    return rng.choices(choices, weights=[choice[-1] for choice in choices])[0]
+
+
+def _location(rng, bounds=None):
+    """
+    (latitude, longitude, city) of one park; uniform over `bounds` when given.
+    """
+    if bounds is not None:
+        south_west, north_east = bounds["SouthWest"], bounds["NorthEast"]
+        lat = south_west["Latitude"] + rng.random() * (north_east["Latitude"] - south_west["Latitude"])
+        lon = south_west["Longitude"] + rng.random() * (north_east["Longitude"] - south_west["Longitude"])
+        city = min(CITIES, key=lambda c: (c[1] - lat) ** 2 + (c[2] - lon) ** 2)[0]
+        return lat, lon, city
+    if rng.random() < HIGHWAY_SHARE:
+        a, b = rng.choice(HIGHWAYS)
+        t = rng.random()
+        start, end = CITIES[a], CITIES[b]
+        lat = start[1] + (end[1] - start[1]) * t
+        lon = start[2] + (end[2] - start[2]) * t
+        spread_km, city = 2.0, (start if t < 0.5 else end)[0]
+    else:
+        name, lat, lon, spread_km, _ = _weighted(rng, CITIES)
+        city = name
+    lat += rng.gauss(0, spread_km) / KM_PER_DEG_LAT
+    lon += rng.gauss(0, spread_km) / (KM_PER_DEG_LAT * math.cos(math.radians(lat)))
+    return lat, lon, city
+
+
+def _stations(rng, park_index):
+    level, connectors, speeds, _ = _weighted(rng, CHARGER_TYPES)
+    # Level 2 sites are mostly one or two posts; fast-charging hubs are bigger
+    count = min(int(rng.expovariate(0.8)) + 1, 4) if level == "L2" else rng.randint(2, 10)
+    speed = rng.choice(speeds)
+    return [
+        {
+            "id": f"station-{park_index}-{j}",
+            "connectors": list(connectors),
+            "status": _weighted(rng, STATUSES)[0],
+            "level": level,
+            "freeOfCharge": level == "L2" and rng.random() < 0.1,
+            "name": f"Station {park_index}-{j}",
+            "chargingSpeed": speed,
+        }
+        for j in range(count)
+    ]
+
+
+def generate_parks(n, seed=0, now=None, bounds=None):
+    """
+    n park documents as they are stored after ingest (summary, geoPoint,
+    stationsHash, lastUpdated and timestamp included). With `bounds` (SouthWest /
+    NorthEast, as in /find_parks) the parks are spread uniformly over that box instead.
+    """
+    rng = random.Random(seed)
+    now = now or datetime(2025, 1, 11, 12, 0)
+    parks = []
+    for i in range(n):
+        lat, lon, city = _location(rng, bounds)
+        park = {
+            "id": f"park-{i}",
+            "name": f"{city} Park {i}",
+            "networkId": rng.choice((10, 10, 10, 20)),
+            "geoCoordinates": {"latitude": round(lat, 6), "longitude": round(lon, 6)},
+            "stations": _stations(rng, i),
+            "address": {
+                "address1": f"{rng.randint(1, 9999)} Main St",
+                "address2": "",
+                "city": city,
+                "country": "CA",
+                "province": PROVINCES.get(city, "ON"),
+                "postalCode": "",
+            },
+            "metadata": {"location": f"{city} Park {i}"},
+            "timestamp": now,
+        }
+        prepare_park(park, now)
+        park["stationsHash"] = stations_hash(park)
+        parks.append(park)
+    return parks
+
+
+# Added at ingest (prepare_park) rather than returned by markers/search
+STORED_FIELDS = ("address", "metadata", "timestamp", "lastUpdated", "geoPoint", "summary", "stationsHash")
+
+
+def flo_parks(n, seed=0, bounds=None):
+    """
+    generate_parks() without the fields added at ingest, as markers/search returns them.
+    """
+    return [
+        {key: value for key, value in park.items() if key not in STORED_FIELDS}
+        for park in generate_parks(n, seed, bounds=bounds)
+    ]
+
+
+def sample_points(parks, k, seed=0):
+    """
+    k query points near random parks (how clients actually search).
+    """
+    rng = random.Random(seed)
+    points = []
+    for _ in range(k):
+        coordinates = rng.choice(parks)["geoCoordinates"]
+        points.append((
+            coordinates["latitude"] + rng.gauss(0, 0.02),
+            coordinates["longitude"] + rng.gauss(0, 0.02),
+        ))
+    return points
@@ -26,3 +26,53 @@ def get_bounds_zoom_level(bounds, map_dim):
     lng_zoom = zoom(map_dim["width"], WORLD_DIM["width"], lng_fraction)
 
     return min(lat_zoom, lng_zoom, ZOOM_MAX)
+
+
+# Slippy-map (Web-Mercator) tiles, the same projection get_bounds_zoom_level assumes
+MAX_MERCATOR_LAT = 85.0511287798
+
+
+def lat_lon_to_tile_xy(lat, lon, zoom):
+    # Fractional tile coordinates; multiply by 256 for world pixels
+    n = 2 ** zoom
+    lat = max(min(lat, MAX_MERCATOR_LAT), -MAX_MERCATOR_LAT)
+    x = (lon + 180) / 360 * n
+    y = (1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n
+    return x, y
+
+
+def lat_lon_to_tile(lat, lon, zoom):
+    n = 2 ** zoom
+    x, y = lat_lon_to_tile_xy(lat, lon, zoom)
+    return min(max(int(x), 0), n - 1), min(max(int(y), 0), n - 1)
+
+
+def tile_bounds(x, y, zoom):
+    return tile_area_bounds(x, y, x + 1, y + 1, zoom)
+
+
+def tile_area_bounds(min_x, min_y, max_x, max_y, zoom):
+    """
+    Bounds of the area between two (possibly fractional) tile coordinates.
+    """
+    n = 2 ** zoom
+
+    def tile_lat(tile_y):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * tile_y / n))))
+
+    return {
+        "SouthWest": {"Latitude": tile_lat(max_y), "Longitude": min_x / n * 360 - 180},
+        "NorthEast": {"Latitude": tile_lat(min_y), "Longitude": max_x / n * 360 - 180},
+    }
+
+
+def tiles_for_bounds(bounds, zoom):
+    ne = bounds["NorthEast"]
+    sw = bounds["SouthWest"]
+    min_x, min_y = lat_lon_to_tile(ne["Latitude"], sw["Longitude"], zoom)
+    max_x, max_y = lat_lon_to_tile(sw["Latitude"], ne["Longitude"], zoom)
+    return [(x, y) for x in range(min_x, max_x + 1) for y in range(min_y, max_y + 1)]
+
+
+def child_tiles(x, y, zoom):
+    return [(2 * x + dx, 2 * y + dy, zoom + 1) for dy in (0, 1) for dx in (0, 1)]
@@ -0,0 +1,103 @@
+"""
+Columnar layout for lists of parks (format=columnar and format=msgpack).
+
+Instead of one object per park and per station, every field becomes one array:
+
+    {
+      "count": 2,
+      "parks": {"id": [...], "name": [...], "geoCoordinates.latitude": [...], ...},
+      "stationOffsets": [0, 3, 5],
+      "stations": {"id": [...], "status": [0, 1, 0, ...], "chargingSpeed": [...], ...},
+      "dictionaries": {"status": ["Available", "InUse"], ...}
+    }
+
+Object-valued park fields are flattened one level into dotted columns. The stations
+of park i are rows stationOffsets[i]:stationOffsets[i + 1] of the station columns.
+Fields in DICTIONARY_FIELDS hold indexes into the matching "dictionaries" list.
+Missing values are null.
+"""
+
+# Station fields with only a handful of distinct values across all parks
+DICTIONARY_FIELDS = ("status", "level", "connectors")
+
+
+def _column(columns, name, size):
+    column = columns.get(name)
+    if column is None:
+        column = columns[name] = [None] * size
+    return column
+
+
+def columnar(parks):
+    """
+    Columnar table of a list of park documents (see the module docstring).
+    """
+    parks = list(parks)
+    total_stations = sum(len(park.get("stations") or []) for park in parks)
+    park_columns, station_columns = {}, {}
+    codes = {field: {} for field in DICTIONARY_FIELDS}
+    offsets = [0]
+
+    row = 0
+    for i, park in enumerate(parks):
+        for key, value in park.items():
+            if key == "stations":
+                continue
+            if isinstance(value, dict):
+                for sub_key, sub_value in value.items():
+                    _column(park_columns, f"{key}.{sub_key}", len(parks))[i] = sub_value
+            else:
+                _column(park_columns, key, len(parks))[i] = value
+
+        for station in park.get("stations") or []:
+            for key, value in station.items():
+                if key in codes and value is not None:
+                    lookup = tuple(value) if isinstance(value, list) else value
+                    value = codes[key].setdefault(lookup, len(codes[key]))
+                _column(station_columns, key, total_stations)[row] = value
+            row += 1
+        offsets.append(row)
+
+    return {
+        "count": len(parks),
+        "parks": park_columns,
+        "stationOffsets": offsets,
+        "stations": station_columns,
+        "dictionaries": {
+            field: [list(value) if isinstance(value, tuple) else value for value in values]
+            for field, values in codes.items() if values
+        },
+    }
+
+
+def from_columnar(table):
+    """
+    Park documents back from a columnar table. Dotted columns become nested objects;
+    null cells are left out.
+    """
+    dictionaries = table.get("dictionaries", {})
+    offsets = table["stationOffsets"]
+    parks = []
+    for i in range(table["count"]):
+        park = {}
+        for name, column in table["parks"].items():
+            if column[i] is None:
+                continue
+            key, _, sub_key = name.partition(".")
+            if sub_key:
+                park.setdefault(key, {})[sub_key] = column[i]
+            else:
+                park[key] = column[i]
+
+        stations = []
+        for row in range(offsets[i], offsets[i + 1]):
+            station = {}
+            for key, column in table["stations"].items():
+                value = column[row]
+                if value is None:
+                    continue
+                station[key] = dictionaries[key][value] if key in dictionaries else value
+            stations.append(station)
+        park["stations"] = stations
+        parks.append(park)
+    return parks
@@ -0,0 +1,184 @@
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from repository import run_io
+from settings import DEFAULTS
+from tracing import span
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+# Chunks at least this big are compressed on the I/O thread pool, off the event loop
+COMPRESSION_THREAD_MIN_SIZE = 256 * 1024
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "application/msgpack", "text/")
+
+
+def negotiate_encoding(accept_encoding, brotli_available=BROTLI_AVAILABLE):
+    """
+    'br', 'gzip' or None for an Accept-Encoding header. Highest q-value wins;
+    brotli is preferred on a tie.
+    """
+    weights = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[coding] = q
+
+    candidates = ["br", "gzip"] if brotli_available else ["gzip"]
+    best, best_q = None, 0.0
+    for coding in candidates:
+        q = weights.get(coding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+class _GzipEncoder:
+    def __init__(self, level=DEFAULTS.gzip_level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def encode(self, chunk, final):
+        flush_mode = zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH
+        return self._compressor.compress(chunk) + self._compressor.flush(flush_mode)
+
+
+class _BrotliEncoder:
+    def __init__(self, quality=DEFAULTS.brotli_quality):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def encode(self, chunk, final):
+        data = self._compressor.process(chunk)
+        return data + (self._compressor.finish() if final else self._compressor.flush())
+
+
+ENCODERS = {"gzip": _GzipEncoder, "br": _BrotliEncoder}
+
+
+class CompressionStats:
+    def __init__(self):
+        self.min_size = DEFAULTS.compression_min_size
+        self.responses = {"br": 0, "gzip": 0}
+        self.below_min_size = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def to_dict(self):
+        return {
+            "brotliAvailable": BROTLI_AVAILABLE,
+            "minSize": self.min_size,
+            "responses": dict(self.responses),
+            "belowMinSize": self.below_min_size,
+            "bytesIn": self.bytes_in,
+            "bytesOut": self.bytes_out,
+            "ratio": round(self.bytes_out / self.bytes_in, 3) if self.bytes_in else None,
+        }
+
+
+compression_stats = CompressionStats()
+
+
+class CompressionMiddleware:
+    """
+    Compress response bodies with brotli or gzip, as negotiated from Accept-Encoding.
+
+    Only JSON, NDJSON, MessagePack and text bodies of at least minimum_size bytes are
+    compressed. Streaming responses (format=ndjson) are compressed chunk by chunk,
+    flushing after each one so clients can parse rows as they arrive. Responses that
+    already carry a Content-Encoding are passed through, and strong ETags are weakened
+    since the compressed body is a different representation. Mid gzip levels (1-9)
+    and brotli qualities (0-11) trade little size for a lot of CPU.
+    """
+
+    def __init__(
+        self,
+        app,
+        minimum_size=DEFAULTS.compression_min_size,
+        gzip_level=DEFAULTS.gzip_level,
+        brotli_quality=DEFAULTS.brotli_quality,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.levels = {"gzip": gzip_level, "br": brotli_quality}
+        compression_stats.min_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        encoder = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, encoder, passthrough
+            if message["type"] == "http.response.start":
+                start_message = message
+                headers = Headers(raw=message["headers"])
+                content_type = headers.get("content-type", "")
+                passthrough = (
+                    "content-encoding" in headers
+                    or message["status"] in (204, 206, 304)
+                    or not content_type.startswith(COMPRESSIBLE_TYPES)
+                )
+                if passthrough:
+                    await send(message)
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if encoder is None:
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    compression_stats.below_min_size += 1
+                    await send(start_message)
+                    await send(message)
+                    return
+                encoder = ENCODERS[encoding](self.levels[encoding])
+                headers = MutableHeaders(raw=start_message["headers"])
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                if "content-length" in headers:
+                    del headers["Content-Length"]
+                etag = headers.get("etag")
+                if etag and not etag.startswith("W/"):
+                    headers["ETag"] = f"W/{etag}"
+                compression_stats.responses[encoding] += 1
+
+            with span("compress"):
+                if len(body) >= COMPRESSION_THREAD_MIN_SIZE:
+                    compressed = await run_io(encoder.encode, body, not more_body)
+                else:
+                    compressed = encoder.encode(body, not more_body)
+            compression_stats.bytes_in += len(body)
+            compression_stats.bytes_out += len(compressed)
+
+            if start_message is not None:
+                if not more_body:
+                    MutableHeaders(raw=start_message["headers"])["Content-Length"] = str(len(compressed))
+                await send(start_message)
+                start_message = None
+            await send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,391 @@
+import asyncio
+import json
+import logging
+import math
+import random
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+import httpx
+
+from calculus import (
+    child_tiles,
+    get_bounds_zoom_level,
+    lat_lon_to_tile_xy,
+    tile_area_bounds,
+    tile_bounds,
+    tiles_for_bounds,
+)
+from metrics import CRAWL_DEPTH, CRAWL_PARKS, UPSTREAM_REQUESTS
+from settings import DEFAULTS
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Map size used to turn a tile's bounds into a search zoom level
+SEARCH_MAP_DIM = {"height": 800, "width": 800}
+
+# How far (in screen pixels) cluster members may lie from the cluster centroid
+CLUSTER_RADIUS_PX = 80
+
+
+def build_search_payload(bounds, zoom_level):
+    """
+    Build the FLO markers/search request body for a bounding box.
+    """
+    return {
+        "zoomLevel": zoom_level,
+        "bounds": {
+            "southWest": {
+                "latitude": bounds["SouthWest"]["Latitude"],
+                "longitude": bounds["SouthWest"]["Longitude"]
+            },
+            "northEast": {
+                "latitude": bounds["NorthEast"]["Latitude"],
+                "longitude": bounds["NorthEast"]["Longitude"]
+            }
+        },
+        "filter": {
+            "networkIds": [],
+            "connectors": None,
+            "levels": [],
+            "rates": [],
+            "statuses": [],
+            "minChargingSpeed": None,
+            "maxChargingSpeed": None
+        }
+    }
+
+
+class RateLimiter:
+    """
+    Token bucket per host: at most `rate` requests per second with bursts of `burst`.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self._buckets = {}
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, host):
+        if self.rate <= 0:
+            return
+        while True:
+            async with self._lock:
+                tokens, last = self._buckets.get(host, (self.burst, time.monotonic()))
+                now = time.monotonic()
+                tokens = min(self.burst, tokens + (now - last) * self.rate)
+                if tokens >= 1:
+                    self._buckets[host] = (tokens - 1, now)
+                    return
+                self._buckets[host] = (tokens, now)
+                wait = (1 - tokens) / self.rate
+            await asyncio.sleep(wait)
+
+
+class CrawlStats:
+    """
+    Progress metrics for one crawl.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.clusters_expanded = 0
+        self.parks_seen = 0
+        self.duplicate_parks = 0
+        self.tiles_skipped_visited = 0
+        self.empty_tiles_skipped = 0
+        self.stable_tiles_resolved = 0
+        self.unresolved_clusters = 0
+        self.depth_histogram = Counter()
+        self.latencies = []
+        self.started = time.monotonic()
+
+    def latency_percentiles(self):
+        if not self.latencies:
+            return {}
+        ordered = sorted(self.latencies)
+
+        def percentile(p):
+            index = min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))
+            return round(ordered[index] * 1000, 1)
+
+        return {"p50": percentile(50), "p90": percentile(90), "p99": percentile(99), "max": percentile(100)}
+
+    def redundant_fetches_avoided(self):
+        return self.tiles_skipped_visited + self.empty_tiles_skipped
+
+    def to_dict(self):
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "failures": self.failures,
+            "clustersExpanded": self.clusters_expanded,
+            "parksSeen": self.parks_seen,
+            "duplicateParks": self.duplicate_parks,
+            "redundantFetchesAvoided": self.redundant_fetches_avoided(),
+            "tilesSkippedVisited": self.tiles_skipped_visited,
+            "emptyTilesSkipped": self.empty_tiles_skipped,
+            "stableTilesResolved": self.stable_tiles_resolved,
+            "unresolvedClusters": self.unresolved_clusters,
+            "depthHistogram": {str(depth): count for depth, count in sorted(self.depth_histogram.items())},
+            "latencyMs": self.latency_percentiles(),
+            "elapsedSeconds": round(time.monotonic() - self.started, 2),
+        }
+
+
+class ClusterCrawler:
+    """
+    Expand FLO marker clusters concurrently until individual parks are reached.
+
+    The crawl follows a quadtree of slippy-map tiles, so sibling requests never
+    overlap and a tile is fetched at most once per crawler (tracked in
+    `visited_tiles`). Sibling tiles are expanded in parallel; at most
+    `max_concurrency` requests are in flight and each host is limited to
+    `rate_per_second`. One keep-alive HTTP client (HTTP/2 when the h2 package is
+    installed) is reused for the whole crawl.
+    """
+
+    def __init__(
+        self,
+        api_url=DEFAULTS.flo_markers_url,
+        max_concurrency=DEFAULTS.flo_crawl_concurrency,
+        rate_per_second=DEFAULTS.flo_rate_limit_per_second,
+        max_retries=DEFAULTS.flo_max_retries,
+        backoff_base=0.5,
+        backoff_max=8.0,
+        max_zoom=19,
+        stable_levels=2,
+        cluster_radius_px=CLUSTER_RADIUS_PX,
+        timeout=DEFAULTS.flo_request_timeout,
+        client=None,
+    ):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.api_url = api_url
+        self.host = urlsplit(api_url).netloc
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_zoom = max_zoom
+        self.timeout = timeout
+        self.rate_limiter = RateLimiter(rate_per_second)
+        self.stable_levels = stable_levels
+        self.cluster_radius_px = cluster_radius_px
+        self.stats = CrawlStats()
+        self.unique_parks = {}
+        self.visited_tiles = set()
+        self._client = client
+        self._owns_client = client is None
+        self._semaphore = None
+
+    async def __aenter__(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=HTTP2_AVAILABLE,
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency,
+                ),
+            )
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        if self._owns_client and self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _backoff(self, attempt):
+        # Full jitter: uniform over [0, min(max, base * 2^attempt)]
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def search(self, payload):
+        """
+        POST one markers/search request, retrying transient failures with backoff.
+        Returns the decoded JSON body, or None when every attempt failed.
+        """
+        for attempt in range(self.max_retries + 1):
+            await self.rate_limiter.acquire(self.host)
+            async with self._semaphore:
+                started = time.monotonic()
+                try:
+                    response = await self._client.post(self.api_url, json=payload)
+                    error = None
+                except httpx.TransportError as e:
+                    response, error = None, e
+                finally:
+                    self.stats.requests += 1
+                    self.stats.latencies.append(time.monotonic() - started)
+
+            if response is not None and response.status_code not in RETRY_STATUS_CODES:
+                if response.is_error:
+                    UPSTREAM_REQUESTS.inc(service="flo_markers", outcome="error")
+                    self.stats.failures += 1
+                    logging.error(f"markers/search returned HTTP {response.status_code}")
+                    return None
+                UPSTREAM_REQUESTS.inc(service="flo_markers", outcome="ok")
+                return response.json()
+
+            reason = error if error is not None else f"HTTP {response.status_code}"
+            UPSTREAM_REQUESTS.inc(service="flo_markers", outcome="error")
+            if attempt == self.max_retries:
+                self.stats.failures += 1
+                logging.error(f"markers/search failed after {attempt + 1} attempts: {reason}")
+                return None
+
+            self.stats.retries += 1
+            delay = self._backoff(attempt)
+            logging.warning(f"markers/search attempt {attempt + 1} failed ({reason}); retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+    async def crawl(self, bounds, zoom_level):
+        """
+        Crawl everything under `bounds`, whose map zoom level is `zoom_level`.
+        Returns the unique parks as a list of dicts (first copy of each park id).
+
+        The area is covered by slippy-map tiles one level above `zoom_level` (each
+        tile then queries at `zoom_level`, see tile_search_zoom) and descends the
+        quadtree only into child tiles that contain a cluster.
+        """
+        tile_zoom = max(zoom_level - 1, 0)
+        await asyncio.gather(*(
+            self._expand_tile(x, y, tile_zoom, 0, None)
+            for x, y in tiles_for_bounds(bounds, tile_zoom)
+        ))
+        CRAWL_PARKS.inc(len(self.unique_parks))
+        logging.info(f"Crawl finished: {json.dumps(self.stats.to_dict())}")
+        return list(self.unique_parks.values())
+
+    async def _expand_tile(self, x, y, tile_zoom, depth, parent_counts):
+        key = (tile_zoom, x, y)
+        if key in self.visited_tiles:
+            self.stats.tiles_skipped_visited += 1
+            return
+        self.visited_tiles.add(key)
+
+        bounds = tile_bounds(x, y, tile_zoom)
+        zoom_level = tile_search_zoom(bounds)
+        if zoom_level > self.max_zoom:
+            return
+
+        data = await self.search(build_search_payload(bounds, zoom_level))
+        self.stats.depth_histogram[depth] += 1
+        CRAWL_DEPTH.observe(depth)
+        if data is None:
+            return
+
+        parks = data.get("parks", [])
+        clusters = data.get("clusters", [])
+
+        self._record_parks(parks)
+        if not clusters:
+            return
+        if zoom_level >= self.max_zoom:
+            self._unresolved(clusters, zoom_level)
+            return
+
+        # A tile is stable when its marker counts (total, parks, clusters) have not
+        # changed for `stable_levels` zoom levels: upstream keeps returning the same
+        # clusters (e.g. co-located chargers), so zooming one level at a time is wasted.
+        # The clusters still hold parks, so query their areas at max_zoom directly
+        counts = (
+            len(parks) + sum(cluster.get("count", 0) for cluster in clusters),
+            len(parks),
+            len(clusters),
+        )
+        stable_for = 0
+        if parent_counts is not None and parent_counts[0] == counts:
+            stable_for = parent_counts[1] + 1
+        if stable_for >= self.stable_levels:
+            self.stats.stable_tiles_resolved += 1
+            await asyncio.gather(*(self._resolve_cluster(cluster, zoom_level) for cluster in clusters))
+            return
+
+        # Only descend into child tiles that a cluster can reach
+        self.stats.clusters_expanded += len(clusters)
+        if self.stats.clusters_expanded % 100 < len(clusters):
+            logging.info(f"Crawl progress: {json.dumps(self.stats.to_dict())}")
+
+        child_zoom = tile_zoom + 1
+        occupied = self._tiles_reached_by_clusters(clusters, child_zoom, zoom_level)
+        children = []
+        for child_x, child_y, _ in child_tiles(x, y, tile_zoom):
+            if (child_x, child_y) in occupied:
+                children.append(self._expand_tile(child_x, child_y, child_zoom, depth + 1, (counts, stable_for)))
+            else:
+                self.stats.empty_tiles_skipped += 1
+
+        await asyncio.gather(*children)
+
+    def _record_parks(self, parks):
+        for park in parks:
+            park_id = park.get("id")
+            if park_id is None:
+                continue  # Rejected at ingest anyway
+            if park_id in self.unique_parks:
+                self.stats.duplicate_parks += 1
+            else:
+                self.unique_parks[park_id] = park
+        self.stats.parks_seen += len(parks)
+
+    async def _resolve_cluster(self, cluster, search_zoom):
+        """
+        Fetch the parks of a cluster that zooming has stopped splitting: query the area
+        its members can occupy (cluster_radius_px around the centroid at `search_zoom`)
+        at max_zoom, where upstream no longer clusters.
+        """
+        lat = cluster["geoCoordinates"]["latitude"]
+        lon = cluster["geoCoordinates"]["longitude"]
+        cx, cy = lat_lon_to_tile_xy(lat, lon, search_zoom)
+        radius = self.cluster_radius_px / 256
+        bounds = tile_area_bounds(cx - radius, cy - radius, cx + radius, cy + radius, search_zoom)
+        data = await self.search(build_search_payload(bounds, self.max_zoom))
+        if data is None:
+            return
+        self._record_parks(data.get("parks", []))
+        if data.get("clusters"):
+            self._unresolved(data["clusters"], self.max_zoom)
+
+    def _unresolved(self, clusters, zoom_level):
+        # Upstream clusters even at max_zoom; nothing left to zoom into
+        self.stats.unresolved_clusters += len(clusters)
+        parks = sum(cluster.get("count", 0) for cluster in clusters)
+        logging.warning(f"{len(clusters)} clusters ({parks} parks) still clustered at zoom {zoom_level}")
+
+    def _tiles_reached_by_clusters(self, clusters, tile_zoom, search_zoom):
+        """
+        Tiles at `tile_zoom` within `cluster_radius_px` (in pixels at `search_zoom`)
+        of any cluster centroid. Members of a cluster are spread around its centroid,
+        so they may sit in a neighbouring tile.
+        """
+        radius = self.cluster_radius_px / 256 * 2 ** (tile_zoom - search_zoom)
+        reached = set()
+        for cluster in clusters:
+            cx, cy = lat_lon_to_tile_xy(
+                cluster["geoCoordinates"]["latitude"],
+                cluster["geoCoordinates"]["longitude"],
+                tile_zoom,
+            )
+            for tx in range(math.floor(cx - radius), math.floor(cx + radius) + 1):
+                for ty in range(math.floor(cy - radius), math.floor(cy + radius) + 1):
+                    reached.add((tx, ty))
+        return reached
+
+
+def tile_search_zoom(bounds):
+    """
+    The zoom level to query a tile at: what an 800x800 map showing it would use.
+    """
+    return get_bounds_zoom_level(bounds, SEARCH_MAP_DIM)
@@ -0,0 +1,271 @@
+import logging
+import threading
+
+from pymongo import MongoClient, monitoring
+from pymongo.errors import OperationFailure
+from pymongo.server_api import ServerApi
+
+from settings import DEFAULTS
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """
+    Track connection pool usage so the pool size can be tuned.
+    Counters are aggregated over every server the client talks to.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.open_connections = 0
+            self.checked_out = 0
+            self.waiting = 0
+            self.max_waiting = 0
+            self.connections_created = 0
+            self.connections_closed = 0
+            self.checkouts = 0
+            self.checkout_failures = 0
+            self.pool_clears = 0
+
+    # Pool lifecycle
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pool_clears += 1
+
+    def pool_closed(self, event):
+        pass
+
+    # Connection lifecycle
+    def connection_created(self, event):
+        with self._lock:
+            self.open_connections += 1
+            self.connections_created += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open_connections -= 1
+            self.connections_closed += 1
+
+    # Checkouts (a checkout that has started but not finished is waiting in the queue)
+    def connection_check_out_started(self, event):
+        with self._lock:
+            self.waiting += 1
+            self.max_waiting = max(self.max_waiting, self.waiting)
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.waiting -= 1
+            self.checkout_failures += 1
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self.waiting -= 1
+            self.checked_out += 1
+            self.checkouts += 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "openConnections": self.open_connections,
+                "checkedOut": self.checked_out,
+                "waitQueueSize": self.waiting,
+                "maxWaitQueueSize": self.max_waiting,
+                "connectionsCreated": self.connections_created,
+                "connectionsClosed": self.connections_closed,
+                "checkouts": self.checkouts,
+                "checkoutFailures": self.checkout_failures,
+                "poolClears": self.pool_clears,
+            }
+
+
+pool_stats_listener = PoolStatsListener()
+
+_client = None
+_database_name = DEFAULTS.mongo_database
+_collections = {}
+_client_options = {}
+_lock = threading.Lock()
+
+
+def init_client(uri, **pool_options):
+    """
+    Create the shared MongoClient. Called once from the app lifespan.
+    Keyword arguments (Settings.pool_options()) override the default pool settings.
+    """
+    global _client
+    with _lock:
+        if _client is not None:
+            return _client
+
+        options = {**DEFAULTS.pool_options(), **pool_options}
+
+        try:
+            _client = MongoClient(
+                uri,
+                server_api=ServerApi("1"),
+                event_listeners=[pool_stats_listener],
+                **options,
+            )
+        except Exception as e:
+            raise Exception(f"Failed to connect to MongoDB: {e}")
+
+        _client_options.clear()
+        _client_options.update(options)
+        logging.info("MongoDB client created (maxPoolSize=%s)", options["maxPoolSize"])
+        return _client
+
+
+def set_client(client):
+    """
+    Install an already constructed client (e.g. a local or in-memory stand-in).
+    """
+    global _client
+    with _lock:
+        _client = client
+        _collections.clear()
+
+
+def use_database(name):
+    """
+    Select the database collections are read from (Settings.mongo_database).
+    """
+    global _database_name
+    with _lock:
+        _database_name = name
+        _collections.clear()
+
+
+def has_client():
+    return _client is not None
+
+
+def get_client():
+    if _client is None:
+        raise RuntimeError("MongoDB client has not been initialised; call init_client() first")
+    return _client
+
+
+def get_collection(name):
+    """
+    Return a cached handle to a collection of the shared database.
+    """
+    collection = _collections.get(name)
+    if collection is None:
+        with _lock:
+            collection = _collections.get(name)
+            if collection is None:
+                collection = get_client()[_database_name][name]
+                _collections[name] = collection
+    return collection
+
+
+def close_client():
+    """
+    Close the shared client and drop cached collection handles. Called at shutdown.
+    """
+    global _client
+    with _lock:
+        if _client is not None:
+            _client.close()
+            logging.info("MongoDB client closed")
+        _client = None
+        _collections.clear()
+        _client_options.clear()
+        ready_indexes.clear()
+    pool_stats_listener.reset()
+
+
+def pool_stats():
+    """
+    Pool configuration plus live usage counters.
+    """
+    return {
+        "config": dict(_client_options),
+        "usage": pool_stats_listener.snapshot(),
+        "cachedCollections": sorted(_collections),
+    }
+
+
+def geo_point(geo_coordinates):
+    """
+    Build the GeoJSON point stored alongside 'geoCoordinates' for 2dsphere queries.
+    GeoJSON orders coordinates as [longitude, latitude].
+    """
+    return {
+        "type": "Point",
+        "coordinates": [geo_coordinates["longitude"], geo_coordinates["latitude"]],
+    }
+
+
+def backfill_geo_points(collection):
+    """
+    Add 'geoPoint' to documents written before it was kept in sync.
+    """
+    result = collection.update_many(
+        {"geoPoint": {"$exists": False}, "geoCoordinates.latitude": {"$exists": True}},
+        [{"$set": {"geoPoint": {
+            "type": "Point",
+            "coordinates": ["$geoCoordinates.longitude", "$geoCoordinates.latitude"],
+        }}}],
+    )
+    if result.modified_count:
+        logging.info("Backfilled geoPoint on %s documents", result.modified_count)
+    return result.modified_count
+
+
+# Names of the indexes ensure_indexes() managed to create
+ready_indexes = set()
+
+
+def index_ready(name):
+    return name in ready_indexes
+
+
+def ensure_indexes():
+    """
+    Create the indexes the read endpoints rely on. Safe to call on every startup.
+    """
+    parks = get_collection("baobao")
+    backfill_geo_points(parks)
+    parks.create_index([("geoPoint", "2dsphere")], name="geoPoint_2dsphere")
+    ready_indexes.add("geoPoint_2dsphere")
+    try:
+        # Bulk ingest upserts on 'id' and relies on it being unique
+        parks.create_index("id", unique=True, name="id_unique")
+        ready_indexes.add("id_unique")
+    except OperationFailure as e:
+        logging.error(f"Could not create unique index on 'id' (duplicate parks stored?): {e}")
+    # Range queries for map tiles
+    parks.create_index(
+        [("geoCoordinates.latitude", 1), ("geoCoordinates.longitude", 1)], name="geoCoordinates_lat_lon"
+    )
+    ready_indexes.add("geoCoordinates_lat_lon")
+    try:
+        # Multikey index for substation lookups by id
+        parks.create_index("stations.id", name="stations_id")
+        ready_indexes.add("stations_id")
+    except OperationFailure as e:
+        logging.error(f"Could not create index on 'stations.id': {e}")
+
+    try:
+        # Availability history queries filter one park over a time window
+        get_collection("stations").create_index([("id", 1), ("timestamp", 1)], name="id_timestamp")
+        ready_indexes.add("id_timestamp")
+    except OperationFailure as e:
+        logging.error(f"Could not create (id, timestamp) index on 'stations': {e}")
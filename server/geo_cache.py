@@ -0,0 +1,206 @@
+import asyncio
+import logging
+import re
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import database
+from metrics import UPSTREAM_REQUESTS
+from repository import run_io
+from settings import DEFAULTS
+from tracing import span
+
+# Coordinates are rounded to 5 decimals (~1 m) before being used as cache keys
+COORDINATE_DECIMALS = 5
+
+LAT_LNG_PATTERN = re.compile(r'^\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*$')
+
+
+def normalize_location(location):
+    """
+    Cache key for an address or "lat,lng" string: rounded coordinates, or the
+    address lower-cased with punctuation and repeated whitespace collapsed.
+    """
+    match = LAT_LNG_PATTERN.match(location)
+    if match:
+        lat, lng = (round(float(value), COORDINATE_DECIMALS) for value in match.groups())
+        return f"{lat:.{COORDINATE_DECIMALS}f},{lng:.{COORDINATE_DECIMALS}f}"
+    words = re.sub(r"[^\w\s]", " ", location.lower()).split()
+    return " ".join(words)
+
+
+class LRUCache:
+    """
+    In-process LRU cache whose entries expire after `ttl_seconds`.
+    """
+
+    def __init__(self, maxsize, ttl_seconds):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._data = OrderedDict()
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires = entry
+        if expires < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return entry
+
+    def set(self, key, value, ttl_seconds=None):
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        self._data[key] = (value, time.monotonic() + ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class MongoCacheTier:
+    """
+    Shared persistent tier: one document per key in a collection with a TTL index.
+    """
+
+    def __init__(self, collection_name=DEFAULTS.geo_cache_collection):
+        self.collection_name = collection_name
+
+    @property
+    def collection(self):
+        return database.get_collection(self.collection_name)
+
+    def ensure_indexes(self):
+        self.collection.create_index("expiresAt", expireAfterSeconds=0, name="expiresAt_ttl")
+
+    def get(self, key):
+        entry = self.collection.find_one({"_id": key, "expiresAt": {"$gt": datetime.utcnow()}})
+        return (entry["value"], entry["expiresAt"]) if entry else None
+
+    def set(self, key, value, ttl_seconds):
+        self.collection.replace_one(
+            {"_id": key},
+            {"_id": key, "value": value, "expiresAt": datetime.utcnow() + timedelta(seconds=ttl_seconds)},
+            upsert=True,
+        )
+
+
+class TwoTierCache:
+    """
+    In-process LRU in front of a shared persistent tier, with single-flight: concurrent
+    misses for the same key wait on one upstream call instead of each making their own.
+    """
+
+    def __init__(self, namespace, ttl_seconds, maxsize=DEFAULTS.geo_cache_maxsize, persistent=None):
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.local = LRUCache(maxsize, ttl_seconds)
+        self.persistent = persistent
+        self._in_flight = {}
+        self.local_hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.upstream_calls = 0
+        self.upstream_errors = 0
+
+    def configure(self, ttl_seconds, maxsize):
+        """
+        Apply the settings of the app, emptying the in-process tier. Called from the
+        app lifespan.
+        """
+        self.ttl_seconds = ttl_seconds
+        self.local = LRUCache(maxsize, ttl_seconds)
+
+    async def get_or_fetch(self, key, fetch):
+        """
+        Return the cached value for `key`, or await `fetch()` once and cache its result.
+        Exceptions from `fetch` are not cached; they reach every coalesced caller.
+
+        The load runs in its own task, so a caller that is cancelled (e.g. a dropped
+        request) stops waiting without cancelling it for the others.
+        """
+        key = f"{self.namespace}:{key}"
+        entry = self.local.get(key)
+        if entry is not None:
+            self.local_hits += 1
+            return entry[0]
+
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.create_task(self._load(key, fetch))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._loaded(key, done))
+        return await asyncio.shield(task)
+
+    def _loaded(self, key, task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            task.exception()  # Mark retrieved so failures nobody awaited are not logged as unhandled
+
+    async def _load(self, key, fetch):
+        if self.persistent is not None:
+            try:
+                entry = await run_io(self.persistent.get, key)
+            except Exception as e:
+                logging.warning(f"Persistent geo cache read failed for {key}: {e}")
+                entry = None
+            if entry is not None:
+                value, expires = entry
+                self.persistent_hits += 1
+                remaining = (expires - datetime.utcnow()).total_seconds()
+                self.local.set(key, value, min(self.ttl_seconds, max(remaining, 0)))
+                return value
+
+        self.misses += 1
+        self.upstream_calls += 1
+        try:
+            with span(f"{self.namespace}_upstream"):
+                value = await fetch()
+        except Exception:
+            self.upstream_errors += 1
+            UPSTREAM_REQUESTS.inc(service=f"google_{self.namespace}", outcome="error")
+            raise
+        UPSTREAM_REQUESTS.inc(service=f"google_{self.namespace}", outcome="ok")
+
+        self.local.set(key, value)
+        if self.persistent is not None:
+            try:
+                await run_io(self.persistent.set, key, value, self.ttl_seconds)
+            except Exception as e:
+                logging.warning(f"Persistent geo cache write failed for {key}: {e}")
+        return value
+
+    def stats(self):
+        lookups = self.local_hits + self.persistent_hits + self.misses + self.coalesced
+        hits = lookups - self.misses
+        return {
+            "lookups": lookups,
+            "localHits": self.local_hits,
+            "persistentHits": self.persistent_hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            "hitRate": round(hits / lookups, 4) if lookups else None,
+            "upstreamCalls": self.upstream_calls,
+            "upstreamErrors": self.upstream_errors,
+            "localSize": len(self.local),
+        }
+
+
+persistent_tier = MongoCacheTier()
+geocode_cache = TwoTierCache("geocode", DEFAULTS.geocode_cache_ttl_seconds, persistent=persistent_tier)
+route_cache = TwoTierCache("route", DEFAULTS.route_cache_ttl_seconds, persistent=persistent_tier)
+
+
+def geo_cache_stats():
+    return {"geocode": geocode_cache.stats(), "route": route_cache.stats()}
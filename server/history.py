@@ -0,0 +1,71 @@
+import re
+from datetime import datetime, timedelta, timezone
+
+# Largest number of buckets one history request may return
+MAX_HISTORY_BUCKETS = 2000
+
+BUCKET_PATTERN = re.compile(r"^(\d+)(m|h|d)$")
+BUCKET_UNITS = {"m": ("minute", timedelta(minutes=1)), "h": ("hour", timedelta(hours=1)), "d": ("day", timedelta(days=1))}
+
+
+def parse_bucket(bucket):
+    """
+    Parse a bucket size like "5m", "1h" or "1d" into ($dateTrunc unit, binSize, timedelta).
+    """
+    match = BUCKET_PATTERN.match(bucket)
+    if not match or int(match.group(1)) == 0:
+        raise ValueError(f"Invalid bucket '{bucket}'; use e.g. 5m, 1h or 1d")
+    size = int(match.group(1))
+    unit, step = BUCKET_UNITS[match.group(2)]
+    return unit, size, step * size
+
+
+def history_pipeline(park_id, start, end, unit, bin_size):
+    """
+    Downsample the time-series snapshots of one park into fixed buckets.
+
+    Each snapshot holds the park's 'stations' array; per bucket we report the share
+    of station samples whose status was Available, the mean charging speed and the
+    number of snapshots. Served by the compound (id, timestamp) index.
+    """
+    return [
+        {"$match": {"id": park_id, "timestamp": {"$gte": start, "$lt": end}}},
+        {"$unwind": "$stations"},
+        {"$group": {
+            "_id": {"$dateTrunc": {"date": "$timestamp", "unit": unit, "binSize": bin_size}},
+            "stationSamples": {"$sum": 1},
+            "availableSamples": {"$sum": {"$cond": [{"$eq": ["$stations.status", "Available"]}, 1, 0]}},
+            "meanChargingSpeed": {"$avg": "$stations.chargingSpeed"},
+            "snapshots": {"$addToSet": "$timestamp"},
+        }},
+        {"$sort": {"_id": 1}},
+        {"$project": {
+            "_id": 0,
+            "start": "$_id",
+            "availability": {"$divide": ["$availableSamples", "$stationSamples"]},
+            "meanChargingSpeed": 1,
+            "stationSamples": 1,
+            "snapshots": {"$size": "$snapshots"},
+        }},
+    ]
+
+
+def _naive_utc(moment):
+    # Stored timestamps are naive UTC; convert timezone-aware query parameters to match
+    if moment is not None and moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+def history_window(start, end, step, now=None):
+    """
+    Resolve the default window (the last 24 hours) and check the bucket count.
+    """
+    start, end = _naive_utc(start), _naive_utc(end)
+    end = end or (now or datetime.utcnow())
+    start = start or end - timedelta(days=1)
+    if start >= end:
+        raise ValueError("'from' must be before 'to'")
+    if (end - start) / step > MAX_HISTORY_BUCKETS:
+        raise ValueError(f"Window too large for bucket size (more than {MAX_HISTORY_BUCKETS} buckets)")
+    return start, end
@@ -0,0 +1,219 @@
+import hashlib
+import json
+import logging
+from datetime import datetime
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+import database
+from settings import DEFAULTS
+
+
+def park_summary(stations):
+    """
+    Per-park aggregates served by the route and radius endpoints, so they do not
+    have to walk the nested 'stations' list on every request.
+    """
+    total = len(stations)
+    levels = {}
+    connectors = {}
+    for station in stations:
+        if station.get("level"):
+            levels[station["level"]] = levels.get(station["level"], 0) + 1
+        for connector in station.get("connectors") or []:
+            connectors[connector] = connectors.get(connector, 0) + 1
+    return {
+        "totalChargers": total,
+        "availableChargers": sum(1 for station in stations if station.get("status") == "Available"),
+        "averageChargingSpeed": (
+            round(sum(station.get("chargingSpeed") or 0 for station in stations) / total, 2) if total else None
+        ),
+        "maxChargingSpeed": max((station.get("chargingSpeed") or 0 for station in stations), default=None),
+        "levels": levels,
+        "connectors": connectors,
+    }
+
+
+def prepare_park(park_data, now=None):
+    """
+    Validate a crawled park and add the fields stored alongside it.
+    """
+    park_id = park_data.get("id")
+    if not park_id:
+        raise ValueError("Park data must have an 'id' field")
+    if not park_data.get("stations"):
+        raise ValueError(f"Park data with ID {park_id} must have at least one station")
+
+    now = now or datetime.utcnow()
+    park_data["lastUpdated"] = int(now.timestamp() * 1000)  # Use milliseconds for consistency
+    park_data["geoPoint"] = database.geo_point(park_data["geoCoordinates"])
+    park_data["summary"] = park_summary(park_data["stations"])
+    return park_data
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _write(collection, operations):
+    """
+    Run an unordered bulk write and return its raw result document.
+    Duplicate-key races on the unique 'id' index are logged, not raised.
+    """
+    try:
+        return collection.bulk_write(operations, ordered=False).bulk_api_result
+    except BulkWriteError as e:
+        for error in e.details.get("writeErrors", []):
+            logging.warning(f"Bulk write error at op {error.get('index')}: {error.get('errmsg')}")
+        return e.details
+
+
+def stations_hash(park):
+    """
+    Stable hash of what a crawl can change on a park: its name, its location and its
+    stations payload (statuses, speeds, connectors, ...). Stored as 'stationsHash'.
+    """
+    ordered = sorted(park["stations"], key=lambda station: str(station.get("id")))
+    content = {"name": park.get("name"), "geoCoordinates": park.get("geoCoordinates"), "stations": ordered}
+    payload = json.dumps(content, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+# Fields rewritten on an existing park when its hash changed
+CHANGE_FIELDS = (
+    "name", "metadata", "geoCoordinates", "geoPoint", "stations", "stationsHash", "summary", "lastUpdated", "timestamp",
+)
+
+
+def bulk_upsert_parks(collection, parks, batch_size=DEFAULTS.ingest_batch_size):
+    """
+    Insert new parks and update existing parks whose name, location or stations changed.
+
+    Each batch costs one projected read of the stored 'stationsHash' values and one
+    unordered bulk_write: new parks are inserted with UpdateOne($setOnInsert,
+    upsert=True) against the unique 'id' index, changed parks get their
+    CHANGE_FIELDS $set (so 'lastUpdated' only moves on change) and unchanged
+    parks are not written at all.
+    Returns per-batch counts, the parks that were inserted and that changed, and the
+    stored {"id", "geoCoordinates"} of changed parks that moved, whose old location
+    still has to be invalidated.
+    """
+    batches = []
+    inserted = []
+    changed = []
+    moved = []
+    valid = []
+    for park in parks:
+        try:
+            valid.append(prepare_park(park))
+        except ValueError as e:
+            logging.warning(f"Skipping park: {e}")
+
+    for number, batch in enumerate(_chunks(valid, batch_size)):
+        stored = {
+            doc["id"]: doc
+            for doc in collection.find(
+                {"id": {"$in": [park["id"] for park in batch]}},
+                {"_id": 0, "id": 1, "stationsHash": 1, "geoCoordinates": 1},
+            )
+        }
+
+        operations = []
+        targets = []
+        batch_changed = []
+        for park in batch:
+            park["stationsHash"] = stations_hash(park)
+            previous = stored.get(park["id"])
+            if previous is None:
+                operations.append(UpdateOne({"id": park["id"]}, {"$setOnInsert": park}, upsert=True))
+                targets.append(park)
+            elif previous.get("stationsHash") != park["stationsHash"]:
+                operations.append(UpdateOne(
+                    {"id": park["id"]},
+                    {"$set": {field: park[field] for field in CHANGE_FIELDS if field in park}},
+                ))
+                targets.append(park)
+                batch_changed.append(park)
+                if previous.get("geoCoordinates") != park["geoCoordinates"]:
+                    moved.append({"id": park["id"], "geoCoordinates": previous.get("geoCoordinates")})
+
+        result = _write(collection, operations) if operations else {}
+
+        # upserted entries carry the index of the operation that inserted them
+        batch_inserted = [targets[entry["index"]] for entry in result.get("upserted", [])]
+        inserted.extend(batch_inserted)
+        changed.extend(batch_changed)
+
+        stats = {
+            "batch": number,
+            "size": len(batch),
+            "inserted": len(batch_inserted),
+            "changed": len(batch_changed),
+            "unchanged": len(batch) - len(batch_inserted) - len(batch_changed),
+            "matched": result.get("nMatched", 0),
+            "modified": result.get("nModified", 0),
+        }
+        logging.info(f"Ingest batch {number}: {stats}")
+        batches.append(stats)
+
+    return batches, inserted, changed, moved
+
+
+def parks_missing_address(parks):
+    """
+    {park id: id of its first station} for parks stored without an address.
+    """
+    return {park["id"]: park["stations"][0]["id"] for park in parks if not park.get("address")}
+
+
+def set_addresses(collection, addresses, batch_size=DEFAULTS.ingest_batch_size):
+    """
+    Write {park id: address} back to the stored parks in bulk.
+    """
+    items = list(addresses.items())
+    for batch in _chunks(items, batch_size):
+        _write(collection, [
+            UpdateOne({"id": park_id}, {"$set": {"address": address}})
+            for park_id, address in batch
+        ])
+
+
+def append_snapshots(collection, parks, now=None):
+    """
+    Append one time-series point per park to the history collection.
+    Only called for new and changed parks, so unchanged re-crawls add no points.
+    """
+    if not parks:
+        return 0
+    now = now or datetime.utcnow()
+    collection.insert_many([
+        {
+            "id": park["id"],
+            "timestamp": park.get("timestamp") or now,
+            "metadata": park.get("metadata", {"location": park.get("name", "Unknown")}),
+            "name": park.get("name"),
+            "stations": park["stations"],
+        }
+        for park in parks
+    ], ordered=False)
+    return len(parks)
+
+
+def backfill_summaries(collection, batch_size=DEFAULTS.ingest_batch_size, recompute=False):
+    """
+    Store 'summary' on parks written before it existed (or on every park with
+    recompute=True). Returns the number of parks updated.
+    """
+    query = {} if recompute else {"summary": {"$exists": False}}
+    updated = 0
+    operations = []
+    for park in collection.find(query, {"_id": 1, "stations": 1}, batch_size=batch_size):
+        operations.append(UpdateOne({"_id": park["_id"]}, {"$set": {"summary": park_summary(park.get("stations") or [])}}))
+        if len(operations) >= batch_size:
+            updated += _write(collection, operations).get("nModified", 0)
+            operations = []
+    if operations:
+        updated += _write(collection, operations).get("nModified", 0)
+    return updated
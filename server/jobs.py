@@ -0,0 +1,238 @@
+import asyncio
+import logging
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import database
+from metrics import CRAWL_JOBS
+from refresh import crawl_and_ingest
+from repository import run_io
+from settings import DEFAULTS
+
+# Finished jobs stay in memory for an hour, and in Mongo until the TTL index removes them
+JOB_MEMORY_SECONDS = 3600
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = "queued", "running", "succeeded", "failed", "cancelled"
+FINISHED = {SUCCEEDED, FAILED, CANCELLED}
+
+
+class CrawlJob:
+    """
+    One crawl+ingest of a bounding box, from queued to a finished state.
+    """
+
+    def __init__(self, bounds, crawler_options, source):
+        self.id = uuid.uuid4().hex
+        self.bounds = bounds
+        self.crawler_options = crawler_options
+        self.source = source
+        self.status = QUEUED
+        self.created = datetime.utcnow()
+        self.started = None
+        self.finished = None
+        self.result = None
+        self.error = None
+        self.task = None
+        self.cancel_requested = False
+        self.done = asyncio.get_running_loop().create_future()
+
+    def throughput(self):
+        """
+        Parks ingested and FLO requests made per second of run time.
+        """
+        if self.started is None or self.result is None:
+            return None
+        elapsed = ((self.finished or datetime.utcnow()) - self.started).total_seconds()
+        return {
+            "elapsedSeconds": round(elapsed, 2),
+            "parksPerSecond": round(self.result["parks"] / elapsed, 2) if elapsed else None,
+            "requestsPerSecond": round(self.result["crawl"]["requests"] / elapsed, 2) if elapsed else None,
+            "writesPerSecond": round((self.result["inserted"] + self.result["changed"]) / elapsed, 2) if elapsed else None,
+        }
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "status": self.status,
+            "source": self.source,
+            "bounds": self.bounds,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "result": self.result,
+            "throughput": self.throughput(),
+            "error": self.error,
+        }
+
+
+class JobQueue:
+    """
+    In-process asyncio queue of crawl jobs, drained by `workers` worker tasks
+    started from the app lifespan. Job state is persisted to `collection_name` on
+    every transition, so finished jobs (and their throughput) can still be looked up
+    after a restart, until `retention_seconds` after they were created.
+    """
+
+    def __init__(
+        self,
+        workers=DEFAULTS.job_workers,
+        collection_name=DEFAULTS.jobs_collection,
+        retention_seconds=DEFAULTS.job_retention_seconds,
+        run=crawl_and_ingest,
+    ):
+        self.workers = workers
+        self.collection_name = collection_name
+        self.retention_seconds = retention_seconds
+        self.run_job = run
+        self.jobs = {}
+        self._queue = None
+        self._workers = []
+
+    @property
+    def collection(self):
+        return database.get_collection(self.collection_name)
+
+    def configure(self, workers, collection_name, retention_seconds):
+        """
+        Apply the settings of the app. Called from the app lifespan, before start().
+        """
+        self.workers = workers
+        self.collection_name = collection_name
+        self.retention_seconds = retention_seconds
+
+    def ensure_indexes(self):
+        self.collection.create_index("created", expireAfterSeconds=self.retention_seconds, name="created_ttl")
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        logging.info(f"Job queue started ({self.workers} workers)")
+
+    async def stop(self):
+        for job in list(self.jobs.values()):
+            if job.status not in FINISHED:
+                await self.cancel(job.id)
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def submit(self, bounds, crawler_options=None, source="api"):
+        """
+        Queue a crawl of `bounds` and return its job right away.
+        """
+        job = CrawlJob(bounds, crawler_options or {}, source)
+        self.jobs[job.id] = job
+        await self._persist(job)
+        self._queue.put_nowait(job)
+        self._prune()
+        return job
+
+    async def run(self, bounds, **crawler_options):
+        """
+        Queue a crawl and wait for its result (used by the refresh scheduler).
+        """
+        job = await self.submit(bounds, crawler_options, source="schedule")
+        try:
+            return await asyncio.shield(job.done)
+        except asyncio.CancelledError:
+            if job.done.cancelled():
+                raise RuntimeError(f"Crawl job {job.id} was cancelled")
+            raise
+
+    async def get(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        return await run_io(self.collection.find_one, {"_id": job_id}, {"_id": 0})
+
+    async def cancel(self, job_id):
+        """
+        Cancel a queued or running job. Returns False for unknown or finished jobs.
+        """
+        job = self.jobs.get(job_id)
+        if job is None or job.status in FINISHED:
+            return False
+        job.cancel_requested = True
+        if job.task is not None:
+            job.task.cancel()
+        else:
+            # Still queued: the worker skips it when it is dequeued
+            self._finish(job, CANCELLED)
+            await self._persist(job)
+            self._settle(job)
+        return True
+
+    async def _work(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                if job.status == QUEUED:
+                    await self._execute(job)
+            finally:
+                self._queue.task_done()
+
+    async def _execute(self, job):
+        job.status = RUNNING
+        job.started = datetime.utcnow()
+        await self._persist(job)
+        job.task = asyncio.create_task(self.run_job(job.bounds, **job.crawler_options))
+        started = time.monotonic()
+        try:
+            job.result = await job.task
+            self._finish(job, SUCCEEDED)
+        except asyncio.CancelledError:
+            self._finish(job, CANCELLED)
+            if not job.cancel_requested:
+                raise  # the worker itself is being cancelled
+        except Exception as e:
+            logging.error(f"Crawl job {job.id} failed: {e}")
+            job.error = str(e)
+            self._finish(job, FAILED)
+        finally:
+            job.task = None
+            # Waiters are released only once the final state is stored, so a restart
+            # right after a job finishes still finds it finished
+            try:
+                await self._persist(job)
+            finally:
+                self._settle(job)
+        logging.info(f"Crawl job {job.id} {job.status} in {time.monotonic() - started:.1f}s: {job.throughput()}")
+
+    def _finish(self, job, status):
+        job.status = status
+        job.finished = datetime.utcnow()
+        CRAWL_JOBS.inc(source=job.source, status=status)
+
+    def _settle(self, job):
+        if job.done.done():
+            return
+        if job.status == SUCCEEDED:
+            job.done.set_result(job.result)
+        elif job.status == CANCELLED:
+            job.done.cancel()
+        else:
+            job.done.set_exception(RuntimeError(job.error))
+            job.done.exception()  # Mark retrieved; nobody may be waiting on API jobs
+
+    async def _persist(self, job):
+        try:
+            await run_io(self.collection.replace_one, {"_id": job.id}, job.to_dict(), upsert=True)
+        except Exception as e:
+            logging.warning(f"Could not persist crawl job {job.id}: {e}")
+
+    def _prune(self):
+        # Drop long-finished jobs from memory; get() falls back to Mongo for them
+        horizon = datetime.utcnow() - timedelta(seconds=JOB_MEMORY_SECONDS)
+        for job_id in [job_id for job_id, job in self.jobs.items() if job.status in FINISHED and job.finished < horizon]:
+            del self.jobs[job_id]
+
+    def stats(self):
+        statuses = {}
+        for job in self.jobs.values():
+            statuses[job.status] = statuses.get(job.status, 0) + 1
+        return {"workers": self.workers, "queued": self._queue.qsize() if self._queue else 0, "jobs": statuses}
+
+
+job_queue = JobQueue()
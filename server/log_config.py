@@ -0,0 +1,64 @@
+import json
+import logging
+import random
+from datetime import datetime, timezone
+
+# Attributes every LogRecord has; anything else was passed through `extra=`
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line: time, level, logger, message, any `extra=` fields
+    and the formatted exception.
+    """
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep every WARNING and above, and a `rate` share of DEBUG and INFO records.
+    """
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or self.rate >= 1 or random.random() < self.rate
+
+
+_handler = None
+
+
+def configure_logging(level="INFO", log_format="text", sample_rate=1.0):
+    """
+    Install one root handler (replacing the one from a previous call). Called from
+    the app lifespan rather than at import, so importing main leaves logging alone.
+    """
+    global _handler
+    root = logging.getLogger()
+    if _handler is not None:
+        root.removeHandler(_handler)
+    _handler = logging.StreamHandler()
+    if log_format == "json":
+        _handler.setFormatter(JsonFormatter())
+    else:
+        _handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+    if sample_rate < 1:
+        _handler.addFilter(SamplingFilter(sample_rate))
+    root.addHandler(_handler)
+    root.setLevel(level)
@@ -0,0 +1,143 @@
+import bisect
+import math
+import threading
+
+# Latency buckets in seconds, from a cache hit to a long FLO crawl
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+
+def _label_text(label_names, label_values, extra=()):
+    pairs = [*zip(label_names, label_values), *extra]
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _number(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """
+    Monotonic counter with optional labels, e.g. Counter("x_total", "...", ["service"]).inc(service="flo").
+    """
+
+    kind = "counter"
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(str(labels[name]) for name in self.label_names), 0)
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield f"{self.name}{_label_text(self.label_names, key)} {_number(value)}"
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram with optional labels, rendered as _bucket/_sum/_count.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, label_names=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.label_names)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels):
+        series = self._series.get(tuple(str(labels[name]) for name in self.label_names))
+        return series[2] if series else 0
+
+    def samples(self):
+        with self._lock:
+            series_items = [(key, (list(counts), total, count)) for key, (counts, total, count) in self._series.items()]
+        for key, (counts, total, count) in sorted(series_items):
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, math.inf), counts):
+                cumulative += bucket_count
+                labels = _label_text(self.label_names, key, [("le", _number(bound))])
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _label_text(self.label_names, key)
+            yield f"{self.name}_sum{labels} {_number(total)}"
+            yield f"{self.name}_count{labels} {count}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self):
+        """
+        All metrics in the Prometheus text exposition format (version 0.0.4).
+        """
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name, help_text, label_names=()):
+    return REGISTRY.register(Counter(name, help_text, label_names))
+
+
+def histogram(name, help_text, label_names=(), buckets=LATENCY_BUCKETS):
+    return REGISTRY.register(Histogram(name, help_text, label_names, buckets))
+
+
+HTTP_REQUESTS = counter("http_requests_total", "HTTP requests by route and status", ["method", "route", "status"])
+HTTP_REQUEST_SECONDS = histogram("http_request_duration_seconds", "HTTP request latency", ["method", "route"])
+STAGE_SECONDS = histogram("stage_duration_seconds", "Time spent in each traced stage", ["stage"])
+UPSTREAM_REQUESTS = counter(
+    "upstream_requests_total", "Calls to FLO and Google Maps by service and outcome", ["service", "outcome"]
+)
+DOCUMENTS_SCANNED = counter(
+    "documents_scanned_total", "Parks considered by an endpoint before filtering", ["endpoint", "source"]
+)
+DOCUMENTS_RETURNED = counter("documents_returned_total", "Parks returned by an endpoint", ["endpoint"])
+CRAWL_DEPTH = histogram(
+    "crawl_depth", "Quadtree depth of each markers/search request of a crawl", buckets=tuple(range(1, 16))
+)
+CRAWL_PARKS = counter("crawl_parks_total", "Unique parks found by crawls")
+CRAWL_JOBS = counter("crawl_jobs_total", "Finished crawl jobs by source and status", ["source", "status"])
@@ -0,0 +1,223 @@
+import heapq
+import math
+
+import numpy as np
+
+from route_corridor import EARTH_RADIUS_KM
+from settings import DEFAULTS
+
+
+def unit_vectors(lats, lons):
+    """
+    Points on the unit sphere. The straight-line (chord) distance between two of them
+    grows with the great-circle distance, so a Euclidean KD-tree orders them correctly.
+    """
+    lats, lons = np.radians(lats), np.radians(lons)
+    cos_lat = np.cos(lats)
+    return np.column_stack((cos_lat * np.cos(lons), cos_lat * np.sin(lons), np.sin(lats)))
+
+
+def chord_to_km(squared_chords):
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.sqrt(squared_chords) / 2, 0.0, 1.0))
+
+
+def _smallest(distances, indexes, k):
+    """
+    The k smallest distances (and their indexes), nearest first.
+    """
+    if len(distances) > k:
+        keep = np.argpartition(distances, k - 1)[:k]
+        distances, indexes = distances[keep], indexes[keep]
+    order = np.argsort(distances, kind="stable")
+    return distances[order], indexes[order]
+
+
+class SphereKDTree:
+    """
+    Static KD-tree over unit vectors, stored in flat arrays.
+
+    `order` holds point indexes so that every node covers one contiguous slice
+    order[start:end]; inner nodes split their slice at the median of the widest axis.
+    Queries are best-first: nodes are visited by the distance to their bounding box
+    and the search stops once that exceeds the k-th best distance found.
+    """
+
+    def __init__(self, points, leaf_size=DEFAULTS.nearest_leaf_size):
+        self.points = points
+        self.leaf_size = max(leaf_size, 1)
+        order = np.arange(len(points))
+        starts, ends, children, boxes = [], [], [], []
+        stack = [(0, len(points), None, 0)]
+        while stack:
+            start, end, parent, side = stack.pop()
+            node = len(starts)
+            if parent is not None:
+                children[parent][side] = node
+            block = points[order[start:end]]
+            lo, hi = (block.min(axis=0), block.max(axis=0)) if end > start else (np.zeros(3), np.zeros(3))
+            starts.append(start)
+            ends.append(end)
+            children.append([-1, -1])
+            boxes.append((tuple(lo), tuple(hi)))
+            if end - start <= self.leaf_size:
+                continue
+            axis = int(np.argmax(hi - lo))
+            middle = (end - start) // 2
+            split = np.argpartition(block[:, axis], middle)
+            order[start:end] = order[start:end][split]
+            stack.append((start, start + middle, node, 0))
+            stack.append((start + middle, end, node, 1))
+        self.order = order
+        self.starts = starts
+        self.ends = ends
+        self.children = children
+        self.boxes = boxes
+
+    def __len__(self):
+        return len(self.points)
+
+    @staticmethod
+    def _box_distance(box, q):
+        lo, hi = box
+        total = 0.0
+        for axis in range(3):
+            if q[axis] < lo[axis]:
+                total += (lo[axis] - q[axis]) ** 2
+            elif q[axis] > hi[axis]:
+                total += (q[axis] - hi[axis]) ** 2
+        return total
+
+    def query(self, q, k, allowed=None):
+        """
+        (squared chord distances, point indexes) of the k points nearest to the unit
+        vector q, nearest first. `allowed` is an optional bool mask over the points.
+        """
+        best_distances = np.empty(0)
+        best_indexes = np.empty(0, dtype=np.int64)
+        if not len(self.points) or k <= 0:
+            return best_distances, best_indexes
+        q_tuple = tuple(float(value) for value in q)
+        worst = math.inf
+        heap = [(0.0, 0)]
+        while heap:
+            distance, node = heapq.heappop(heap)
+            if distance > worst:
+                break
+            left, right = self.children[node]
+            if left >= 0:
+                for child in (left, right):
+                    child_distance = self._box_distance(self.boxes[child], q_tuple)
+                    if child_distance <= worst:
+                        heapq.heappush(heap, (child_distance, child))
+                continue
+            indexes = self.order[self.starts[node]:self.ends[node]]
+            if allowed is not None:
+                indexes = indexes[allowed[indexes]]
+                if not len(indexes):
+                    continue
+            distances = ((self.points[indexes] - q) ** 2).sum(axis=1)
+            best_distances, best_indexes = _smallest(
+                np.concatenate((best_distances, distances)), np.concatenate((best_indexes, indexes)), k
+            )
+            if len(best_distances) == k:
+                worst = best_distances[-1]
+        return best_distances, best_indexes
+
+
+class NearestIndex:
+    """
+    k-nearest parks of a snapshot: a SphereKDTree plus the rows it does not cover.
+
+    Built from the previous snapshot's index when one is given. Parks whose id and
+    coordinates are unchanged keep their place in the old tree (only the point -> row
+    mapping is redone); moved and new parks go to a small buffer that is searched by
+    brute force, and removed or moved points are masked out. The tree is rebuilt from
+    scratch once the buffer and the dead points exceed `rebuild_fraction` of the parks.
+    Filtered queries matching at most `brute_force_max` parks skip the tree.
+    """
+
+    def __init__(
+        self,
+        lats,
+        lons,
+        ids,
+        previous=None,
+        leaf_size=DEFAULTS.nearest_leaf_size,
+        rebuild_fraction=DEFAULTS.nearest_rebuild_fraction,
+        brute_force_max=DEFAULTS.nearest_brute_force_max,
+    ):
+        self.xyz = unit_vectors(lats, lons)
+        self.rebuild_fraction = rebuild_fraction
+        self.brute_force_max = brute_force_max
+        located = np.flatnonzero(~np.isnan(lats) & ~np.isnan(lons))
+        self.reused = False
+        if previous is not None and self._reuse(previous, ids, located):
+            self.reused = True
+            return
+        self.tree = SphereKDTree(self.xyz[located], leaf_size)
+        self.point_ids = [ids[row] for row in located]
+        self.point_rows = located
+        self.alive = np.ones(len(located), dtype=bool)
+        self.buffer = np.empty(0, dtype=np.int64)
+
+    def _reuse(self, previous, ids, located):
+        row_of = {park_id: row for row, park_id in enumerate(ids)}
+        point_rows = np.fromiter(
+            (row_of.get(park_id, -1) for park_id in previous.point_ids), dtype=np.int64, count=len(previous.point_ids)
+        )
+        alive = previous.alive & (point_rows >= 0)
+        # A park that moved is dropped from the tree and buffered at its new position
+        rows = point_rows[alive]
+        alive[alive] = np.all(self.xyz[rows] == previous.tree.points[np.flatnonzero(alive)], axis=1)
+        covered = np.zeros(len(ids), dtype=bool)
+        covered[point_rows[alive]] = True
+        buffer = located[~covered[located]]
+        stale = len(buffer) + int((~alive).sum())
+        if stale > self.rebuild_fraction * max(len(located), 1):
+            return False
+        self.tree = previous.tree
+        self.point_ids = previous.point_ids
+        self.point_rows = np.where(alive, point_rows, -1)
+        self.alive = alive
+        self.buffer = buffer
+        return True
+
+    def nearest_many(self, lats, lons, k, mask=None):
+        """
+        For each origin, (rows, distances in km) of the k nearest parks allowed by the
+        optional row mask, nearest first. The masks are resolved once for all origins.
+        """
+        allowed = self.alive.copy()
+        if mask is not None:
+            allowed &= mask[np.maximum(self.point_rows, 0)]
+        buffer = self.buffer[mask[self.buffer]] if mask is not None else self.buffer
+        brute_force = None
+        if mask is not None and int(allowed.sum()) + len(buffer) <= self.brute_force_max:
+            brute_force = np.concatenate((self.point_rows[allowed], buffer))
+
+        results = []
+        for q in unit_vectors(np.atleast_1d(lats), np.atleast_1d(lons)):
+            if brute_force is not None:
+                distances, rows = _smallest(((self.xyz[brute_force] - q) ** 2).sum(axis=1), brute_force, k)
+            else:
+                distances, points = self.tree.query(q, k, allowed)
+                rows = self.point_rows[points]
+                if len(buffer):
+                    distances, rows = _smallest(
+                        np.concatenate((distances, ((self.xyz[buffer] - q) ** 2).sum(axis=1))),
+                        np.concatenate((rows, buffer)),
+                        k,
+                    )
+            results.append((rows, chord_to_km(distances)))
+        return results
+
+    def nearest(self, lat, lon, k, mask=None):
+        return self.nearest_many([lat], [lon], k, mask)[0]
+
+    def stats(self):
+        return {
+            "treePoints": len(self.tree),
+            "deadPoints": int((~self.alive).sum()),
+            "bufferedPoints": len(self.buffer),
+            "reused": self.reused,
+        }
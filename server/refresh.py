@@ -0,0 +1,180 @@
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime
+
+from addresses import AddressEnricher
+from calculus import get_bounds_zoom_level
+from crawler import SEARCH_MAP_DIM, ClusterCrawler
+from ingest import append_snapshots, bulk_upsert_parks, parks_missing_address, set_addresses
+from repository import history_repository, parks_repository
+from settings import DEFAULTS
+from snapshot import parks_snapshot
+from station_index import substation_index
+from tiles import tile_cache
+from tracing import span
+
+
+async def crawl_and_ingest(bounds, batch_size=DEFAULTS.ingest_batch_size, enricher_options=None, **crawler_options):
+    """
+    Crawl one bounding box and write only what changed. `crawler_options` go to
+    ClusterCrawler and `enricher_options` to AddressEnricher.
+
+    New parks are inserted, parks whose name, location or stations changed are
+    updated and get a time-series point; unchanged parks cost one hash comparison and
+    no write. Indexes and cached tiles (including the old tile of a moved park) are
+    refreshed for new and changed parks only, and a new read snapshot is swapped in
+    when anything was written.
+    """
+    zoom_level = get_bounds_zoom_level(bounds, SEARCH_MAP_DIM)
+
+    # Expand sibling clusters concurrently over one keep-alive client
+    async with ClusterCrawler(**crawler_options) as crawler:
+        with span("flo_crawl"):
+            unique_parks = await crawler.crawl(bounds, zoom_level)
+
+    now = datetime.utcnow()
+    parks = []
+    for park in unique_parks:
+        park['timestamp'] = now  # Add a timestamp for the time-series
+        park['metadata'] = {"location": park.get("name", "Unknown")}  # Add metadata (e.g., location name)
+        parks.append(park)
+
+    with span("ingest_write"):
+        batches, inserted, changed, moved = await parks_repository.run(bulk_upsert_parks, parks, batch_size)
+    written = inserted + changed
+    substation_index.update(written)
+    tile_cache.invalidate_parks(written + moved)  # New locations, and the old ones of moved parks
+    with span("history_append"):
+        snapshots = await history_repository.run(append_snapshots, written, now)
+
+    # Enrich newly inserted parks with addresses, concurrently and through the cache
+    needs_address = parks_missing_address(inserted)
+    enricher = AddressEnricher(**(enricher_options or {}))
+    with span("address_enrich"):
+        addresses = await enricher.enrich(needs_address.values())
+        await parks_repository.run(set_addresses, {
+            park_id: addresses[station_id] for park_id, station_id in needs_address.items()
+        }, batch_size)
+    if written:
+        with span("snapshot_rebuild"):
+            await parks_snapshot.refresh()
+
+    return {
+        "parks": sum(batch["size"] for batch in batches),
+        "inserted": len(inserted),
+        "changed": len(changed),
+        "snapshots": snapshots,
+        "crawl": crawler.stats.to_dict(),
+        "batches": batches,
+        "addresses": enricher.stats(),
+    }
+
+
+class RegionSchedule:
+    """
+    Re-crawl interval of one region, adapted to how often its parks change.
+
+    The change rate (changed / seen parks per crawl) is smoothed with an EWMA.
+    Above the target rate the interval halves, below half of it the interval grows
+    by half, always within [min_interval, max_interval].
+    """
+
+    def __init__(self, name, bounds, min_interval=DEFAULTS.refresh_min_interval, max_interval=DEFAULTS.refresh_max_interval,
+                 target_change_rate=DEFAULTS.refresh_target_change_rate, smoothing=0.5):
+        self.name = name
+        self.bounds = bounds
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.target_change_rate = target_change_rate
+        self.smoothing = smoothing
+        self.interval = min_interval
+        self.change_rate = None
+        self.next_run = time.monotonic()
+        self.runs = 0
+        self.failures = 0
+        self.last_result = None
+
+    def record(self, result):
+        seen = result["parks"]
+        rate = (result["inserted"] + result["changed"]) / seen if seen else 0.0
+        self.change_rate = rate if self.change_rate is None else (
+            self.smoothing * rate + (1 - self.smoothing) * self.change_rate
+        )
+        if self.change_rate > self.target_change_rate:
+            self.interval /= 2
+        elif self.change_rate < self.target_change_rate / 2:
+            self.interval *= 1.5
+        self.interval = min(max(self.interval, self.min_interval), self.max_interval)
+        self.runs += 1
+        self.last_result = {key: result[key] for key in ("parks", "inserted", "changed", "snapshots")}
+        self.next_run = time.monotonic() + self.interval
+
+    def record_failure(self):
+        # Retry failed regions at the shortest interval
+        self.failures += 1
+        self.next_run = time.monotonic() + self.min_interval
+
+    def stats(self):
+        return {
+            "name": self.name,
+            "intervalSeconds": round(self.interval, 1),
+            "changeRate": None if self.change_rate is None else round(self.change_rate, 4),
+            "runs": self.runs,
+            "failures": self.failures,
+            "dueInSeconds": round(max(self.next_run - time.monotonic(), 0), 1),
+            "lastResult": self.last_result,
+        }
+
+
+class RefreshScheduler:
+    """
+    Re-crawls configured regions one at a time, each when its schedule is due.
+    `run(bounds, **crawler_options)` performs one crawl, e.g. through the job queue;
+    `schedule_options` go to every RegionSchedule.
+    """
+
+    def __init__(self, regions=None, run=crawl_and_ingest, schedule_options=None, **crawler_options):
+        self.regions = [
+            RegionSchedule(region["name"], region["bounds"], **(schedule_options or {}))
+            for region in regions or []
+        ]
+        self.run = run
+        self.crawler_options = crawler_options
+
+    @classmethod
+    def from_settings(cls, settings, run=crawl_and_ingest):
+        """
+        Scheduler for the regions of settings.refresh_regions (a JSON list of
+        {"name": ..., "bounds": {...}}), crawled with the crawl options of `settings`.
+        """
+        regions = json.loads(settings.refresh_regions) if settings.refresh_regions else []
+        schedule_options = {
+            "min_interval": settings.refresh_min_interval,
+            "max_interval": settings.refresh_max_interval,
+            "target_change_rate": settings.refresh_target_change_rate,
+        }
+        return cls(regions, run=run, schedule_options=schedule_options, **settings.crawl_options())
+
+    async def run_due(self):
+        for region in self.regions:
+            if region.next_run > time.monotonic():
+                continue
+            try:
+                result = await self.run(region.bounds, **self.crawler_options)
+            except Exception as e:
+                logging.error(f"Refresh of region {region.name} failed: {e}")
+                region.record_failure()
+                continue
+            region.record(result)
+            logging.info(f"Refreshed region {region.name}: {region.last_result}, next in {region.interval:.0f}s")
+
+    async def run_forever(self):
+        while True:
+            await self.run_due()
+            wake = min(region.next_run for region in self.regions)
+            await asyncio.sleep(max(wake - time.monotonic(), 1.0))
+
+    def stats(self):
+        return [region.stats() for region in self.regions]
@@ -0,0 +1,134 @@
+import asyncio
+import functools
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import database
+from settings import DEFAULTS
+
+_io_executor = None
+_cpu_executor = None
+# Below this many points run_cpu() stays on the I/O thread pool
+_cpu_offload_min_items = DEFAULTS.cpu_offload_min_items
+
+
+def start_executors(io_workers=None, cpu_workers=None, cpu_offload_min_items=DEFAULTS.cpu_offload_min_items):
+    """
+    Create the thread and process pools. Called from the app lifespan.
+    I/O threads default to the Mongo pool size (no point exceeding it), CPU
+    processes to one per core.
+    """
+    global _io_executor, _cpu_executor, _cpu_offload_min_items
+    if io_workers is None:
+        io_workers = DEFAULTS.mongo_max_pool_size
+    if cpu_workers is None:
+        cpu_workers = os.cpu_count() or 1
+    _cpu_offload_min_items = cpu_offload_min_items
+    if _io_executor is None:
+        _io_executor = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="io")
+    if _cpu_executor is None and cpu_workers > 0:
+        _cpu_executor = ProcessPoolExecutor(max_workers=cpu_workers)
+    logging.info(f"Executors started (io={io_workers}, cpu={cpu_workers})")
+
+
+def shutdown_executors():
+    global _io_executor, _cpu_executor
+    if _cpu_executor is not None:
+        _cpu_executor.shutdown(wait=False, cancel_futures=True)
+        _cpu_executor = None
+    if _io_executor is not None:
+        _io_executor.shutdown(wait=False, cancel_futures=True)
+        _io_executor = None
+
+
+async def run_io(fn, *args, **kwargs):
+    """
+    Run a blocking call on the I/O thread pool so the event loop stays free.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_io_executor, functools.partial(fn, *args, **kwargs))
+
+
+async def run_cpu(fn, *args, size=None):
+    """
+    Run a CPU-heavy, picklable function in the process pool.
+    Small inputs (size < cpu_offload_min_items) run on the I/O thread pool instead.
+    """
+    loop = asyncio.get_running_loop()
+    if _cpu_executor is None or (size is not None and size < _cpu_offload_min_items):
+        return await loop.run_in_executor(_io_executor, functools.partial(fn, *args))
+    return await loop.run_in_executor(_cpu_executor, functools.partial(fn, *args))
+
+
+class AsyncCollection:
+    """
+    Async facade over one collection of the shared client.
+    Every pymongo call runs on the I/O thread pool; cursors are drained there too.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    @property
+    def collection(self):
+        return database.get_collection(self.name)
+
+    async def find(self, filter=None, projection=None, sort=None, limit=0):
+        def query():
+            cursor = self.collection.find(filter or {}, projection)
+            if sort:
+                cursor = cursor.sort(sort)
+            if limit:
+                cursor = cursor.limit(limit)
+            return list(cursor)
+
+        return await run_io(query)
+
+    async def find_one(self, filter, projection=None):
+        return await run_io(self.collection.find_one, filter, projection)
+
+    async def iter_batches(self, filter=None, projection=None, sort=None, limit=0, batch_size=500):
+        """
+        Yield lists of up to `batch_size` documents as the cursor produces them.
+        Each batch is pulled on the I/O thread pool; the cursor is closed on exit.
+        """
+        cursor = self.collection.find(filter or {}, projection, batch_size=batch_size)
+        if sort:
+            cursor = cursor.sort(sort)
+        if limit:
+            cursor = cursor.limit(limit)
+
+        def next_batch():
+            batch = []
+            for document in cursor:
+                batch.append(document)
+                if len(batch) >= batch_size:
+                    break
+            return batch
+
+        try:
+            while True:
+                batch = await run_io(next_batch)
+                if not batch:
+                    return
+                yield batch
+        finally:
+            cursor.close()
+
+    async def aggregate(self, pipeline):
+        return await run_io(lambda: list(self.collection.aggregate(pipeline)))
+
+    async def replace_one(self, filter, replacement):
+        return await run_io(self.collection.replace_one, filter, replacement)
+
+    async def run(self, fn, *args, **kwargs):
+        """
+        Run fn(collection, *args, **kwargs) on the I/O thread pool.
+        """
+        return await run_io(fn, self.collection, *args, **kwargs)
+
+
+parks_repository = AsyncCollection("baobao")
+chargers_repository = AsyncCollection("uxpropertegypt")
+history_repository = AsyncCollection("stations")
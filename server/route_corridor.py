@@ -0,0 +1,327 @@
+import math
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEG_LAT = math.pi * EARTH_RADIUS_KM / 180
+
+# Rows of the (points x segments) distance matrix computed per chunk
+CHUNK_CELLS = 2_000_000
+# Upper bound of RouteCorridor's default simplification tolerance, added to the
+# corridor width when preselecting candidates from a bounding box
+SIMPLIFY_TOLERANCE_MAX_KM = 0.025
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance in km. Accepts scalars or NumPy arrays (broadcast).
+    """
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def _project(lats, lons, ref_lat):
+    """
+    Local equirectangular projection to km, good enough for sub-degree segments.
+    """
+    scale = KM_PER_DEG_LAT
+    return lons * scale * math.cos(math.radians(ref_lat)), lats * scale
+
+
+def simplify_route(route_coords, tolerance_km):
+    """
+    Douglas-Peucker simplification of a (lat, lon) polyline.
+    Every dropped vertex lies within tolerance_km of the simplified line.
+    """
+    points = np.asarray(route_coords, dtype=float).reshape(-1, 2)
+    if len(points) < 3 or tolerance_km <= 0:
+        return points
+
+    x, y = _project(points[:, 0], points[:, 1], float(points[:, 0].mean()))
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        ax, ay, bx, by = x[start], y[start], x[end], y[end]
+        px, py = x[start + 1:end], y[start + 1:end]
+        dx, dy = bx - ax, by - ay
+        length_sq = dx * dx + dy * dy
+        if length_sq == 0:
+            dist = np.hypot(px - ax, py - ay)
+        else:
+            t = np.clip(((px - ax) * dx + (py - ay) * dy) / length_sq, 0.0, 1.0)
+            dist = np.hypot(px - (ax + t * dx), py - (ay + t * dy))
+        index = int(np.argmax(dist))
+        if dist[index] > tolerance_km:
+            split = start + 1 + index
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+
+    return points[keep]
+
+
+def densify_route(route_coords, max_segment_km):
+    """
+    Insert evenly spaced vertices so that no segment is longer than max_segment_km.
+    """
+    points = np.asarray(route_coords, dtype=float).reshape(-1, 2)
+    if len(points) < 2:
+        return points
+
+    lengths = haversine_km(points[:-1, 0], points[:-1, 1], points[1:, 0], points[1:, 1])
+    pieces = np.maximum(np.ceil(lengths / max_segment_km), 1).astype(int)
+
+    out = [points[:1]]
+    for (start, end, n) in zip(points[:-1], points[1:], pieces):
+        t = (np.arange(1, n + 1) / n)[:, None]
+        out.append(start + t * (end - start))
+    return np.concatenate(out)
+
+
+def segment_distance_km(p_lat, p_lon, a_lat, a_lon, d_lat, d_lon):
+    """
+    Distance in km from points to segments (start a, extent d) and the fractional
+    position (0..1) of the nearest point on the segment. Arguments broadcast.
+    """
+    # Project each segment into a plane centred on the point, then clamp
+    coslat = np.cos(np.radians(p_lat))
+    ax, ay = (a_lon - p_lon) * coslat, a_lat - p_lat
+    dx, dy = d_lon * coslat, d_lat
+    length_sq = dx * dx + dy * dy
+    with np.errstate(invalid="ignore", divide="ignore"):
+        t = np.where(length_sq > 0, -(ax * dx + ay * dy) / length_sq, 0.0)
+    t = np.clip(t, 0.0, 1.0)
+    return haversine_km(p_lat, p_lon, a_lat + t * d_lat, a_lon + t * d_lon), t
+
+
+def point_to_segment_km(lats, lons, seg_start, seg_end):
+    """
+    Distance in km from every point to its nearest segment, plus the index of that
+    segment and the fractional position (0..1) of the nearest point along it.
+    """
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+    n = len(lats)
+    best = np.full(n, np.inf)
+    best_segment = np.zeros(n, dtype=int)
+    best_t = np.zeros(n)
+    if n == 0 or len(seg_start) == 0:
+        return best, best_segment, best_t
+
+    a_lat, a_lon = seg_start[:, 0], seg_start[:, 1]
+    d_lat, d_lon = seg_end[:, 0] - a_lat, seg_end[:, 1] - a_lon
+    rows = max(1, CHUNK_CELLS // len(seg_start))
+
+    for lo in range(0, n, rows):
+        dist, t = segment_distance_km(lats[lo:lo + rows, None], lons[lo:lo + rows, None], a_lat, a_lon, d_lat, d_lon)
+        index = np.argmin(dist, axis=1)
+        rows_idx = np.arange(len(index))
+        best[lo:lo + rows] = dist[rows_idx, index]
+        best_segment[lo:lo + rows] = index
+        best_t[lo:lo + rows] = t[rows_idx, index]
+
+    return best, best_segment, best_t
+
+
+def _widest_latitude(points):
+    return min(float(np.abs(points[:, 0]).max()) + 1.0, 89.0)
+
+
+def corridor_box(route_coords, buffer_km):
+    """
+    (min_lat, max_lat, min_lon, max_lon) of the route's bounding box grown by buffer_km;
+    the longitude buffer uses the widest latitude, so the box never cuts the corridor.
+    """
+    points = np.asarray(route_coords, dtype=float).reshape(-1, 2)
+    lat_buffer = buffer_km / KM_PER_DEG_LAT
+    lon_buffer = buffer_km / (KM_PER_DEG_LAT * math.cos(math.radians(_widest_latitude(points))))
+    return (
+        float(points[:, 0].min()) - lat_buffer,
+        float(points[:, 0].max()) + lat_buffer,
+        float(points[:, 1].min()) - lon_buffer,
+        float(points[:, 1].max()) + lon_buffer,
+    )
+
+
+class RouteCorridor:
+    """
+    The set of points within max_distance_km of a decoded route polyline.
+
+    The route is simplified (Douglas-Peucker) for the exact distance step and densified
+    to mark a coarse grid of cells it passes through. Candidate points are prefiltered
+    by the route's buffered bounding box and by that grid before the exact
+    point-to-segment haversine distance is computed in batch.
+    """
+
+    def __init__(self, route_coords, max_distance_km=0.5, simplify_tolerance_km=None):
+        self.max_distance_km = max_distance_km
+        points = np.asarray(route_coords, dtype=float).reshape(-1, 2)
+        if len(points) == 0:
+            raise ValueError("Route must contain at least one point")
+
+        if simplify_tolerance_km is None:
+            # Bounded by a small fraction of the corridor width
+            simplify_tolerance_km = min(0.05 * max_distance_km, SIMPLIFY_TOLERANCE_MAX_KM)
+        self.simplify_tolerance_km = simplify_tolerance_km
+
+        self.points = simplify_route(points, simplify_tolerance_km)
+        if len(self.points) == 1:
+            self.points = np.vstack([self.points, self.points])
+        self.seg_start = self.points[:-1]
+        self.seg_end = self.points[1:]
+        self._a_lat, self._a_lon = self.seg_start[:, 0].copy(), self.seg_start[:, 1].copy()
+        self._d_lat = self.seg_end[:, 0] - self._a_lat
+        self._d_lon = self.seg_end[:, 1] - self._a_lon
+        # Segment lengths and the along-route distance at which each segment starts
+        self.segment_km = haversine_km(self.seg_start[:, 0], self.seg_start[:, 1], self.seg_end[:, 0], self.seg_end[:, 1])
+        self.cumulative_km = np.concatenate([[0.0], np.cumsum(self.segment_km)[:-1]])
+
+        buffer_km = max_distance_km + simplify_tolerance_km
+        max_abs_lat = _widest_latitude(points)
+        self.min_lat, self.max_lat, self.min_lon, self.max_lon = corridor_box(points, buffer_km)
+
+        # Grid: with vertices at most cell/2 apart, any point within buffer_km of the
+        # route is in the 3x3 neighbourhood of a marked cell when cell >= 4/3 * buffer
+        self.cell_km = 1.5 * buffer_km
+        self.cell_lat = self.cell_km / KM_PER_DEG_LAT
+        self.cell_lon = self.cell_km / (KM_PER_DEG_LAT * math.cos(math.radians(max_abs_lat)))
+        dense = densify_route(self.points, self.cell_km / 2)
+        dense_segment = np.concatenate([[0], np.repeat(np.arange(len(self.seg_start)), self._pieces(self.cell_km / 2))])
+        cells = self._cell_keys(dense[:, 0], dense[:, 1])
+        offsets = np.array([dy * self._ROW + dx for dy in (-1, 0, 1) for dx in (-1, 0, 1)])
+
+        # Every segment is registered in the 3x3 neighbourhood of the cells it passes
+        # through, so the segments near a point are the ones listed for its own cell
+        keys = (cells[:, None] + offsets).ravel()
+        segments = np.repeat(dense_segment, len(offsets))
+        order = np.lexsort((segments, keys))
+        keys, segments = keys[order], segments[order]
+        distinct = np.ones(len(keys), dtype=bool)
+        distinct[1:] = (keys[1:] != keys[:-1]) | (segments[1:] != segments[:-1])
+        keys, self.cell_segments = keys[distinct], segments[distinct]
+        self.cells, self.cell_starts, counts = np.unique(keys, return_index=True, return_counts=True)
+        self.cell_ends = self.cell_starts + counts
+
+    _ROW = 1 << 32
+
+    def _pieces(self, max_segment_km):
+        # Same split as densify_route
+        return np.maximum(np.ceil(self.segment_km / max_segment_km), 1).astype(int)
+
+    def _cell_keys(self, lats, lons):
+        row = np.floor((lats - self.min_lat) / self.cell_lat).astype(np.int64)
+        col = np.floor((lons - self.min_lon) / self.cell_lon).astype(np.int64)
+        return row * self._ROW + col
+
+    def prefilter(self, lats, lons):
+        """
+        Boolean mask of points that may be within the corridor (no false negatives).
+        """
+        lats = np.asarray(lats, dtype=float)
+        lons = np.asarray(lons, dtype=float)
+        mask = (
+            (lats >= self.min_lat) & (lats <= self.max_lat)
+            & (lons >= self.min_lon) & (lons <= self.max_lon)
+        )
+        candidates = np.flatnonzero(mask)
+        if len(candidates):
+            in_grid = np.isin(self._cell_keys(lats[candidates], lons[candidates]), self.cells)
+            mask[candidates[~in_grid]] = False
+        return mask
+
+    def distances_km(self, lats, lons):
+        """
+        Point-to-route distance in km for every point (no prefilter).
+        """
+        return point_to_segment_km(lats, lons, self.seg_start, self.seg_end)[0]
+
+    def nearest_segments(self, lats, lons):
+        """
+        Like point_to_segment_km, but only measuring the segments registered in each
+        point's grid cell. Exact for points within the corridor buffer; points outside
+        every marked cell get an infinite distance.
+        """
+        lats = np.asarray(lats, dtype=float)
+        lons = np.asarray(lons, dtype=float)
+        n = len(lats)
+        best = np.full(n, np.inf)
+        best_segment = np.zeros(n, dtype=int)
+        best_t = np.zeros(n)
+        if n == 0:
+            return best, best_segment, best_t
+
+        keys = self._cell_keys(lats, lons)
+        slot = np.minimum(np.searchsorted(self.cells, keys), len(self.cells) - 1)
+        counts = np.where(self.cells[slot] == keys, self.cell_ends[slot] - self.cell_starts[slot], 0)
+
+        # One (point, segment) pair per segment listed in the point's cell
+        point = np.repeat(np.arange(n), counts)
+        first = np.cumsum(counts) - counts
+        segment = self.cell_segments[np.repeat(self.cell_starts[slot], counts) + np.arange(len(point)) - np.repeat(first, counts)]
+        dist, t = segment_distance_km(
+            lats[point], lons[point],
+            self._a_lat[segment], self._a_lon[segment], self._d_lat[segment], self._d_lon[segment],
+        )
+        if not len(point):
+            return best, best_segment, best_t
+
+        # Pairs are grouped by point already: keep the first closest pair of each group
+        groups = first[counts > 0]
+        nearest = np.minimum.reduceat(dist, groups)
+        hits = np.flatnonzero(dist == np.repeat(nearest, counts[counts > 0]))
+        closest = hits[np.r_[True, point[hits][1:] != point[hits][:-1]]]
+        best[point[closest]] = dist[closest]
+        best_segment[point[closest]] = segment[closest]
+        best_t[point[closest]] = t[closest]
+        return best, best_segment, best_t
+
+    def project(self, lats, lons):
+        """
+        (detour km, along-route km from the origin) of every point's nearest spot on
+        the route. Exact within the corridor buffer (see nearest_segments).
+        """
+        detour, segment, t = self.nearest_segments(lats, lons)
+        return detour, self.cumulative_km[segment] + t * self.segment_km[segment]
+
+    def rank(self, lats, lons):
+        """
+        Indices of the points within max_distance_km ordered by their position along
+        the route, with their along-route and detour distances in km.
+        """
+        lats = np.asarray(lats, dtype=float)
+        lons = np.asarray(lons, dtype=float)
+        candidates = np.flatnonzero(self.prefilter(lats, lons))
+        detour, along = self.project(lats[candidates], lons[candidates])
+        near = detour <= self.max_distance_km
+        candidates, detour, along = candidates[near], detour[near], along[near]
+        order = np.lexsort((detour, along))
+        return candidates[order], along[order], detour[order]
+
+    def contains(self, lats, lons):
+        """
+        Boolean mask of points within max_distance_km of the route.
+        """
+        lats = np.asarray(lats, dtype=float)
+        lons = np.asarray(lons, dtype=float)
+        mask = self.prefilter(lats, lons)
+        candidates = np.flatnonzero(mask)
+        if len(candidates):
+            dist = self.nearest_segments(lats[candidates], lons[candidates])[0]
+            mask[candidates[dist > self.max_distance_km]] = False
+        return mask
+
+
+def rank_along_route(route_coords, lats, lons, max_distance_km):
+    """
+    Module-level entry point (picklable for a process pool): RouteCorridor.rank for many points.
+    """
+    return RouteCorridor(route_coords, max_distance_km).rank(lats, lons)
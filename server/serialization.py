@@ -0,0 +1,104 @@
+import json
+from datetime import datetime, timezone
+from typing import Any
+
+from bson import ObjectId
+from fastapi.responses import JSONResponse, Response
+
+from tracing import span
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+
+def _default(obj):
+    # Types neither encoder handles on its own
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if hasattr(obj, "item"):  # NumPy scalars
+        return obj.item()
+    if hasattr(obj, "tolist"):  # NumPy arrays
+        return obj.tolist()
+    if isinstance(obj, datetime):  # stdlib fallback only; orjson writes datetimes itself
+        return obj.isoformat()
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def _epoch_millis_default(obj):
+    if isinstance(obj, datetime):
+        if obj.tzinfo is None:
+            obj = obj.replace(tzinfo=timezone.utc)  # Stored datetimes are naive UTC
+        return int(obj.timestamp() * 1000)
+    return _default(obj)
+
+
+if ORJSON_AVAILABLE:
+    _OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def dumps(content, epoch_millis=False):
+        """
+        Encode to compact JSON bytes. ObjectId becomes its hex string; datetimes are
+        ISO 8601, or milliseconds since the epoch with epoch_millis=True.
+        """
+        if epoch_millis:
+            return orjson.dumps(content, default=_epoch_millis_default, option=_OPTIONS | orjson.OPT_PASSTHROUGH_DATETIME)
+        return orjson.dumps(content, default=_default, option=_OPTIONS)
+else:
+    def dumps(content, epoch_millis=False):
+        """
+        Encode to compact JSON bytes. ObjectId becomes its hex string; datetimes are
+        ISO 8601, or milliseconds since the epoch with epoch_millis=True.
+        """
+        return json.dumps(
+            content,
+            default=_epoch_millis_default if epoch_millis else _default,
+            separators=(",", ":"),
+            ensure_ascii=False,
+        ).encode()
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response encoded with orjson when it is installed.
+
+    Return an instance directly from an endpoint: the content is encoded as is,
+    skipping FastAPI's jsonable_encoder pass, and Mongo documents can be passed
+    without converting ObjectId/datetime values first.
+    """
+
+    def render(self, content: Any) -> bytes:
+        with span("serialize"):
+            return dumps(content)
+
+
+class EpochMillisJSONResponse(JSONResponse):
+    """
+    FastJSONResponse that writes datetimes as milliseconds since the epoch, the format
+    the stored parks use for 'timestamp' and 'lastUpdated'.
+    """
+
+    def render(self, content: Any) -> bytes:
+        with span("serialize"):
+            return dumps(content, epoch_millis=True)
+
+
+class MsgPackResponse(Response):
+    """
+    MessagePack response (format=msgpack). Same value mapping as FastJSONResponse;
+    only available when msgpack is installed.
+    """
+
+    media_type = "application/msgpack"
+
+    def render(self, content: Any) -> bytes:
+        with span("serialize"):
+            return msgpack.packb(content, default=_default, datetime=False)
@@ -0,0 +1,207 @@
+import os
+from dataclasses import dataclass, field, fields
+from typing import Optional, Tuple
+
+
+def _environment(env_file):
+    """
+    The process environment over the values in `env_file`. The file is read with
+    dotenv_values, which leaves os.environ untouched.
+    """
+    values = {}
+    if env_file and os.path.exists(env_file):
+        from dotenv import dotenv_values
+
+        values.update({key: value for key, value in dotenv_values(env_file).items() if value is not None})
+    values.update(os.environ)
+    return values
+
+
+def _flag(value):
+    return value.strip().lower() in ("1", "true", "yes")
+
+
+def _optional_int(value):
+    return int(value) if value.strip() else None
+
+
+def _origins(value):
+    return tuple(origin.strip() for origin in value.split(",") if origin.strip())
+
+
+def setting(env, default, parse=None, **options):
+    """
+    A Settings field read from the environment variable `env`. Values are parsed
+    with `parse`, or with the type of the default.
+    """
+    if parse is None:
+        parse = _flag if isinstance(default, bool) else type(default) if default is not None else str
+    return field(default=default, metadata={"env": env, "parse": parse}, **options)
+
+
+@dataclass(frozen=True)
+class Settings:
+    """
+    Configuration read once when the app is created and handed to every component
+    from create_app(); modules do not read the environment themselves. The field
+    defaults are the defaults of the whole server. Secrets are left out of repr().
+    """
+
+    # MongoDB: MONGO_URI, or an Atlas cluster built from the three MONGO_DB_* values
+    mongo_uri: Optional[str] = setting("MONGO_URI", None, repr=False)
+    mongo_db_user: Optional[str] = setting("MONGO_DB_USER", None)
+    mongo_db_password: Optional[str] = setting("MONGO_DB_PASSWORD", None, repr=False)
+    mongo_db_uri: Optional[str] = setting("MONGO_DB_URI", None)
+    mongo_database: str = setting("MONGO_DATABASE", "betabase")
+    mongo_max_pool_size: int = setting("MONGO_MAX_POOL_SIZE", 50)
+    mongo_min_pool_size: int = setting("MONGO_MIN_POOL_SIZE", 0)
+    mongo_max_idle_time_ms: int = setting("MONGO_MAX_IDLE_TIME_MS", 60000)
+    mongo_wait_queue_timeout_ms: int = setting("MONGO_WAIT_QUEUE_TIMEOUT_MS", 5000)
+
+    google_maps_api_key: Optional[str] = setting("GOOGLE_MAPS_API_KEY", None, repr=False)
+    cors_origins: Tuple[str, ...] = setting("CORS_ORIGINS", ("*",), parse=_origins)
+    log_level: str = setting("LOG_LEVEL", "INFO", parse=str.upper)
+    log_format: str = setting("LOG_FORMAT", "text", parse=str.lower)
+    log_sample_rate: float = setting("LOG_SAMPLE_RATE", 1.0)
+    # Clients send X-Profile to get a Server-Timing breakdown; False ignores the header
+    request_profiling: bool = setting("REQUEST_PROFILING", True)
+
+    # Threads for blocking I/O (pymongo, googlemaps); by default the Mongo pool size
+    io_workers: Optional[int] = setting("IO_WORKERS", None, parse=_optional_int)
+    # Processes for CPU-heavy distance filtering; by default one per core
+    cpu_workers: Optional[int] = setting("CPU_WORKERS", None, parse=_optional_int)
+    # Below this many points the pickling round trip costs more than it saves
+    cpu_offload_min_items: int = setting("CPU_OFFLOAD_MIN_ITEMS", 5000)
+
+    # FLO crawl (markers/search) and station lookups
+    flo_markers_url: str = setting("FLO_MARKERS_URL", "https://emobility.flo.ca/v3.0/map/markers/search")
+    flo_station_url: str = setting("FLO_STATION_URL", "https://emobility.flo.ca/v3.0/parks/station/{station_id}")
+    flo_crawl_concurrency: int = setting("FLO_CRAWL_CONCURRENCY", 8)
+    flo_rate_limit_per_second: float = setting("FLO_RATE_LIMIT_PER_SECOND", 10.0)
+    flo_max_retries: int = setting("FLO_MAX_RETRIES", 3)
+    flo_request_timeout: float = setting("FLO_REQUEST_TIMEOUT", 15.0)
+    # Largest "concurrency" a /find_parks caller may ask for
+    flo_max_crawl_concurrency: int = setting("FLO_MAX_CRAWL_CONCURRENCY", 32)
+    ingest_batch_size: int = setting("INGEST_BATCH_SIZE", 500)
+
+    # Station addresses fetched after a crawl, cached in Mongo with a TTL index
+    address_cache_collection: str = setting("ADDRESS_CACHE_COLLECTION", "address_cache")
+    address_cache_ttl_seconds: int = setting("ADDRESS_CACHE_TTL_SECONDS", 30 * 24 * 3600)
+    address_fetch_workers: int = setting("ADDRESS_FETCH_WORKERS", 8)
+    address_fetch_retries: int = setting("ADDRESS_FETCH_RETRIES", 2)
+    address_fetch_timeout: float = setting("ADDRESS_FETCH_TIMEOUT", 10.0)
+
+    # Google Maps geocodes and routes: in-process LRU over a shared Mongo tier
+    geo_cache_collection: str = setting("GEO_CACHE_COLLECTION", "geo_cache")
+    geocode_cache_ttl_seconds: int = setting("GEOCODE_CACHE_TTL_SECONDS", 30 * 24 * 3600)
+    route_cache_ttl_seconds: int = setting("ROUTE_CACHE_TTL_SECONDS", 24 * 3600)
+    geo_cache_maxsize: int = setting("GEO_CACHE_MAXSIZE", 2048)
+
+    # Crawl jobs; each one already fans out to flo_crawl_concurrency requests
+    jobs_collection: str = setting("JOBS_COLLECTION", "crawl_jobs")
+    job_workers: int = setting("JOB_WORKERS", 1)
+    job_retention_seconds: int = setting("JOB_RETENTION_SECONDS", 7 * 24 * 3600)
+
+    # Background re-crawls: a JSON list of {"name": ..., "bounds": {...}}, and the
+    # bounds of the adaptive interval between two crawls of one region
+    refresh_regions: str = setting("REFRESH_REGIONS", "")
+    refresh_min_interval: float = setting("REFRESH_MIN_INTERVAL", 300.0)
+    refresh_max_interval: float = setting("REFRESH_MAX_INTERVAL", 6 * 3600.0)
+    # Share of changed parks above which a region is re-crawled sooner, below which later
+    refresh_target_change_rate: float = setting("REFRESH_TARGET_CHANGE_RATE", 0.05)
+
+    # In-memory read snapshots (False queries MongoDB on every request)
+    snapshot_enabled: bool = setting("SNAPSHOT_ENABLED", True)
+    # Rebuild a snapshot at least this often, to pick up writes made by other processes
+    snapshot_max_staleness_seconds: float = setting("SNAPSHOT_MAX_STALENESS_SECONDS", 300.0)
+    # Side of a spatial grid cell in degrees
+    snapshot_grid_degrees: float = setting("SNAPSHOT_GRID_DEGREES", 0.25)
+
+    # k-nearest queries: KD-tree leaf size, share of moved/added/removed parks after
+    # which the tree is rebuilt rather than patched, request limits, and the filtered
+    # match count up to which queries are answered by brute force
+    nearest_leaf_size: int = setting("NEAREST_LEAF_SIZE", 32)
+    nearest_rebuild_fraction: float = setting("NEAREST_REBUILD_FRACTION", 0.1)
+    nearest_max_k: int = setting("NEAREST_MAX_K", 100)
+    nearest_max_origins: int = setting("NEAREST_MAX_ORIGINS", 100)
+    nearest_brute_force_max: int = setting("NEAREST_BRUTE_FORCE_MAX", 2048)
+
+    # Routes per POST /chargers-on-routes, and Directions calls in flight for one batch
+    corridor_max_routes: int = setting("CORRIDOR_MAX_ROUTES", 500)
+    corridor_directions_concurrency: int = setting("CORRIDOR_DIRECTIONS_CONCURRENCY", 16)
+
+    # Map tiles: cached tiles, and the zoom below which parks are clustered
+    tile_cache_maxsize: int = setting("TILE_CACHE_MAXSIZE", 4096)
+    cluster_max_zoom: int = setting("CLUSTER_MAX_ZOOM", 15)
+
+    # Responses smaller than this are sent as is; zlib level 1-9 and brotli quality 0-11
+    compression_min_size: int = setting("COMPRESSION_MIN_SIZE", 1024)
+    gzip_level: int = setting("GZIP_LEVEL", 6)
+    brotli_quality: int = setting("BROTLI_QUALITY", 5)
+
+    @classmethod
+    def from_env(cls, env_file=".env"):
+        env = _environment(env_file)
+        values = {}
+        for settings_field in fields(cls):
+            raw = env.get(settings_field.metadata["env"])
+            if raw is not None and raw != "":
+                values[settings_field.name] = settings_field.metadata["parse"](raw)
+        return cls(**values)
+
+    @property
+    def database_uri(self):
+        """
+        MONGO_URI when set, otherwise the Atlas URI built from MONGO_DB_USER,
+        MONGO_DB_PASSWORD and MONGO_DB_URI.
+        """
+        if self.mongo_uri:
+            return self.mongo_uri
+        if not (self.mongo_db_user and self.mongo_db_password and self.mongo_db_uri):
+            raise RuntimeError("Set MONGO_URI, or MONGO_DB_USER, MONGO_DB_PASSWORD and MONGO_DB_URI")
+        return f"mongodb+srv://{self.mongo_db_user}:{self.mongo_db_password}@{self.mongo_db_uri}/?retryWrites=true&w=majority"
+
+    def pool_options(self):
+        """
+        Keyword arguments of database.init_client().
+        """
+        return {
+            "maxPoolSize": self.mongo_max_pool_size,
+            "minPoolSize": self.mongo_min_pool_size,
+            "maxIdleTimeMS": self.mongo_max_idle_time_ms,
+            "waitQueueTimeoutMS": self.mongo_wait_queue_timeout_ms,
+        }
+
+    def crawl_options(self):
+        """
+        Keyword arguments of refresh.crawl_and_ingest(): the ClusterCrawler options,
+        plus the ingest batch size and the AddressEnricher options.
+        """
+        return {
+            "api_url": self.flo_markers_url,
+            "max_concurrency": self.flo_crawl_concurrency,
+            "rate_per_second": self.flo_rate_limit_per_second,
+            "max_retries": self.flo_max_retries,
+            "timeout": self.flo_request_timeout,
+            "batch_size": self.ingest_batch_size,
+            "enricher_options": {
+                "station_url": self.flo_station_url,
+                "max_workers": self.address_fetch_workers,
+                "max_retries": self.address_fetch_retries,
+                "timeout": self.address_fetch_timeout,
+            },
+        }
+
+    def nearest_options(self):
+        """
+        Keyword arguments of nearest.NearestIndex().
+        """
+        return {
+            "leaf_size": self.nearest_leaf_size,
+            "rebuild_fraction": self.nearest_rebuild_fraction,
+            "brute_force_max": self.nearest_brute_force_max,
+        }
+
+
+# Defaults for code that runs without an app (scripts, benchmarks, tests)
+DEFAULTS = Settings()
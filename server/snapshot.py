@@ -0,0 +1,379 @@
+import asyncio
+import bisect
+import logging
+import math
+import time
+
+import numpy as np
+
+import database
+from ingest import park_summary
+from nearest import NearestIndex
+from repository import run_io
+from route_corridor import KM_PER_DEG_LAT, haversine_km
+from settings import DEFAULTS
+
+# Values accepted by the level and connector filters (FLO's station enums). They become
+# Mongo field paths in summary_query(), so anything else is rejected up front
+CHARGER_LEVELS = ("L1", "L2", "L3")
+CONNECTOR_TYPES = (
+    "CHADEMO",
+    "IEC_62196_T1",
+    "IEC_62196_T1_COMBO",
+    "IEC_62196_T2",
+    "IEC_62196_T2_COMBO",
+    "NEMA_5_20",
+    "SAE_J3400",
+    "TESLA_S",
+)
+LEVEL_PATTERN = f"^({'|'.join(CHARGER_LEVELS)})$"
+CONNECTOR_PATTERN = f"^({'|'.join(CONNECTOR_TYPES)})$"
+
+
+def _coordinates(doc):
+    coordinates = doc.get("geoCoordinates")
+    if not isinstance(coordinates, dict):
+        return math.nan, math.nan
+    try:
+        return float(coordinates["latitude"]), float(coordinates["longitude"])
+    except (KeyError, TypeError, ValueError):
+        return math.nan, math.nan
+
+
+def summary_query(min_charging_speed=None, level=None, connector=None, available=False):
+    """
+    Mongo filter on the stored summaries matching the /chargers-on-route and
+    /stations/nearest filters. Filters apply per park: each one needs some station of
+    the park, not necessarily the same one (the summaries hold no per-station rows).
+    """
+    if level is not None and level not in CHARGER_LEVELS:
+        raise ValueError(f"Unknown charger level: {level}")
+    if connector is not None and connector not in CONNECTOR_TYPES:
+        raise ValueError(f"Unknown connector type: {connector}")
+    query = {}
+    if min_charging_speed is not None:
+        query["summary.maxChargingSpeed"] = {"$gte": min_charging_speed}
+    if level is not None:
+        query[f"summary.levels.{level}"] = {"$gt": 0}
+    if connector is not None:
+        query[f"summary.connectors.{connector}"] = {"$gt": 0}
+    if available:
+        query["summary.availableChargers"] = {"$gt": 0}
+    return query
+
+
+def find_with_summaries(collection, projection, query=None):
+    """
+    All documents of a collection with `projection`. When the projection leaves out
+    'stations', parks stored without a 'summary' get one computed from a second,
+    targeted read (run `python -m backfill` to store them).
+    """
+    docs = list(collection.find(query or {}, projection))
+    exclusion = not any(value for key, value in projection.items() if key != "_id")
+    if exclusion or "stations" in projection:
+        return docs
+    missing = {doc["id"]: doc for doc in docs if "summary" not in doc and "id" in doc}
+    if missing:
+        logging.warning(f"{len(missing)} parks in {collection.name} have no stored summary; run python -m backfill")
+        for park in collection.find({"id": {"$in": list(missing)}}, {"_id": 0, "id": 1, "stations": 1}):
+            missing[park["id"]]["summary"] = park_summary(park.get("stations") or [])
+    return docs
+
+
+class ParkSnapshot:
+    """
+    Immutable columnar view of one collection of parks.
+
+    Coordinates and per-park aggregates live in NumPy arrays indexed by row; the
+    documents themselves are kept for response bodies. Prebuilt indexes: park id ->
+    row, substation id -> (row, position in 'stations'), rows sorted by id (for
+    pagination) and a grid of `grid_degrees` cells (for radius queries). With
+    `nearest`, a KD-tree for k-nearest queries is built too (patched from `previous`'s
+    when it has one); otherwise it is only built by the first nearest() call.
+    `nearest_options` go to NearestIndex. Parks without valid coordinates get NaN and
+    never match a spatial query.
+    """
+
+    def __init__(self, docs, previous=None, nearest=False, grid_degrees=DEFAULTS.snapshot_grid_degrees,
+                 nearest_options=None):
+        self.docs = docs
+        self.built_at = time.monotonic()
+        self.grid_degrees = grid_degrees
+        self.grid_columns = math.ceil(360 / grid_degrees) + 1
+        self.nearest_options = nearest_options or {}
+        n = len(docs)
+        coordinates = np.array([_coordinates(doc) for doc in docs], dtype=float).reshape(n, 2)
+        self.lats = coordinates[:, 0]
+        self.lons = coordinates[:, 1]
+
+        self.total = np.zeros(n, dtype=np.int32)
+        self.available = np.zeros(n, dtype=np.int32)
+        self.average_speed = np.full(n, np.nan)
+        self.max_speed = np.full(n, np.nan)
+        self.level_masks = {}
+        self.connector_masks = {}
+        self.row_of = {}
+        self.station_row = {}
+        for row, doc in enumerate(docs):
+            stations = doc.get("stations") or []
+            self.row_of[doc.get("id")] = row
+            # Stored at write time; computed here only for parks not backfilled yet
+            summary = doc.get("summary") or park_summary(stations)
+            self.total[row] = summary["totalChargers"]
+            self.available[row] = summary["availableChargers"]
+            if summary["averageChargingSpeed"] is not None:
+                self.average_speed[row] = summary["averageChargingSpeed"]
+            if summary.get("maxChargingSpeed") is not None:
+                self.max_speed[row] = summary["maxChargingSpeed"]
+            for level, count in summary.get("levels", {}).items():
+                if count:
+                    self.level_masks.setdefault(level, np.zeros(n, dtype=bool))[row] = True
+            for connector, count in summary.get("connectors", {}).items():
+                if count:
+                    self.connector_masks.setdefault(connector, np.zeros(n, dtype=bool))[row] = True
+            for position, station in enumerate(stations):
+                if "id" in station:
+                    self.station_row[station["id"]] = (row, position)
+
+        self.id_order = sorted(range(n), key=lambda row: str(docs[row].get("id")))
+        self.sorted_ids = [str(docs[row].get("id")) for row in self.id_order]
+
+        # Grid: rows sorted by cell key, so every run of cells in one grid row is one slice
+        located = np.flatnonzero(~np.isnan(self.lats) & ~np.isnan(self.lons))
+        keys = self._cell_keys(self.lats[located], self.lons[located])
+        order = np.argsort(keys, kind="stable")
+        self.grid_keys = keys[order]
+        self.grid_rows = located[order]
+
+        self.nearest_index = None
+        if nearest:
+            self._build_nearest_index(previous.nearest_index if previous is not None else None)
+
+    def _build_nearest_index(self, previous_index=None):
+        self.nearest_index = NearestIndex(
+            self.lats, self.lons, [doc.get("id") for doc in self.docs], previous_index, **self.nearest_options
+        )
+        return self.nearest_index
+
+    def __len__(self):
+        return len(self.docs)
+
+    def _cell(self, lats, lons):
+        row = np.floor((np.asarray(lats) + 90) / self.grid_degrees).astype(np.int64)
+        col = np.floor((np.asarray(lons) + 180) / self.grid_degrees).astype(np.int64)
+        return row, col
+
+    def _cell_keys(self, lats, lons):
+        row, col = self._cell(lats, lons)
+        return row * self.grid_columns + col
+
+    def age(self):
+        return time.monotonic() - self.built_at
+
+    def candidates_in_box(self, min_lat, max_lat, min_lon, max_lon):
+        """
+        Rows in the grid cells overlapping a lat/lon box (a superset of the rows inside it).
+        """
+        (row_lo, row_hi), (col_lo, col_hi) = self._cell([max(min_lat, -90), min(max_lat, 90)],
+                                                        [max(min_lon, -180), min(max_lon, 180)])
+        slices = []
+        for row in range(int(row_lo), int(row_hi) + 1):
+            start = np.searchsorted(self.grid_keys, row * self.grid_columns + col_lo, side="left")
+            end = np.searchsorted(self.grid_keys, row * self.grid_columns + col_hi, side="right")
+            if end > start:
+                slices.append(self.grid_rows[start:end])
+        return np.concatenate(slices) if slices else np.empty(0, dtype=np.int64)
+
+    def within_radius(self, lat, lon, radius_km, limit=None):
+        """
+        (rows, distances in km) of the parks within radius_km of a point, nearest first.
+        """
+        lat_span = radius_km / KM_PER_DEG_LAT
+        widest = min(abs(lat) + lat_span, 89.9)
+        lon_span = radius_km / (KM_PER_DEG_LAT * math.cos(math.radians(widest)))
+        rows = self.candidates_in_box(lat - lat_span, lat + lat_span, lon - lon_span, lon + lon_span)
+        distances = haversine_km(lat, lon, self.lats[rows], self.lons[rows])
+        inside = distances <= radius_km
+        rows, distances = rows[inside], distances[inside]
+        order = np.argsort(distances, kind="stable")
+        if limit is not None:
+            order = order[:limit]
+        return rows[order], distances[order]
+
+    def nearest(self, lats, lons, k, mask=None):
+        """
+        For each origin, (rows, distances in km) of the k nearest parks, nearest first.
+        """
+        index = self.nearest_index or self._build_nearest_index()
+        return index.nearest_many(lats, lons, k, mask)
+
+    def filter_mask(self, min_charging_speed=None, level=None, connector=None, available=False):
+        """
+        Rows with a station of at least `min_charging_speed`, one of `level`, one with
+        `connector` and an available one (not necessarily the same station), or None
+        when no filter is given. Mirrors summary_query().
+        """
+        if min_charging_speed is None and level is None and connector is None and not available:
+            return None
+        mask = np.ones(len(self.docs), dtype=bool)
+        if min_charging_speed is not None:
+            with np.errstate(invalid="ignore"):
+                mask &= self.max_speed >= min_charging_speed
+        if level is not None:
+            mask &= self.level_masks.get(level, np.zeros(len(self.docs), dtype=bool))
+        if connector is not None:
+            mask &= self.connector_masks.get(connector, np.zeros(len(self.docs), dtype=bool))
+        if available:
+            mask &= self.available > 0
+        return mask
+
+    def page(self, after=None, limit=None):
+        """
+        Documents sorted by id, starting after the id `after`.
+        """
+        start = bisect.bisect_right(self.sorted_ids, str(after)) if after is not None else 0
+        end = len(self.id_order) if not limit else start + limit
+        return [self.docs[row] for row in self.id_order[start:end]]
+
+    def find(self, park_id):
+        row = self.row_of.get(park_id)
+        return None if row is None else self.docs[row]
+
+    def find_station(self, station_id):
+        """
+        (parent document, station) for a substation id, or None.
+        """
+        entry = self.station_row.get(station_id)
+        if entry is None:
+            return None
+        row, position = entry
+        return self.docs[row], self.docs[row]["stations"][position]
+
+
+class SnapshotStore:
+    """
+    Holds the current ParkSnapshot of a collection and swaps in rebuilt ones.
+
+    Readers take `current()` once per request and use that snapshot throughout;
+    a rebuild replaces the reference in one assignment, so a reader never sees a
+    half-built snapshot. Rebuilds run on the I/O thread pool and are coalesced:
+    concurrent refresh() calls share one rebuild that starts after the last call.
+    When disabled, current() returns None and readers query MongoDB instead.
+    """
+
+    def __init__(self, collection_name, projection=None, max_staleness=DEFAULTS.snapshot_max_staleness_seconds,
+                 nearest=False):
+        self.collection_name = collection_name
+        self.projection = projection or {"_id": 0}
+        self.nearest = nearest
+        self.max_staleness = max_staleness
+        self.enabled = DEFAULTS.snapshot_enabled
+        self.grid_degrees = DEFAULTS.snapshot_grid_degrees
+        self.nearest_options = DEFAULTS.nearest_options()
+        self.dirty = False
+        self.builds = 0
+        self.last_build_seconds = None
+        self._snapshot = None
+        self._requested = 0
+        self._built = 0
+        self._lock = None
+
+    def configure(self, enabled, max_staleness, grid_degrees, nearest_options):
+        """
+        Apply the settings of the app. Called from the app lifespan, before load().
+        """
+        self.enabled = enabled
+        self.max_staleness = max_staleness
+        self.grid_degrees = grid_degrees
+        self.nearest_options = nearest_options
+
+    def current(self):
+        return self._snapshot if self.enabled else None
+
+    def build(self):
+        started = time.monotonic()
+        docs = find_with_summaries(database.get_collection(self.collection_name), self.projection)
+        # The previous snapshot's KD-tree is reused when few parks moved
+        snapshot = ParkSnapshot(
+            docs, self._snapshot, self.nearest, grid_degrees=self.grid_degrees, nearest_options=self.nearest_options
+        )
+        self.last_build_seconds = round(time.monotonic() - started, 3)
+        logging.info(f"Built {self.collection_name} snapshot: {len(snapshot)} parks in {self.last_build_seconds}s")
+        return snapshot
+
+    def load(self):
+        """
+        Blocking initial build, called from the app lifespan.
+        """
+        if not self.enabled:
+            return
+        try:
+            self._snapshot = self.build()
+            self.builds += 1
+        except Exception as e:
+            # Reads fall back to MongoDB until run_forever manages a build
+            logging.error(f"Building {self.collection_name} snapshot failed: {e}")
+
+    def mark_dirty(self):
+        """
+        Ask the background loop for a rebuild (for writers outside the event loop).
+        """
+        self.dirty = True
+
+    async def refresh(self):
+        """
+        Rebuild the snapshot and swap it in; returns once a rebuild that started after
+        this call has been swapped in.
+        """
+        if not self.enabled:
+            return None
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        self._requested += 1
+        requested = self._requested
+        async with self._lock:
+            if self._built >= requested:
+                return self._snapshot
+            generation = self._requested
+            self.dirty = False
+            snapshot = await run_io(self.build)
+            self._snapshot = snapshot
+            self._built = generation
+            self.builds += 1
+        return snapshot
+
+    async def run_forever(self, check_interval=1.0):
+        """
+        Rebuild when marked dirty or when the snapshot is older than max_staleness.
+        """
+        while True:
+            await asyncio.sleep(check_interval)
+            snapshot = self._snapshot
+            if self.dirty or snapshot is None or snapshot.age() >= self.max_staleness:
+                try:
+                    await self.refresh()
+                except Exception as e:
+                    logging.error(f"Rebuilding {self.collection_name} snapshot failed: {e}")
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            "enabled": self.enabled,
+            "parks": len(snapshot) if snapshot is not None else None,
+            "ageSeconds": round(snapshot.age(), 1) if snapshot is not None else None,
+            "maxStalenessSeconds": self.max_staleness,
+            "builds": self.builds,
+            "lastBuildSeconds": self.last_build_seconds,
+            "nearestIndex": (
+                snapshot.nearest_index.stats() if snapshot is not None and snapshot.nearest_index is not None else None
+            ),
+        }
+
+
+# /stations/nearest reads the parks snapshot, so only it keeps a KD-tree
+parks_snapshot = SnapshotStore("baobao", nearest=True)
+# /chargers-on-route only returns the per-park summary, so the chargers snapshot
+# does not hold the nested stations
+chargers_snapshot = SnapshotStore(
+    "uxpropertegypt", {"_id": 0, "id": 1, "name": 1, "geoCoordinates": 1, "summary": 1}
+)
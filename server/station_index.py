@@ -0,0 +1,60 @@
+import logging
+import threading
+
+
+class SubstationIndex:
+    """
+    In-memory substation id -> parent park id map.
+
+    Used by /station/{station_id} when the 'stations.id' index is not available.
+    The map is loaded lazily from the collection on first use and kept up to date
+    by the write paths (ingest and PUT /data/{id}) through update().
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._parent_of = {}
+        self._children_of = {}
+        self.loaded = False
+
+    def load(self, collection):
+        parent_of = {}
+        children_of = {}
+        for park in collection.find({}, {"_id": 0, "id": 1, "stations.id": 1}):
+            ids = [station["id"] for station in park.get("stations", []) if "id" in station]
+            children_of[park["id"]] = set(ids)
+            for station_id in ids:
+                parent_of[station_id] = park["id"]
+        with self._lock:
+            self._parent_of = parent_of
+            self._children_of = children_of
+            self.loaded = True
+        logging.info(f"Loaded substation index: {len(parent_of)} stations in {len(children_of)} parks")
+
+    def update(self, parks):
+        """
+        Record the current stations of each park, dropping ids it no longer has.
+        No-op until the map has been loaded (load() will read the latest data).
+        """
+        with self._lock:
+            if not self.loaded:
+                return
+            for park in parks:
+                ids = {station["id"] for station in park.get("stations", []) if "id" in station}
+                for stale in self._children_of.get(park["id"], set()) - ids:
+                    if self._parent_of.get(stale) == park["id"]:
+                        del self._parent_of[stale]
+                for station_id in ids:
+                    self._parent_of[station_id] = park["id"]
+                self._children_of[park["id"]] = ids
+
+    def parent_of(self, station_id, collection=None):
+        if not self.loaded and collection is not None:
+            self.load(collection)
+        return self._parent_of.get(station_id)
+
+    def __len__(self):
+        return len(self._parent_of)
+
+
+substation_index = SubstationIndex()
@@ -0,0 +1,114 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SERVER_DIR not in sys.path:
+    sys.path.insert(0, SERVER_DIR)
+
+
+@pytest.fixture
+def mongo():
+    """
+    In-memory MongoDB (mongomock) installed as the shared client for one test.
+    """
+    import database
+    import mongomock
+    from settings import DEFAULTS
+
+    database.set_client(mongomock.MongoClient())
+    database.use_database(DEFAULTS.mongo_database)
+    yield database
+    database.close_client()
+
+
+@pytest.fixture
+def settings_overrides():
+    """
+    Settings fields of the app built by `api`, over the defaults. The environment and
+    .env of the machine running the tests are ignored.
+    """
+    return {}
+
+
+@pytest.fixture(params=[True, False], ids=["snapshot", "mongo"])
+def snapshot_enabled(request, settings_overrides):
+    """
+    Runs a test against the in-memory snapshots and again against Mongo queries.
+    """
+    from snapshot import chargers_snapshot, parks_snapshot
+
+    settings_overrides["snapshot_enabled"] = request.param
+    yield request.param
+    # The stores are shared with tests that use them without an app
+    for store in (parks_snapshot, chargers_snapshot):
+        store.enabled = True
+
+
+@pytest.fixture
+def api(mongo, settings_overrides):
+    """
+    call(seed_parks, requests): inserts the parks into both collections, then runs
+    `await requests(client)` with an httpx client on an app built from
+    settings_overrides, lifespan included.
+    """
+    import httpx
+    import main
+    from settings import Settings
+
+    def call(parks, requests):
+        settings = Settings(**settings_overrides)
+        mongo.use_database(settings.mongo_database)
+        for name in ("baobao", "uxpropertegypt"):
+            if parks:
+                mongo.get_collection(name).insert_many([dict(park) for park in parks])
+        app = main.create_app(settings)
+
+        async def run():
+            async with main.lifespan(app):
+                transport = httpx.ASGITransport(app=app)
+                async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                    return await requests(client)
+
+        return asyncio.run(run())
+
+    return call
+
+
+@pytest.fixture
+def flo_server():
+    """
+    start(parks, **options): serves bench.fake_flo over real HTTP on a free local port
+    and returns its base URL. Servers are stopped after the test.
+    """
+    import socket
+    import threading
+    import time
+
+    import uvicorn
+
+    from bench.fake_flo import create_app
+
+    servers = []
+
+    def start(parks, **options):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        server = uvicorn.Server(uvicorn.Config(create_app(parks, **options), port=port, log_level="warning"))
+        thread = threading.Thread(target=server.run, daemon=True)
+        thread.start()
+        servers.append((server, thread))
+        deadline = time.monotonic() + 10
+        while not server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError("fake FLO server did not start")
+            time.sleep(0.01)
+        return f"http://127.0.0.1:{port}"
+
+    yield start
+    for server, thread in servers:
+        server.should_exit = True
+        thread.join(timeout=10)
@@ -0,0 +1,75 @@
+import asyncio
+
+import httpx
+import pytest
+
+import addresses
+from addresses import UNKNOWN_ADDRESS, AddressCache, AddressEnricher
+
+ADDRESS = {"address1": "1 King St W", "city": "Toronto"}
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(addresses.random, "uniform", lambda low, high: 0)
+
+
+def enrich(mongo, responses, station_ids=("s1",)):
+    """
+    Runs AddressEnricher against a transport answering each request with the next
+    entry of `responses` (a status code, or an exception to raise). Returns the
+    addresses, the number of requests made and the enricher.
+    """
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        answer = responses[min(len(requests), len(responses)) - 1]
+        if isinstance(answer, Exception):
+            raise answer
+        return httpx.Response(answer, json={"address": ADDRESS} if answer == 200 else {})
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            enricher = AddressEnricher(cache=AddressCache("address_cache_test"), client=client)
+            return await enricher.enrich(station_ids), enricher
+
+    found, enricher = asyncio.run(run())
+    return found, len(requests), enricher
+
+
+def test_fetched_addresses_are_cached(mongo):
+    found, requests, _ = enrich(mongo, [200])
+    again, requests_again, enricher = enrich(mongo, [200])
+    assert found == again == {"s1": ADDRESS}
+    assert (requests, requests_again) == (1, 0)
+    assert enricher.cache.stats()["hits"] == 1
+
+
+@pytest.mark.parametrize("status", [429, 500, 502, 503, 504])
+def test_throttling_and_server_errors_are_retried(mongo, status):
+    found, requests, enricher = enrich(mongo, [status, status, 200])
+    assert found == {"s1": ADDRESS}
+    assert requests == 3
+    assert enricher.failed == 0
+
+
+def test_transport_errors_are_retried(mongo):
+    found, requests, _ = enrich(mongo, [httpx.ConnectError("refused"), httpx.ReadTimeout("slow"), 200])
+    assert found == {"s1": ADDRESS}
+    assert requests == 3
+
+
+@pytest.mark.parametrize("status", [400, 403, 404])
+def test_client_errors_are_not_retried(mongo, status):
+    found, requests, enricher = enrich(mongo, [status])
+    assert found == {"s1": UNKNOWN_ADDRESS}
+    assert requests == 1
+    assert enricher.failed == 1
+
+
+def test_failures_give_up_after_max_retries_and_are_not_cached(mongo):
+    found, requests, enricher = enrich(mongo, [503])
+    assert found == {"s1": UNKNOWN_ADDRESS}
+    assert requests == enricher.max_retries + 1
+    assert enricher.cache.collection.count_documents({}) == 0
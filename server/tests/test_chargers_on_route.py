@@ -0,0 +1,70 @@
+import pytest
+
+import main
+from bench.fake_flo import DEFAULT_BOUNDS
+from bench.fixtures import SyntheticGmaps
+from bench.synthetic import generate_parks
+
+PARKS = generate_parks(300, seed=31, bounds=DEFAULT_BOUNDS)
+ROUTE = {"origin": "43.2,-80.3", "destination": "43.8,-79.2", "max_distance": 2}
+
+
+class Gmaps(SyntheticGmaps):
+    """
+    SyntheticGmaps that cannot geocode "Nowhere".
+    """
+
+    def geocode(self, address):
+        return [] if address == "Nowhere" else super().geocode(address)
+
+
+@pytest.fixture
+def gmaps(monkeypatch):
+    monkeypatch.setattr(main, "gmaps", Gmaps(seed=3))
+
+
+def route(api, *variants):
+    """
+    (status, body) of /chargers-on-route for ROUTE updated with each variant.
+    """
+    async def requests(client):
+        responses = [await client.get("/chargers-on-route", params={**ROUTE, **params}) for params in variants]
+        return [(response.status_code, response.json()) for response in responses]
+
+    results = api(PARKS, requests)
+    return results[0] if len(results) == 1 else results
+
+
+def test_chargers_are_ranked_along_the_route(api, gmaps, snapshot_enabled):
+    status, body = route(api, {})
+    assert status == 200
+    along = [charger["alongRouteKm"] for charger in body["chargers"]]
+    assert len(along) > 5
+    assert along == sorted(along)
+    assert all(charger["detourKm"] <= ROUTE["max_distance"] for charger in body["chargers"])
+
+
+def test_filters_keep_the_ranked_subset(api, gmaps, snapshot_enabled):
+    stations = {park["id"]: park["stations"] for park in PARKS}
+    checks = [
+        ({"level": "L3"}, lambda park: any(station["level"] == "L3" for station in park)),
+        ({"min_charging_speed": 50}, lambda park: any(station["chargingSpeed"] >= 50 for station in park)),
+    ]
+    (_, unfiltered), *filtered = route(api, {}, *(filters for filters, _ in checks))
+    for (status, body), (_, matches) in zip(filtered, checks):
+        expected = [charger for charger in unfiltered["chargers"] if matches(stations[charger["id"]])]
+        assert status == 200
+        assert 0 < len(body["chargers"]) < len(unfiltered["chargers"])
+        assert body["chargers"] == expected
+
+
+def test_empty_corridor_is_404(api, gmaps):
+    status, body = route(api, {"origin": "60.0,-100.0", "destination": "60.1,-100.1"})
+    assert status == 404
+    assert body == {"detail": "No chargers found along the route."}
+
+
+def test_unknown_address_is_400(api, gmaps):
+    status, body = route(api, {"origin": "Nowhere"})
+    assert status == 400
+    assert body == {"detail": "Invalid address: Nowhere"}
@@ -0,0 +1,100 @@
+import asyncio
+
+import httpx
+import pytest
+
+from bench.fake_flo import DEFAULT_BOUNDS, create_app
+from bench.synthetic import flo_parks
+from crawler import ClusterCrawler
+
+API_URL = "http://flo/v3.0/map/markers/search"
+
+
+class FailingTransport(httpx.AsyncBaseTransport):
+    """
+    Answers the first `failures` requests with `status`, then forwards to `inner`.
+    """
+
+    def __init__(self, inner, failures, status=503):
+        self.inner = inner
+        self.failures = failures
+        self.status = status
+
+    async def handle_async_request(self, request):
+        if self.failures > 0:
+            self.failures -= 1
+            return httpx.Response(self.status)
+        return await self.inner.handle_async_request(request)
+
+
+def crawl(parks, transport=None, zoom_level=9, **options):
+    transport = transport or httpx.ASGITransport(app=create_app(parks))
+
+    async def run():
+        async with httpx.AsyncClient(transport=transport, base_url="http://flo") as client:
+            async with ClusterCrawler(api_url=API_URL, client=client, rate_per_second=0, **options) as crawler:
+                found = await crawler.crawl(DEFAULT_BOUNDS, zoom_level)
+                return found, crawler.stats
+
+    return asyncio.run(run())
+
+
+def co_located(n, lat, lon, spacing):
+    return [
+        {
+            "id": f"co-located-{i}",
+            "name": "Mall parking",
+            "networkId": 10,
+            "geoCoordinates": {"latitude": lat + i * spacing, "longitude": lon + i * spacing},
+            "stations": [],
+        }
+        for i in range(n)
+    ]
+
+
+def test_crawl_finds_every_park_once():
+    parks = flo_parks(300, seed=3, bounds=DEFAULT_BOUNDS)
+    found, stats = crawl(parks)
+    assert sorted(park["id"] for park in found) == sorted(park["id"] for park in parks)
+    assert stats.failures == 0
+
+
+def test_crawl_resolves_co_located_parks():
+    # Five parks 0.0001 deg apart keep their marker counts over several zoom levels,
+    # which marks the tile stable long before upstream stops clustering them
+    parks = flo_parks(50, seed=1, bounds=DEFAULT_BOUNDS) + co_located(5, 43.5, -79.9, 0.0001)
+    found, stats = crawl(parks)
+    assert sorted(park["id"] for park in found) == sorted(park["id"] for park in parks)
+    assert stats.stable_tiles_resolved >= 1
+    assert stats.unresolved_clusters == 0
+
+
+def test_crawl_counts_clusters_upstream_never_splits():
+    # Upstream still clusters at the crawler's max_zoom: the parks cannot be reached,
+    # but the crawl finishes and reports them instead of looping
+    parks = flo_parks(20, seed=2, bounds=DEFAULT_BOUNDS) + co_located(3, 43.5, -79.9, 0.00001)
+    found, stats = crawl(parks, max_zoom=12)
+    assert {park["id"] for park in found} >= {park["id"] for park in parks[:20]}
+    assert stats.unresolved_clusters >= 1
+
+
+def test_crawl_retries_transient_failures():
+    parks = flo_parks(100, seed=4, bounds=DEFAULT_BOUNDS)
+    transport = FailingTransport(httpx.ASGITransport(app=create_app(parks)), failures=3)
+    found, stats = crawl(parks, transport=transport, backoff_base=0)
+    assert len(found) == len(parks)
+    assert stats.retries == 3
+    assert stats.failures == 0
+
+
+def test_crawl_gives_up_after_max_retries():
+    parks = flo_parks(10, seed=5, bounds=DEFAULT_BOUNDS)
+    transport = FailingTransport(httpx.ASGITransport(app=create_app(parks)), failures=10**6, status=500)
+    found, stats = crawl(parks, transport=transport, backoff_base=0, max_retries=2)
+    assert found == []
+    assert stats.failures == stats.requests // 3
+
+
+def test_crawler_needs_at_least_one_request_in_flight():
+    with pytest.raises(ValueError):
+        ClusterCrawler(api_url=API_URL, max_concurrency=0)
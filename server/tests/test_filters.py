@@ -0,0 +1,76 @@
+import pytest
+
+from bench.synthetic import generate_parks
+from snapshot import CHARGER_LEVELS, CONNECTOR_TYPES, ParkSnapshot, summary_query
+
+PARKS = generate_parks(300, seed=9)
+
+FILTERS = [
+    {},
+    {"available": True},
+    {"level": "L3"},
+    {"level": "L2", "available": True},
+    {"connector": "CHADEMO"},
+    {"connector": "IEC_62196_T1_COMBO", "min_charging_speed": 100},
+    {"level": "L1"},
+]
+
+
+def station(level, connectors, speed, status):
+    return {"id": f"{level}-{speed}-{status}", "level": level, "connectors": connectors,
+            "chargingSpeed": speed, "status": status}
+
+
+@pytest.mark.parametrize("filters", FILTERS, ids=[repr(filters) for filters in FILTERS])
+def test_snapshot_mask_matches_mongo_query(mongo, filters):
+    collection = mongo.get_collection("baobao")
+    collection.insert_many([dict(park) for park in PARKS])
+    from_mongo = {doc["id"] for doc in collection.find(summary_query(**filters), {"id": 1})}
+
+    snapshot = ParkSnapshot(PARKS)
+    mask = snapshot.filter_mask(**filters)
+    from_snapshot = {park["id"] for row, park in enumerate(PARKS) if mask is None or mask[row]}
+    assert from_snapshot == from_mongo
+
+
+def test_filters_apply_per_park():
+    # Only the L2 station is available: the park still matches level=L3 & available
+    park = {
+        "id": "mixed",
+        "geoCoordinates": {"latitude": 43.6, "longitude": -79.4},
+        "stations": [station("L3", ["CHADEMO"], 100, "InUse"), station("L2", ["IEC_62196_T1"], 7, "Available")],
+    }
+    snapshot = ParkSnapshot([park])
+    assert snapshot.filter_mask(level="L3", available=True).tolist() == [True]
+    assert snapshot.filter_mask(connector="CHADEMO", min_charging_speed=50).tolist() == [True]
+    assert snapshot.filter_mask(level="L1").tolist() == [False]
+
+
+@pytest.mark.parametrize("filters", [{"level": "summary.totalChargers"}, {"level": "L9"}, {"connector": "$where"}])
+def test_summary_query_rejects_unknown_values(filters):
+    with pytest.raises(ValueError):
+        summary_query(**filters)
+
+
+def test_every_known_value_builds_a_query():
+    for level in CHARGER_LEVELS:
+        assert summary_query(level=level) == {f"summary.levels.{level}": {"$gt": 0}}
+    for connector in CONNECTOR_TYPES:
+        assert summary_query(connector=connector) == {f"summary.connectors.{connector}": {"$gt": 0}}
+
+
+def test_endpoints_reject_unknown_level_and_connector(api):
+    origin = {"latitude": 43.6, "longitude": -79.4}
+
+    async def requests(client):
+        return [
+            (await client.get("/stations/nearest", params={"lat": 43.6, "lon": -79.4, "level": "summary.x"})).status_code,
+            (await client.get("/stations/nearest", params={"lat": 43.6, "lon": -79.4, "connector": "$ne"})).status_code,
+            (await client.post("/stations/nearest", json={"origins": [origin], "level": "L4"})).status_code,
+            (await client.post("/stations/nearest", json={"origins": [origin], "connector": "tesla"})).status_code,
+            (await client.get("/chargers-on-route", params={"origin": "a", "destination": "b", "level": "L3x"})).status_code,
+            (await client.post("/chargers-on-routes", json={"routes": [{"polyline": "_p~iF~ps|U"}], "level": "x"})).status_code,
+            (await client.get("/stations/nearest", params={"lat": 43.6, "lon": -79.4, "level": "L3", "connector": "CHADEMO"})).status_code,
+        ]
+
+    assert api(PARKS, requests) == [422, 422, 422, 422, 422, 422, 200]
@@ -0,0 +1,201 @@
+import asyncio
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import geo_cache
+import main
+from geo_cache import MongoCacheTier, TwoTierCache, normalize_location
+
+
+class FakeGmaps:
+    """
+    googlemaps.Client stand-in: counts geocode calls, each taking `latency` seconds.
+    """
+
+    def __init__(self, latency=0.05):
+        self.latency = latency
+        self.geocoded = []
+        self._lock = threading.Lock()
+
+    def geocode(self, address):
+        with self._lock:
+            self.geocoded.append(address)
+        time.sleep(self.latency)
+        return [{"geometry": {"location": {"lat": 43.25, "lng": -79.87}}}]
+
+
+class Upstream:
+    """
+    Async fetch that counts calls and, when `gate` is set, waits for it to open.
+    """
+
+    def __init__(self, value="value", gate=None, error=None):
+        self.value = value
+        self.gate = gate
+        self.error = error
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        if self.gate is not None:
+            await self.gate.wait()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+@pytest.fixture
+def gmaps(monkeypatch):
+    fake = FakeGmaps()
+    monkeypatch.setattr(main, "gmaps", fake)
+    monkeypatch.setattr(main, "geocode_cache", TwoTierCache("geocode", 60))
+    return fake
+
+
+def test_concurrent_misses_make_one_upstream_call(gmaps):
+    async def run():
+        return await asyncio.gather(*(main.validate_address_cached("1 King St W, Toronto") for _ in range(10)))
+
+    results = asyncio.run(run())
+    assert results == [{"lat": 43.25, "lng": -79.87}] * 10
+    assert len(gmaps.geocoded) == 1
+    assert main.geocode_cache.stats()["coalesced"] == 9
+
+
+def test_lat_lng_input_is_parsed_without_geocoding(gmaps):
+    async def run():
+        return [await main.validate_address_cached(text) for text in ("43.25, -79.87", " -43.5 ,79 ", "43.25,-79.87")]
+
+    assert asyncio.run(run()) == [
+        {"lat": 43.25, "lng": -79.87},
+        {"lat": -43.5, "lng": 79.0},
+        {"lat": 43.25, "lng": -79.87},
+    ]
+    assert gmaps.geocoded == []
+
+
+def test_equivalent_addresses_share_one_entry(gmaps):
+    async def run():
+        for address in ("1 King St. W, Toronto", "  1 king st w   toronto", "1 KING ST W TORONTO!"):
+            await main.validate_address_cached(address)
+
+    asyncio.run(run())
+    assert len(gmaps.geocoded) == 1
+    assert main.geocode_cache.stats()["localHits"] == 2
+
+
+def test_normalize_location():
+    assert normalize_location("43.250001, -79.870004") == "43.25000,-79.87000"
+    assert normalize_location(" 43.25 ,-79.87 ") == normalize_location("43.25,-79.87")
+    assert normalize_location("1 King St. W,  Toronto") == "1 king st w toronto"
+    assert normalize_location("1 King St W") != normalize_location("2 King St W")
+
+
+def test_local_entries_expire_after_ttl(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(geo_cache.time, "monotonic", lambda: clock[0])
+    cache = TwoTierCache("test", ttl_seconds=60)
+    upstream = Upstream()
+
+    async def run():
+        await cache.get_or_fetch("key", upstream)
+        clock[0] += 59
+        await cache.get_or_fetch("key", upstream)
+        clock[0] += 2
+        await cache.get_or_fetch("key", upstream)
+
+    asyncio.run(run())
+    assert upstream.calls == 2
+    assert cache.stats()["localHits"] == 1
+
+
+def test_lru_evicts_least_recently_used():
+    cache = TwoTierCache("test", ttl_seconds=60, maxsize=2)
+    upstream = Upstream()
+
+    async def run():
+        for key in ("a", "b", "a", "c", "a", "b"):
+            await cache.get_or_fetch(key, upstream)
+
+    asyncio.run(run())
+    # "b" was evicted by "c" and fetched again
+    assert upstream.calls == 4
+
+
+def test_persistent_tier_is_shared_between_caches(mongo):
+    tier = MongoCacheTier("geo_cache_test")
+    tier.ensure_indexes()
+    upstream = Upstream(value={"lat": 1.0, "lng": 2.0})
+
+    async def run():
+        first = await TwoTierCache("geocode", 60, persistent=tier).get_or_fetch("key", upstream)
+        # A fresh process: empty local tier, same collection
+        restarted = TwoTierCache("geocode", 60, persistent=tier)
+        second = await restarted.get_or_fetch("key", upstream)
+        return first, second, restarted.stats()
+
+    first, second, stats = asyncio.run(run())
+    assert first == second == {"lat": 1.0, "lng": 2.0}
+    assert upstream.calls == 1
+    assert stats["persistentHits"] == 1
+    assert stats["misses"] == 0
+
+
+def test_expired_persistent_entries_are_fetched_again(mongo):
+    tier = MongoCacheTier("geo_cache_test")
+    upstream = Upstream()
+
+    async def run():
+        await TwoTierCache("geocode", 60, persistent=tier).get_or_fetch("key", upstream)
+        tier.collection.update_one({"_id": "geocode:key"}, {"$set": {"expiresAt": datetime.utcnow() - timedelta(seconds=1)}})
+        await TwoTierCache("geocode", 60, persistent=tier).get_or_fetch("key", upstream)
+
+    asyncio.run(run())
+    assert upstream.calls == 2
+
+
+def test_cancelled_leader_does_not_fail_followers():
+    cache = TwoTierCache("test", ttl_seconds=60)
+
+    async def run():
+        upstream = Upstream(gate=asyncio.Event())
+        leader = asyncio.create_task(cache.get_or_fetch("key", upstream))
+        await asyncio.sleep(0)
+        followers = [asyncio.create_task(cache.get_or_fetch("key", upstream)) for _ in range(3)]
+        await asyncio.sleep(0)
+        leader.cancel()
+        await asyncio.sleep(0)
+        upstream.gate.set()
+        results = await asyncio.gather(*followers)
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        # The leader's load finished and was cached for later callers
+        after = await cache.get_or_fetch("key", upstream)
+        return upstream.calls, results, after
+
+    calls, results, after = asyncio.run(run())
+    assert calls == 1
+    assert results == ["value"] * 3
+    assert after == "value"
+
+
+def test_errors_reach_every_caller_and_are_not_cached():
+    cache = TwoTierCache("test", ttl_seconds=60)
+
+    async def run():
+        failing = Upstream(gate=asyncio.Event(), error=RuntimeError("quota exceeded"))
+        callers = [asyncio.create_task(cache.get_or_fetch("key", failing)) for _ in range(3)]
+        await asyncio.sleep(0)
+        failing.gate.set()
+        outcomes = await asyncio.gather(*callers, return_exceptions=True)
+        retried = await cache.get_or_fetch("key", Upstream())
+        return failing.calls, outcomes, retried
+
+    calls, outcomes, retried = asyncio.run(run())
+    assert calls == 1
+    assert all(isinstance(outcome, RuntimeError) for outcome in outcomes)
+    assert retried == "value"
+    assert cache.stats()["upstreamErrors"] == 1
@@ -0,0 +1,60 @@
+import copy
+
+from bench.synthetic import generate_parks
+from ingest import bulk_upsert_parks
+from settings import DEFAULTS
+
+PARKS = generate_parks(20, seed=41)
+
+
+def crawl(parks):
+    return [copy.deepcopy(park) for park in parks]
+
+
+def test_unchanged_parks_are_not_written(mongo):
+    collection = mongo.get_collection("baobao")
+    _, inserted, _, _ = bulk_upsert_parks(collection, crawl(PARKS))
+    assert len(inserted) == len(PARKS)
+
+    batches, inserted, changed, moved = bulk_upsert_parks(collection, crawl(PARKS))
+    assert (inserted, changed, moved) == ([], [], [])
+    assert batches[0]["unchanged"] == len(PARKS)
+
+
+def test_renamed_and_moved_parks_are_updated(mongo):
+    collection = mongo.get_collection("baobao")
+    bulk_upsert_parks(collection, crawl(PARKS))
+
+    parks = crawl(PARKS)
+    parks[0]["name"] = "Renamed Park"
+    parks[1]["geoCoordinates"] = {"latitude": 45.5, "longitude": -73.6}
+    _, inserted, changed, moved = bulk_upsert_parks(collection, parks)
+
+    assert inserted == []
+    assert [park["id"] for park in changed] == [PARKS[0]["id"], PARKS[1]["id"]]
+    assert moved == [{"id": PARKS[1]["id"], "geoCoordinates": PARKS[1]["geoCoordinates"]}]
+    assert collection.find_one({"id": PARKS[0]["id"]})["name"] == "Renamed Park"
+    stored = collection.find_one({"id": PARKS[1]["id"]})
+    assert stored["geoCoordinates"] == {"latitude": 45.5, "longitude": -73.6}
+    assert stored["geoPoint"]["coordinates"] == [-73.6, 45.5]
+
+
+def test_overwritten_park_is_stored_like_a_crawled_one(api, mongo):
+    park = PARKS[2]
+    body = {key: park[key] for key in ("id", "address", "metadata", "name", "networkId", "stations")}
+    body.update(geoCoordinates={"latitude": 45.5, "longitude": -73.6}, timestamp=None)
+    db = mongo.get_client()[DEFAULTS.mongo_database]
+
+    async def requests(client):
+        return (await client.put(f"/data/{park['id']}", json=body)).status_code
+
+    assert api(PARKS, requests) == 200
+    stored = db["baobao"].find_one({"id": park["id"]})
+    assert stored["lastUpdated"] > park["lastUpdated"]
+    assert stored["geoPoint"]["coordinates"] == [-73.6, 45.5]
+    history = list(db["stations"].find({"id": park["id"]}))
+    assert len(history) == 1
+
+    # A crawl returning the same park finds nothing to write
+    _, inserted, changed, _ = bulk_upsert_parks(db["baobao"], [dict(body)])
+    assert (inserted, changed) == ([], [])
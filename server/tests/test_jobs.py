@@ -0,0 +1,183 @@
+import asyncio
+
+import pytest
+
+from bench.fake_flo import DEFAULT_BOUNDS
+from bench.synthetic import flo_parks
+from jobs import CANCELLED, FAILED, QUEUED, RUNNING, SUCCEEDED, JobQueue
+from settings import Settings
+
+PARKS = flo_parks(150, seed=21, bounds=DEFAULT_BOUNDS)
+
+
+@pytest.fixture
+def flo(flo_server, settings_overrides):
+    """
+    Points crawls and address lookups at a stubbed FLO server, without its rate
+    limit; returns the settings.
+    """
+    base_url = flo_server(PARKS)
+    settings_overrides["flo_rate_limit_per_second"] = 10000
+    settings_overrides["flo_markers_url"] = f"{base_url}/v3.0/map/markers/search"
+    settings_overrides["flo_station_url"] = f"{base_url}/v3.0/parks/station/{{station_id}}"
+    return Settings(**settings_overrides)
+
+
+async def poll(client, job_id, until=(SUCCEEDED, FAILED, CANCELLED), timeout=20):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while True:
+        job = (await client.get(f"/jobs/{job_id}")).json()
+        if job["status"] in until:
+            return job
+        assert asyncio.get_running_loop().time() < deadline, job
+        await asyncio.sleep(0.05)
+
+
+def test_submitted_crawl_is_polled_to_success(api, flo, mongo):
+    async def requests(client):
+        submitted = await client.post("/find_parks", json={"bounds": DEFAULT_BOUNDS})
+        job = await poll(client, submitted.json()["jobId"])
+        return submitted, job
+
+    submitted, job = api([], requests)
+    assert submitted.status_code == 202
+    assert submitted.json()["statusUrl"] == f"/jobs/{submitted.json()['jobId']}"
+    assert job["status"] == SUCCEEDED
+    assert job["result"]["parks"] == len(PARKS)
+    assert job["result"]["inserted"] == len(PARKS)
+    assert job["throughput"]["parksPerSecond"] > 0
+    assert job["error"] is None
+
+
+def test_wait_returns_finished_job(api, flo):
+    async def requests(client):
+        return (await client.post("/find_parks", json={"bounds": DEFAULT_BOUNDS, "wait": True})).json()
+
+    body = api([], requests)
+    assert body["status"] == SUCCEEDED
+    assert body["job"]["result"]["parks"] == len(PARKS)
+
+
+def test_cancel_running_and_queued_jobs(api, flo):
+    async def requests(client):
+        # One request per second: the crawl is still running when it is cancelled
+        slow = {"bounds": DEFAULT_BOUNDS, "ratePerSecond": 1}
+        running = (await client.post("/find_parks", json=slow)).json()["jobId"]
+        queued = (await client.post("/find_parks", json=slow)).json()["jobId"]
+        await poll(client, running, until=(RUNNING,))
+        queued_status = (await client.get(f"/jobs/{queued}")).json()["status"]
+
+        cancels = [await client.delete(f"/jobs/{job_id}") for job_id in (queued, running)]
+        finished = [await poll(client, job_id) for job_id in (queued, running)]
+        again = await client.delete(f"/jobs/{running}")
+        unknown = await client.delete("/jobs/unknown")
+        return queued_status, cancels, finished, again, unknown
+
+    queued_status, cancels, finished, again, unknown = api([], requests)
+    assert queued_status == QUEUED
+    assert [response.status_code for response in cancels] == [200, 200]
+    assert [job["status"] for job in finished] == [CANCELLED, CANCELLED]
+    assert finished[0]["started"] is None
+    assert again.status_code == 409
+    assert unknown.status_code == 404
+
+
+def test_invalid_bounds_are_rejected_before_queueing(api):
+    south_west = DEFAULT_BOUNDS["SouthWest"]
+    invalid = [
+        {"x": 1},
+        [1, 2],
+        {"SouthWest": {}},
+        {"SouthWest": south_west, "NorthEast": {"Latitude": "44", "Longitude": -79.0}},
+        {"SouthWest": south_west, "NorthEast": {"Latitude": True, "Longitude": -79.0}},
+        {"SouthWest": south_west, "NorthEast": {"Latitude": 95.0, "Longitude": -79.0}},
+        {"SouthWest": DEFAULT_BOUNDS["NorthEast"], "NorthEast": south_west},
+    ]
+
+    async def requests(client):
+        before = len((await client.get("/jobs")).json()["jobs"])
+        statuses = [(await client.post("/find_parks", json={"bounds": bounds})).status_code for bounds in invalid]
+        return statuses, len((await client.get("/jobs")).json()["jobs"]) - before
+
+    statuses, queued = api([], requests)
+    assert statuses == [400] * len(invalid)
+    assert queued == 0
+
+
+def test_invalid_crawl_options_are_rejected(api, settings_overrides):
+    settings_overrides.update(flo_max_crawl_concurrency=16, flo_rate_limit_per_second=10)
+    options = [
+        ({"concurrency": 0}, 422),
+        ({"concurrency": 17}, 422),
+        ({"concurrency": "many"}, 400),
+        ({"concurrency": None}, 400),
+        ({"ratePerSecond": 0}, 422),
+        ({"ratePerSecond": -1}, 422),
+        ({"ratePerSecond": 11}, 422),
+        ({"ratePerSecond": "nan"}, 400),
+        ({"ratePerSecond": "fast"}, 400),
+    ]
+
+    async def requests(client):
+        return [
+            (await client.post("/find_parks", json={"bounds": DEFAULT_BOUNDS, **option})).status_code
+            for option, _ in options
+        ]
+
+    assert api([], requests) == [status for _, status in options]
+
+
+def test_missing_bounds_is_rejected(api):
+    async def requests(client):
+        return (await client.post("/find_parks", json={})).status_code
+
+    assert api([], requests) == 400
+
+
+def test_finished_jobs_survive_a_restart(mongo, flo):
+    async def run():
+        queue = JobQueue(workers=1)
+        queue.start()
+        options = {**flo.crawl_options(), "rate_per_second": 0}
+        succeeded = await queue.submit(DEFAULT_BOUNDS, options)
+        failed = await queue.submit({"SouthWest": {}}, options)
+        await asyncio.gather(succeeded.done, failed.done, return_exceptions=True)
+        await queue.stop()
+
+        # A new process only has the persisted state
+        restarted = JobQueue(workers=1)
+        return (
+            await restarted.get(succeeded.id),
+            await restarted.get(failed.id),
+            await restarted.get("unknown"),
+            restarted.jobs,
+        )
+
+    succeeded, failed, unknown, in_memory = asyncio.run(run())
+    assert in_memory == {}
+    assert succeeded["status"] == SUCCEEDED
+    assert succeeded["result"]["parks"] == len(PARKS)
+    assert succeeded["finished"] >= succeeded["started"]
+    assert failed["status"] == FAILED
+    assert failed["error"]
+    assert unknown is None
+
+
+def test_scheduled_run_raises_when_cancelled(mongo):
+    async def never_finishes(bounds, **options):
+        await asyncio.Event().wait()
+
+    async def run():
+        queue = JobQueue(workers=1, run=never_finishes)
+        queue.start()
+        waiting = asyncio.create_task(queue.run(DEFAULT_BOUNDS))
+        while not queue.jobs or next(iter(queue.jobs.values())).status != RUNNING:
+            await asyncio.sleep(0.01)
+        await queue.cancel(next(iter(queue.jobs)))
+        try:
+            await waiting
+        finally:
+            await queue.stop()
+
+    with pytest.raises(RuntimeError, match="cancelled"):
+        asyncio.run(run())
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from bench.synthetic import generate_parks, sample_points
+from route_corridor import haversine_km
+from snapshot import ParkSnapshot, SnapshotStore
+
+PARKS = generate_parks(3000, seed=13)
+
+
+def brute_force(snapshot, lat, lon, k, mask=None):
+    distances = haversine_km(lat, lon, snapshot.lats, snapshot.lons)
+    if mask is not None:
+        distances = np.where(mask, distances, np.inf)
+    order = np.argsort(distances, kind="stable")[:k]
+    return distances[order[np.isfinite(distances[order])]]
+
+
+@pytest.mark.parametrize("filters", [{}, {"available": True}, {"level": "L3"}, {"connector": "CHADEMO"}])
+def test_nearest_matches_brute_force(filters):
+    snapshot = ParkSnapshot(PARKS, nearest=True)
+    mask = snapshot.filter_mask(**filters)
+    points = sample_points(PARKS, 25, seed=2) + [(45.5, -73.6), (0.0, 0.0)]
+    found = snapshot.nearest([lat for lat, _ in points], [lon for _, lon in points], 10, mask)
+    for (lat, lon), (rows, distances) in zip(points, found):
+        expected = brute_force(snapshot, lat, lon, 10, mask)
+        np.testing.assert_allclose(distances, expected, rtol=1e-6, atol=1e-6)
+        if mask is not None:
+            assert mask[rows].all()
+
+
+def test_index_is_only_built_when_asked_for():
+    snapshot = ParkSnapshot(PARKS)
+    assert snapshot.nearest_index is None
+    rows, _ = snapshot.nearest(43.65, -79.38, 3)[0]
+    assert len(rows) == 3
+    assert snapshot.nearest_index is not None
+
+
+def test_only_the_parks_store_keeps_an_index(mongo):
+    mongo.get_collection("baobao").insert_many([dict(park) for park in PARKS[:200]])
+    parks = SnapshotStore("baobao", nearest=True)
+    chargers = SnapshotStore("baobao", {"_id": 0, "id": 1, "geoCoordinates": 1, "summary": 1})
+    parks.load()
+    chargers.load()
+    assert parks.current().nearest_index is not None
+    assert chargers.current().nearest_index is None
+    assert chargers.stats()["nearestIndex"] is None
+
+
+def test_rebuild_reuses_previous_tree_after_small_ingest():
+    before = ParkSnapshot(PARKS, nearest=True)
+    docs = [dict(park) for park in PARKS[10:]]
+    docs[0] = dict(docs[0], geoCoordinates={"latitude": 43.7, "longitude": -79.4})
+    docs.append(dict(PARKS[0], id="new-park"))
+    after = ParkSnapshot(docs, before, nearest=True)
+
+    assert after.nearest_index.tree is before.nearest_index.tree
+    stats = after.nearest_index.stats()
+    assert stats["reused"] and stats["bufferedPoints"] == 2 and stats["deadPoints"] == 11
+    for lat, lon in sample_points(docs, 20, seed=4) + [(43.7, -79.4)]:
+        _, distances = after.nearest(lat, lon, 5)[0]
+        np.testing.assert_allclose(distances, brute_force(after, lat, lon, 5), rtol=1e-6, atol=1e-6)
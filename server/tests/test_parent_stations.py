@@ -0,0 +1,88 @@
+import json
+
+from bench.synthetic import generate_parks
+
+PARKS = generate_parks(120, seed=11)
+IDS = sorted(park["id"] for park in PARKS)
+
+
+def test_pages_cover_every_park_in_id_order(api, snapshot_enabled):
+    async def requests(client):
+        pages, after = [], None
+        while True:
+            params = {"limit": 50} if after is None else {"limit": 50, "after": after}
+            body = (await client.get("/parent-stations", params=params)).json()
+            pages.append([row["id"] for row in body["parentStations"]])
+            after = body["nextAfter"]
+            if after is None:
+                return pages
+
+    pages = api(PARKS, requests)
+    assert [len(page) for page in pages] == [50, 50, 20]
+    assert [park_id for page in pages for park_id in page] == IDS
+
+
+def test_exact_last_page_ends_with_empty_page(api, snapshot_enabled):
+    async def requests(client):
+        first = (await client.get("/parent-stations", params={"limit": 120})).json()
+        last = await client.get("/parent-stations", params={"limit": 120, "after": first["nextAfter"]})
+        return first, last
+
+    first, last = api(PARKS, requests)
+    assert first["nextAfter"] == IDS[-1]
+    assert last.status_code == 200
+    assert last.json() == {"parentStations": [], "nextAfter": None}
+
+
+def test_without_limit_returns_everything(api, snapshot_enabled):
+    async def requests(client):
+        return (await client.get("/parent-stations")).json()
+
+    body = api(PARKS, requests)
+    assert [row["id"] for row in body["parentStations"]] == IDS
+    assert body["nextAfter"] is None
+
+
+def test_ndjson_streams_one_park_per_line(api, snapshot_enabled):
+    async def requests(client):
+        response = await client.get("/parent-stations", params={"format": "ndjson", "limit": 70, "after": IDS[9]})
+        return response.headers["content-type"], response.text
+
+    content_type, text = api(PARKS, requests)
+    rows = [json.loads(line) for line in text.splitlines()]
+    assert content_type == "application/x-ndjson"
+    assert [row["id"] for row in rows] == IDS[10:80]
+
+
+def test_rejects_bad_limit_and_format(api):
+    async def requests(client):
+        return [
+            (await client.get("/parent-stations", params=params)).status_code
+            for params in ({"limit": 0}, {"limit": -1}, {"format": "xml"})
+        ]
+
+    assert api(PARKS, requests) == [422, 422, 422]
+
+
+def test_empty_collection_is_404(api, snapshot_enabled):
+    async def requests(client):
+        return (await client.get("/parent-stations")).status_code
+
+    assert api([], requests) == 404
+
+
+def test_mongo_path_counts_documents_scanned(api, snapshot_enabled):
+    from metrics import DOCUMENTS_RETURNED, DOCUMENTS_SCANNED
+
+    before = (DOCUMENTS_SCANNED.value(endpoint="parent-stations", source="mongo"),
+              DOCUMENTS_RETURNED.value(endpoint="parent-stations"))
+
+    async def requests(client):
+        await client.get("/parent-stations", params={"limit": 30})
+        await client.get("/parent-stations", params={"limit": 20, "format": "ndjson"})
+
+    api(PARKS, requests)
+    scanned = DOCUMENTS_SCANNED.value(endpoint="parent-stations", source="mongo") - before[0]
+    returned = DOCUMENTS_RETURNED.value(endpoint="parent-stations") - before[1]
+    assert scanned == (0 if snapshot_enabled else 50)
+    assert returned == 50
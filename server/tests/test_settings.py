@@ -0,0 +1,85 @@
+import asyncio
+
+from bench.synthetic import generate_parks
+from settings import DEFAULTS, Settings
+
+PARKS = generate_parks(50, seed=5)
+
+
+def test_environment_overrides_env_file(tmp_path, monkeypatch):
+    env_file = tmp_path / ".env"
+    env_file.write_text("JOB_WORKERS=3\nSNAPSHOT_ENABLED=0\nCORS_ORIGINS=https://a.test, https://b.test\n")
+    monkeypatch.setenv("JOB_WORKERS", "4")
+    monkeypatch.setenv("FLO_RATE_LIMIT_PER_SECOND", "2.5")
+    monkeypatch.setenv("IO_WORKERS", "")
+    monkeypatch.setenv("LOG_LEVEL", "debug")
+
+    settings = Settings.from_env(str(env_file))
+    assert settings.job_workers == 4
+    assert settings.snapshot_enabled is False
+    assert settings.cors_origins == ("https://a.test", "https://b.test")
+    assert settings.flo_rate_limit_per_second == 2.5
+    assert settings.io_workers is None
+    assert settings.log_level == "DEBUG"
+    assert settings.gzip_level == DEFAULTS.gzip_level
+
+
+def test_crawl_options_carry_the_station_url():
+    options = Settings(flo_station_url="http://flo/{station_id}", ingest_batch_size=7).crawl_options()
+    assert options["enricher_options"]["station_url"] == "http://flo/{station_id}"
+    assert options["batch_size"] == 7
+    assert options["api_url"] == DEFAULTS.flo_markers_url
+
+
+def test_request_limits_come_from_the_app_settings(api, settings_overrides):
+    settings_overrides.update(nearest_max_k=5, nearest_max_origins=2)
+    origin = {"latitude": 43.65, "longitude": -79.38}
+
+    async def requests(client):
+        return [
+            (await client.get("/stations/nearest", params={"lat": 43.65, "lon": -79.38, "k": k})).status_code
+            for k in (5, 6)
+        ] + [
+            (await client.post("/stations/nearest", json={"origins": [origin] * count, "k": 1})).status_code
+            for count in (2, 3)
+        ]
+
+    assert api(PARKS, requests) == [200, 422, 200, 422]
+
+
+def test_middleware_options_come_from_the_app_settings(api, settings_overrides):
+    settings_overrides.update(request_profiling=False, compression_min_size=10 ** 9)
+
+    async def requests(client):
+        response = await client.get(
+            "/stations", params={"lat": 43.65, "lon": -79.38, "radius_km": 50},
+            headers={"X-Profile": "1", "Accept-Encoding": "gzip"},
+        )
+        return response.status_code, response.headers
+
+    status, headers = api(PARKS, requests)
+    assert status == 200
+    assert "server-timing" not in headers
+    assert "content-encoding" not in headers
+
+
+def test_collections_are_read_from_the_configured_database(api, mongo, settings_overrides):
+    settings_overrides["mongo_database"] = "other"
+    client = mongo.get_client()
+
+    async def requests(client):
+        response = await client.get("/station/" + PARKS[0]["stations"][0]["id"])
+        return response.status_code
+
+    assert api(PARKS, requests) == 200
+    assert client["other"]["baobao"].count_documents({}) == len(PARKS)
+    assert client[DEFAULTS.mongo_database]["baobao"].count_documents({}) == 0
+
+
+def test_snapshot_rebuilds_only_run_when_enabled(api, snapshot_enabled):
+    async def requests(client):
+        return sum(
+            task.get_coro().__qualname__ == "SnapshotStore.run_forever" for task in asyncio.all_tasks()
+        )
+
+    assert api(PARKS, requests) == (2 if snapshot_enabled else 0)
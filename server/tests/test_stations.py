@@ -0,0 +1,49 @@
+from bench.synthetic import generate_parks
+from route_corridor import haversine_km
+
+PARKS = generate_parks(400, seed=17)
+CENTER = {"lat": 43.65, "lon": -79.38}
+
+
+def distances_from_center(radius_km):
+    distances = sorted(
+        haversine_km(CENTER["lat"], CENTER["lon"], park["geoCoordinates"]["latitude"], park["geoCoordinates"]["longitude"])
+        for park in PARKS
+    )
+    return [distance for distance in distances if distance <= radius_km]
+
+
+# mongomock has no $geoNear, so these run against the snapshot only
+def test_stations_within_radius_nearest_first(api):
+    async def requests(client):
+        return (await client.get("/stations", params={**CENTER, "radius_km": 10})).json()["stations"]
+
+    stations = api(PARKS, requests)
+    expected = distances_from_center(10)
+    assert len(stations) == len(expected) > 0
+    assert [station["distance_km"] for station in stations] == [round(distance, 2) for distance in expected]
+
+
+def test_limit_keeps_the_nearest(api):
+    async def requests(client):
+        return (await client.get("/stations", params={**CENTER, "radius_km": 10, "limit": 3})).json()["stations"]
+
+    stations = api(PARKS, requests)
+    assert [station["distance_km"] for station in stations] == [round(d, 2) for d in distances_from_center(10)[:3]]
+
+
+def test_limit_below_one_is_rejected(api):
+    async def requests(client):
+        return [
+            (await client.get("/stations", params={**CENTER, "limit": limit})).status_code
+            for limit in (0, -1)
+        ]
+
+    assert api(PARKS, requests) == [422, 422]
+
+
+def test_nothing_in_radius_is_404(api):
+    async def requests(client):
+        return (await client.get("/stations", params={"lat": 0, "lon": 0, "radius_km": 1})).status_code
+
+    assert api(PARKS, requests) == 404
@@ -0,0 +1,159 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+from calculus import lat_lon_to_tile, lat_lon_to_tile_xy, tile_bounds
+from serialization import dumps
+from settings import DEFAULTS
+
+MAX_TILE_ZOOM = 22
+# Below the cluster max zoom, parks are grouped into clusters of this many screen pixels
+CLUSTER_CELL_PX = 32
+
+TILE_PROJECTION = {"_id": 0, "id": 1, "name": 1, "geoCoordinates": 1, "stations.status": 1}
+
+
+def tile_query(x, y, zoom):
+    """
+    Mongo filter for the parks inside a tile (south/west edges inclusive).
+    """
+    bounds = tile_bounds(x, y, zoom)
+    return {
+        "geoCoordinates.latitude": {"$gte": bounds["SouthWest"]["Latitude"], "$lt": bounds["NorthEast"]["Latitude"]},
+        "geoCoordinates.longitude": {"$gte": bounds["SouthWest"]["Longitude"], "$lt": bounds["NorthEast"]["Longitude"]},
+    }
+
+
+def _park_marker(park):
+    stations = park.get("stations", [])
+    return {
+        "id": park["id"],
+        "name": park["name"],
+        "geoCoordinates": park["geoCoordinates"],
+        "totalChargers": len(stations),
+        "availableChargers": sum(1 for station in stations if station.get("status") == "Available"),
+    }
+
+
+def cluster_tile(parks, x, y, zoom, max_zoom=DEFAULTS.cluster_max_zoom):
+    """
+    Group a tile's parks into CLUSTER_CELL_PX grid cells. Cells holding a single park
+    (and every park at zoom >= max_zoom) are returned as parks.
+    """
+    markers = [_park_marker(park) for park in parks]
+    if zoom >= max_zoom:
+        return {"parks": markers, "clusters": []}
+
+    cells_per_side = 256 // CLUSTER_CELL_PX
+    cells = {}
+    for marker in markers:
+        px, py = lat_lon_to_tile_xy(marker["geoCoordinates"]["latitude"], marker["geoCoordinates"]["longitude"], zoom)
+        cell = (
+            min(int((px - x) * cells_per_side), cells_per_side - 1),
+            min(int((py - y) * cells_per_side), cells_per_side - 1),
+        )
+        cells.setdefault(cell, []).append(marker)
+
+    single, clusters = [], []
+    for members in cells.values():
+        if len(members) == 1:
+            single.append(members[0])
+            continue
+        clusters.append({
+            "count": len(members),
+            "geoCoordinates": {
+                "latitude": sum(m["geoCoordinates"]["latitude"] for m in members) / len(members),
+                "longitude": sum(m["geoCoordinates"]["longitude"] for m in members) / len(members),
+            },
+            "totalChargers": sum(m["totalChargers"] for m in members),
+            "availableChargers": sum(m["availableChargers"] for m in members),
+        })
+    return {"parks": single, "clusters": clusters}
+
+
+class TileCache:
+    """
+    LRU cache of encoded tile payloads keyed by (z, x, y), each with an ETag.
+    Writes invalidate only the tiles (at every zoom) that contain the written parks.
+    """
+
+    def __init__(self, maxsize=DEFAULTS.tile_cache_maxsize):
+        self.maxsize = maxsize
+        self._tiles = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        # Bumped on every invalidation; tiles built from data read before a write are not cached
+        self.version = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._tiles.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._tiles.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, payload, version=None):
+        """
+        Encode and cache a payload. `version` is tile_cache.version read before the
+        parks were queried; if a write invalidated tiles since, the entry is not stored.
+        """
+        body = dumps(payload)
+        entry = (f'"{hashlib.sha1(body).hexdigest()}"', body)
+        with self._lock:
+            if version is not None and version != self.version:
+                return entry
+            self._tiles[key] = entry
+            self._tiles.move_to_end(key)
+            while len(self._tiles) > self.maxsize:
+                self._tiles.popitem(last=False)
+        return entry
+
+    def invalidate_points(self, coordinates):
+        """
+        Drop every cached tile containing one of the (latitude, longitude) points.
+        """
+        with self._lock:
+            self.version += 1
+            if not self._tiles:
+                return
+            for lat, lon in coordinates:
+                for zoom in range(MAX_TILE_ZOOM + 1):
+                    if self._tiles.pop((zoom, *lat_lon_to_tile(lat, lon, zoom)), None) is not None:
+                        self.invalidations += 1
+
+    def invalidate_parks(self, parks):
+        self.invalidate_points(
+            (park["geoCoordinates"]["latitude"], park["geoCoordinates"]["longitude"])
+            for park in parks
+            if isinstance(park.get("geoCoordinates"), dict)
+        )
+
+    def clear(self):
+        with self._lock:
+            self._tiles.clear()
+
+    def configure(self, maxsize):
+        """
+        Apply the settings of the app, emptying the cache. Called from the app lifespan.
+        """
+        with self._lock:
+            self.maxsize = maxsize
+            self._tiles.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._tiles),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+            }
+
+
+tile_cache = TileCache()
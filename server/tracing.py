@@ -0,0 +1,105 @@
+import contextvars
+import time
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from metrics import HTTP_REQUEST_SECONDS, HTTP_REQUESTS, STAGE_SECONDS
+from settings import DEFAULTS
+
+# Clients send this header (any value but "0") to get a per-stage breakdown back
+# in a Server-Timing response header; set REQUEST_PROFILING=0 to ignore it
+PROFILE_HEADER = "x-profile"
+
+# Stages recorded for the current request, or None when it is not being profiled.
+# Tasks started by asyncio.gather inherit the same list.
+_profile = contextvars.ContextVar("profile", default=None)
+
+
+class span:
+    """
+    Time a stage: `with span("directions"): ...`. The duration always goes to the
+    stage_duration_seconds histogram, and to the request's Server-Timing header
+    when the request is being profiled.
+    """
+
+    __slots__ = ("name", "started")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.started
+        STAGE_SECONDS.observe(elapsed, stage=self.name)
+        stages = _profile.get()
+        if stages is not None:
+            stages.append((self.name, elapsed))
+        return False
+
+
+async def timed(name, awaitable):
+    """
+    Await `awaitable` inside a span (for stages run concurrently with asyncio.gather).
+    """
+    with span(name):
+        return await awaitable
+
+
+def server_timing(stages, total):
+    """
+    Server-Timing header value; repeated stages are summed and keep their first position.
+    """
+    durations = {}
+    for name, elapsed in stages:
+        durations[name] = durations.get(name, 0.0) + elapsed
+    entries = [f"{name};dur={elapsed * 1000:.2f}" for name, elapsed in durations.items()]
+    entries.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(entries)
+
+
+class TracingMiddleware:
+    """
+    Count and time every HTTP request by method, route template and status, and
+    attach a Server-Timing breakdown to responses of requests sending X-Profile
+    (unless `profiling` is off).
+    """
+
+    def __init__(self, app, profiling=DEFAULTS.request_profiling):
+        self.app = app
+        self.profiling = profiling
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stages = None
+        if self.profiling:
+            value = Headers(scope=scope).get(PROFILE_HEADER)
+            if value is not None and value != "0":
+                stages = []
+        token = _profile.set(stages)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_traced(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if stages is not None:
+                    headers = MutableHeaders(raw=message["headers"])
+                    headers["Server-Timing"] = server_timing(stages, time.perf_counter() - started)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_traced)
+        finally:
+            _profile.reset(token)
+            route = scope.get("route")
+            route_path = getattr(route, "path", "unmatched")
+            elapsed = time.perf_counter() - started
+            HTTP_REQUESTS.inc(method=scope["method"], route=route_path, status=status)
+            HTTP_REQUEST_SECONDS.observe(elapsed, method=scope["method"], route=route_path)